@@ -8,6 +8,10 @@ from prettytable import PrettyTable
 import networkx as nx
 import matplotlib.pyplot as plt
 import pandas as pd
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from utils.channels import CHANNEL_CODES, CHANNEL_NAMES_ZH
+from utils.evidence import build_evidence
 pd.set_option('display.max_columns', 1000)
 pd.set_option('display.max_colwidth', 1000)
 pd.set_option('display.width',1000)
@@ -42,6 +46,8 @@ while True:
         print("enter error,please try it again")
 
 # human_time = str(input("please select the time you want(01~60):"))
+# every evidence file is parsed once for the whole 1..59 s sweep
+evidence = build_evidence(data1path)
 Cal_result = {'时间':[],'准确率':[]}
 for i in range(1,60):
     VE_result = []
@@ -57,71 +63,17 @@ for i in range(1,60):
         human_time = '0' + str(i)
     else:
         human_time = str(i)
-    time = "00:00:" + human_time + ":"
-    file_list1 = os.listdir(data1path)
     #正常运行参数
     normal = ['NORMAL0.txt', 15478880.0, 0.1728333, 2.8357710000000003, 530.0755000000001, 6965062.0, 526.7943, 6831392.0, 100.06700000000001, 36.377570000000006, 0.0, 0.0, 309.8469999999999]
-    #处理所有的表
-    data_set = []
-    for filename in file_list1:
-        result_path = data1path + "/" + filename
-        result_list = os.listdir(result_path)
-        result_list.sort(key=lambda x: int(x[:-8]))
-        # print(result_list)
-        for dif_size in result_list:
-            child_path = result_path + "/" + dif_size
-            # print(child_path)
-            ie = pd.read_table(child_path,index_col=False,header=1,error_bad_lines=False)
-            ie_daoxu = pd.DataFrame(ie.iloc[::-1])  # 倒序
-            # print(ie_daoxu)
-            a = []
-            for i in range(29):
-                a.append(str(i))
-            ie_daoxu.columns = a
-            b = []
-            for i in range(1, 29, 2):
-                b.append(str(i))
-            b.append("28")
-            b.append("14")
-            ie_jianhua1 = ie_daoxu.drop(columns=b)  # 去除空的列
-            col_name = ["时间", "稳压器压力", "稳压器水位", "上充流量", "SG1给水流量", "SG1出口压力", "SG1出口蒸汽流量", "主蒸汽母管压力", "安全壳压力", "安全壳温度",
-                        "安全壳放射性", "地坑水位", "冷却剂平均温度"]
-            ie_jianhua1.columns = col_name  # 更改列名
-            ie_jianhua2 = ie_jianhua1
-            ie_jianhua2.index = range(ie_jianhua2.shape[0])  # 修改索引从零开始
-            newDF_index = []
-            # time = "00:00:05:"
-            # print(ie_jianhua2)
-            for i in range(ie_jianhua2.shape[0]):
-                c = str(ie_jianhua2.iat[i, 0])
-                if time in c:
-                    # d = str(i)
-                    newDF_index.append(i)
-                    # print(pd.DataFrame(ie_jianhua2.iloc[i]))
-            # print(newDF_index)
-            start_index = int(newDF_index[0])
-            end_inex = int(newDF_index[len(newDF_index) - 1] + 1)
-            data_tiqu = ie_jianhua2.iloc[start_index:end_inex]  # 数据提取
-            data_tiqu.index = range(data_tiqu.shape[0])  # 更改索引，从零开始
-            # print(data_tiqu)
-            data_chuli = [dif_size]  # 可替换为始发事件
-            for i in range(1, data_tiqu.shape[1]):
-                e = 0
-                for j in range(data_tiqu.shape[0]):
-                    e = e + data_tiqu.iat[j, i]
-                f = e / (data_tiqu.shape[0])
-                data_chuli.append(f)
-            class_name = dif_size[-8:-4]
-            data_evidence = [class_name]
-            for i in range(1, len(data_chuli)):
-                data_evidence.append(data_chuli[i])
-            data_set.append(data_evidence)
-    data_source = pd.DataFrame(data_set)
-    c = data_source.loc[200]
+    # per-second channel means of every run, sliced from the evidence tensor built once above
+    data_source = evidence.frame(human_time)
+    # the first normal-operation run is the reference for lower / normal / higher
+    normal_row = evidence.run_index.positions('NORM').start
+    c = data_source.loc[normal_row]
     for ii in range(data_source.shape[0]):
         for jj in range(1,data_source.shape[1]):
             a = data_source.iloc[ii,jj]
-            b = data_source.iloc[200,jj]
+            b = data_source.iloc[normal_row,jj]
             if float(a) < (c[jj]*0.999):
                 data_source.iloc[ii, jj] = "lower"
             elif data_source.iloc[ii,jj] > (c[jj]*1.001):
@@ -226,28 +178,9 @@ for i in range(1,60):
             # for i in range(254, 305):
             #     data_source.iloc[i, 0] = 'LSGTR'
             ##平均
-            for i in range(11):
-                data_source.iloc[i, 0] = 'SLOCA'
-            for i in range(11, 37):
-                data_source.iloc[i, 0] = 'MLOCA'
-            for i in range(37, 100):
-                data_source.iloc[i, 0] = 'LLOCA'
-            for i in range(100, 111):
-                data_source.iloc[i, 0] = 'SMSLB'
-            for i in range(111, 137):
-                data_source.iloc[i, 0] = 'MMSLB'
-            for i in range(137, 200):
-                data_source.iloc[i, 0] = 'LMSLB'
-            for i in range(200, 205):
-                data_source.iloc[i, 0] = 'NORM'
-            for i in range(205, 219):
-                data_source.iloc[i, 0] = 'SSGTR'
-            for i in range(219, 251):
-                data_source.iloc[i, 0] = 'MSGTR'
-            for i in range(251, 305):
-                data_source.iloc[i, 0] = 'LSGTR'
-        data_source.columns = ["始发事件", "稳压器压力", "稳压器水位", "上充流量", "SG1给水流量", "SG1出口压力", "SG1出口蒸汽流量", "主蒸汽母管压力", "安全壳压力",
-                                "安全壳温度", "安全壳放射性", "地坑水位", "冷却剂平均温度"]
+            # sub class of every run (SLOCA ... LSGTR, NORM) from the run index of the evidence set
+            data_source.iloc[:, 0] = evidence.run_index.sub_classes
+        data_source.columns = ["始发事件"] + CHANNEL_NAMES_ZH
         data_source = data_source.drop(data_source[(data_source['始发事件']=="SLOCA")|(data_source['始发事件']=="MLOCA")|(data_source['始发事件']=="SMSLB")|
                                      (data_source['始发事件']=="MMSLB")|(data_source['始发事件']=="NORM")|(data_source['始发事件']=="SSGTR")|(data_source['始发事件']=="MSGTR")].index)
         for i in range(data_source.shape[0]):
@@ -269,8 +202,8 @@ for i in range(1,60):
         LLOCA_model = reader.get_model()
         LLOCA_infer = VariableElimination(LLOCA_model)
         predict_data = data_source.drop(columns=['始发事件','LLOCA','LMSLB','LSGTR'],axis=1)
-        predict_data.columns = ['RP','RWL','UDF','SG1WF','SG1OP','SG1SF','MSHP','CP','CT','CR','PWL','AT']
-        node = ['RP','RWL','UDF','SG1WF','SG1OP','SG1SF','MSHP','CP','CT','CR','PWL','AT']
+        predict_data.columns = list(CHANNEL_CODES)
+        node = list(CHANNEL_CODES)
         predict_data = predict_data.reset_index()
         predict_data = predict_data.drop(columns=['index'],axis=1)
         for i in range(predict_data.shape[0]):
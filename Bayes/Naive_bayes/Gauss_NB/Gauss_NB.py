@@ -2,6 +2,12 @@ import time as tm
 import os,shutil
 import pandas as pd
 import numpy as np
+import sys
+from fractions import Fraction
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from utils.channels import CHANNEL_NAMES_ZH
+from utils.evidence import build_evidence
+from utils.run_index import EVIDENCE_SUB_CLASS_SPLITS
 start = tm.time()
 pd.set_option('display.max_columns', 1000)
 pd.set_option('display.max_colwidth', 1000)
@@ -28,6 +34,11 @@ while True:
 if os.path.exists(evidence_set_path):
     os.remove(evidence_set_path)
 # human_time = str(input("please select the time you want(01~60):"))
+# every evidence file is parsed once for the whole 1..59 s sweep; LOCA is split 11 / 31 / 58 here
+evidence = build_evidence(data1path, splits=dict(EVIDENCE_SUB_CLASS_SPLITS,
+                                                 LOCA=((Fraction(11, 100), Fraction(42, 100)), 0)))
+SUB_CLASS_CODES = {'NORM': '0', 'SLOCA': '1', 'MLOCA': '2', 'LLOCA': '3', 'SMSLB': '4', 'MMSLB': '5', 'LMSLB': '6',
+                   'SSGTR': '7', 'MSGTR': '8', 'LSGTR': '9'}
 Cal_result = {'时间':[],'准确率':[]}
 for i in range(1,60):
     print('时间：%ss'%i)
@@ -37,90 +48,14 @@ for i in range(1,60):
         human_time = str(i)
     acuracy = []
     for i in range(50):
-        time = "00:00:" + human_time + ":"
-        file_list1 = os.listdir(data1path)
         #正常运行参数
         normal = ['NORMAL0.txt', 15478880.0, 0.1728333, 2.8357710000000003, 530.0755000000001, 6965062.0, 526.7943, 6831392.0, 100.06700000000001, 36.377570000000006, 0.0, 0.0, 309.8469999999999]
-        # normal_set = ['NORM', 'normal', 'normal', 'normal', 'normal', 'normal', 'normal', 'normal', 'normal', 'normal', 'normal', 'normal', 'normal']
-        #处理所有的表
-        data_set = []
-        for filename in file_list1:
-            result_path = data1path + "/" + filename
-            result_list = os.listdir(result_path)
-            result_list.sort(key=lambda x: int(x[:-8]))
-            # print(result_list)
-            for dif_size in result_list:
-                child_path = result_path + "/" + dif_size
-                # print(child_path)
-                ie = pd.read_table(child_path,index_col=False,header=1,error_bad_lines=False)
-                ie_daoxu = pd.DataFrame(ie.iloc[::-1])  # 倒序
-                # print(ie_daoxu)
-                a = []
-                for i in range(29):
-                    a.append(str(i))
-                ie_daoxu.columns = a
-                b = []
-                for i in range(1, 29, 2):
-                    b.append(str(i))
-                b.append("28")
-                b.append("14")
-                ie_jianhua1 = ie_daoxu.drop(columns=b)  # 去除空的列
-                col_name = ["时间", "稳压器压力", "稳压器水位", "上充流量", "SG1给水流量", "SG1出口压力", "SG1出口蒸汽流量", "主蒸汽母管压力", "安全壳压力", "安全壳温度",
-                            "安全壳放射性", "地坑水位", "冷却剂平均温度"]
-                ie_jianhua1.columns = col_name  # 更改列名
-                ie_jianhua2 = ie_jianhua1
-                ie_jianhua2.index = range(ie_jianhua2.shape[0])  # 修改索引从零开始
-                newDF_index = []
-                # time = "00:00:05:"
-                # print(ie_jianhua2)
-                for i in range(ie_jianhua2.shape[0]):
-                    c = str(ie_jianhua2.iat[i, 0])
-                    if time in c:
-                        # d = str(i)
-                        newDF_index.append(i)
-                        # print(pd.DataFrame(ie_jianhua2.iloc[i]))
-                # print(newDF_index)
-                start_index = int(newDF_index[0])
-                end_inex = int(newDF_index[len(newDF_index) - 1] + 1)
-                data_tiqu = ie_jianhua2.iloc[start_index:end_inex]  # 数据提取
-                data_tiqu.index = range(data_tiqu.shape[0])  # 更改索引，从零开始
-                # print(data_tiqu)
-                data_chuli = [dif_size]  # 可替换为始发事件
-                # print(data_tiqu)
-                for i in range(1, data_tiqu.shape[1]):
-                    e = 0
-                    for j in range(data_tiqu.shape[0]):
-                        e = e + data_tiqu.iat[j, i]
-                    f = e / (data_tiqu.shape[0])
-                    data_chuli.append(f)
-                # print(data_chuli)
-                class_name = dif_size[-8:-4]
-                data_evidence = [class_name]
-                for i in range(1,len(data_chuli)):
-                    data_evidence.append(data_chuli[i])
-                data_set.append(data_evidence)
-        data_source = pd.DataFrame(data_set)
+        # per-second channel means of every run, sliced from the evidence tensor built once above; kept in float32,
+        # the precision Gaussian_NB fits and predicts in
+        data_source = evidence.frame(human_time, dtype='float32')
         # print(data_source)
-        for i in range(11):
-            data_source.iloc[i, 0] = '1'
-        for i in range(11, 42):
-            data_source.iloc[i, 0] = '2'
-        for i in range(42, 100):
-            data_source.iloc[i, 0] = '3'
-        for i in range(100, 111):
-            data_source.iloc[i, 0] = '4'
-        for i in range(111, 137):
-            data_source.iloc[i, 0] = '5'
-        for i in range(137, 200):
-            data_source.iloc[i, 0] = '6'
-        for i in range(200,205):
-            data_source.iloc[i, 0] = '0'
-        for i in range(205, 219):
-            data_source.iloc[i, 0] = '7'
-        for i in range(219, 251):
-            data_source.iloc[i, 0] = '8'
-        for i in range(251, 305):
-            data_source.iloc[i, 0] = '9'
+        # class code of every run's sub class (run index of the evidence set)
+        data_source.iloc[:, 0] = [SUB_CLASS_CODES[x] for x in evidence.run_index.sub_classes]
         # data_source = data_source.values.tolist()
         # print(data_source)
         # data_increase = str(input("Do you want to increase some events(yes/no):"))
@@ -228,10 +163,12 @@ for i in range(1,60):
         # data_source = pd.DataFrame(data_source)
         # print(data_source)
         ##划分测试集和训练集
-        data_source.columns = ["始发事件", "稳压器压力", "稳压器水位", "上充流量", "SG1给水流量", "SG1出口压力", "SG1出口蒸汽流量", "主蒸汽母管压力", "安全壳压力", "安全壳温度","安全壳放射性", "地坑水位", "冷却剂平均温度"]
+        data_source.columns = ["始发事件"] + CHANNEL_NAMES_ZH
         # print(data_source)
         train_rate = 0.8 #分割比例
-        num_tup = np.array([11,31,58,11,26,63,5,14,32,54])  # 四类始发事件样本数
+        # 每个子类的样本数取自证据集的运行索引（与上面的子类划分一致）
+        num_tup = np.array([len(evidence.run_index.positions(sub_class=x)) for x in
+                            ['SLOCA', 'MLOCA', 'LLOCA', 'SMSLB', 'MMSLB', 'LMSLB', 'NORM', 'SSGTR', 'MSGTR', 'LSGTR']])
         num_train_tup = np.array([(int)(round(i * train_rate)) for i in num_tup])  # round函数对数进行四舍五入处理
         num_test_tup = num_tup - num_train_tup
         # 定义分层抽样的字典，格式为：组名：数据个数
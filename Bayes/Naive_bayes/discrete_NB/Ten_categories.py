@@ -1,7 +1,11 @@
 import time
 import pandas as pd
 import numpy as np
+import os
+import sys
 from collections import defaultdict
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from utils.evidence_weights import read_weighted, weighted_count
 # import ma
 # import heapq
 start = time.time()
@@ -13,14 +17,14 @@ pd.set_option('display.unicode.east_asian_width', True)
 
 def load_data():
     data_path = "D:/Bayesian inference/traindata1/train_data.csv"
-    df = pd.read_csv(data_path,index_col=0)
+    df, weights = read_weighted(data_path)
     data = df.values
-    return data
+    return data, weights
 # a = load_data()
 # print(a)
 ##极大似然估计
 
-def trainNB(data):
+def trainNB(data, weights):
     labels = data[:,0]
     # SLOCA = (sum([1 for l in labels if l == 'SLOCA']) + 1)/ float(len(labels)+9)
     # MLOCA = (sum([1 for l in labels if l == 'MLOCA']) + 1)/ float(len(labels)+9)
@@ -51,6 +55,8 @@ def trainNB(data):
     NBClassify = {'SLOCA':{},'MLOCA':{},'LLOCA':{},'SMSLB':{},'MMSLB':{},'LMSLB':{},'NORM':{},'SSGTR':{},'MSGTR':{},'LSGTR':{}}
     for label in NBClassify.keys():
         sub_data = data[data[:,0] == label]
+        # 每行代表的样本数（utils.evidence_weights），计数按样本数加权
+        sub_weights = weights[data[:,0] == label]
         # sub_data = pd.DataFrame(sub_data)
         # print(pd.DataFrame(sub_data))
         sub_data = np.array(sub_data)
@@ -61,17 +67,17 @@ def trainNB(data):
             # print(len(d))
             # print(tags)
             def lapulas():
-                return 1/float(float((len(d) + len(tags))))
+                return 1/float(float((sub_weights.sum() + len(tags))))
             NBClassify[label][k] = defaultdict(lapulas)
             for tag in tags:
                 a = 0
-                a += sum([1 for i in d if i == tag])
+                a += weighted_count(sub_weights, d == tag)
                 # print(a)
                 if a != 0:
-                    NBClassify[label][k][tag] = (a + 1 ) /float((len(d) + len(tags)))#添加拉普拉斯平滑
+                    NBClassify[label][k][tag] = (a + 1 ) /float((sub_weights.sum() + len(tags)))#添加拉普拉斯平滑
 
                 else:
-                    NBClassify[label][k][tag] = 1 / float((len(d) + len(tags)))
+                    NBClassify[label][k][tag] = 1 / float((sub_weights.sum() + len(tags)))
             # print(NBClassify[label][k])
     # print(NBClassify)
 
@@ -147,15 +153,15 @@ def testNB(data,SLOCA1,MLOCA1,LLOCA1,SMSLB1,MMSLB1,LMSLB1,NORM1,SSGTR1,MSGTR1,LS
             predict_vec.append('LSGTR')
     return np.array(predict_vec)
 if __name__ == "__main__":
-    a = pd.read_csv("D:/Bayesian inference/testdata1/test_data.csv",index_col=0)
+    a, test_weights = read_weighted("D:/Bayesian inference/testdata1/test_data.csv")
     b = a.values.tolist()
     b = np.array(b)
     # print(b.shape[0])
     test = a.drop(axis=1,columns=['始发事件']).values.tolist()
     # print(test)
     # print(len(test))
-    data = load_data()
-    SLOCA1,MLOCA1,LLOCA1,SMSLB1,MMSLB1,LMSLB1,NORM1,SSGTR1,MSGTR1,LSGTR1,NBClassify1 = trainNB(data)
+    data, weights = load_data()
+    SLOCA1,MLOCA1,LLOCA1,SMSLB1,MMSLB1,LMSLB1,NORM1,SSGTR1,MSGTR1,LSGTR1,NBClassify1 = trainNB(data, weights)
     # print(LOCA,MSLB,NORM,SGTR)
     predict_vec = testNB(test,SLOCA1,MLOCA1,LLOCA1,SMSLB1,MMSLB1,LMSLB1,NORM1,SSGTR1,MSGTR1,LSGTR1,NBClassify1)
     # print(predict_vec.shape[0])
@@ -166,30 +172,30 @@ if __name__ == "__main__":
     sd2 = []
     for i in range(len(predict_vec)):
         if predict_vec[i] == b[i,0]:
-            count += 1
+            count += test_weights[i]
         else:
             sd0 = [predict_vec[i],b[i,0]]
             if predict_vec[i][-4:] == b[i,0][-4:]:
-                same += 1
+                same += test_weights[i]
                 sd1.append(sd0)
                 # print(predict_vec[i], b[i, 0])
             else:
                 sd2.append(sd0)
                 # print(predict_vec[i], b[i, 0])
-                different += 1
+                different += test_weights[i]
             # print(predict_vec[i],b[i,0])
     sd1 = np.array(sd1)
     sd1 = np.array(list(set(tuple(t) for t in sd1)))
     sd2 = np.array(sd2)
     sd2 = np.array(list(set(tuple(t) for t in sd2)))
-    print('错误数：',int(len(predict_vec)-count))
+    print('错误数：',int(test_weights.sum()-count))
     print('子类错误：',same)
     print('子类错误类型:')
     print(sd1)
     print('大类错误：',different)
     print('大类错误类型:')
     print(sd2)
-    accuracy = count/len(predict_vec)
+    accuracy = count/test_weights.sum()
     print('准确率:',accuracy)
     end = time.time()
     print('Running time: %s Seconds'%(end-start))
\ No newline at end of file
@@ -2,12 +2,22 @@ import time as tm
 import os,shutil
 import pandas as pd
 import numpy as np
+import sys
+from fractions import Fraction
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from utils.channels import CHANNEL_NAMES_ZH
+from utils.evidence import evidence_files, parse_event_types
+from utils.evidence_weights import with_weights
+from utils.run_index import INCREASE_SUB_CLASS_SPLITS, RunIndex
+from utils.time_index import IndexedRun
 start = tm.time()
 pd.set_option('display.max_columns', 1000)
 pd.set_option('display.max_colwidth', 1000)
 pd.set_option('display.width',1000)
 pd.set_option('display.unicode.ambiguous_as_wide', True)
 pd.set_option('display.unicode.east_asian_width', True)
+# IndexedRun of every evidence file, keyed by path
+indexed_runs = {}
 
 while True:
     data_type = str(input("please enter your evidence data_type(train/test):"))
@@ -28,72 +38,51 @@ while True:
 if os.path.exists(evidence_set_path):
     os.remove(evidence_set_path)
 human_time = str(input("please select the time you want(01~60):"))
-time = "00:00:" + human_time + ":"
-file_list1 = os.listdir(data1path)
+# 证据文件按evidence_files的顺序读取（子文件夹按字母序、文件按破口大小），与下面运行索引的行号一致
+evidence_list = evidence_files(data1path)
 #正常运行参数
 normal = ['NORMAL0.txt', 15478880.0, 0.1728333, 2.8357710000000003, 530.0755000000001, 6965062.0, 526.7943, 6831392.0, 100.06700000000001, 36.377570000000006, 0.0, 0.0, 309.8469999999999]
 # normal_set = ['NORM', 'normal', 'normal', 'normal', 'normal', 'normal', 'normal', 'normal', 'normal', 'normal', 'normal', 'normal', 'normal']
 #处理所有的表
 data_set = []
-for filename in file_list1:
-    result_path = data1path + "/" + filename
-    result_list = os.listdir(result_path)
-    result_list.sort(key=lambda x: int(x[:-8]))
-    # print(result_list)
-    for dif_size in result_list:
-        child_path = result_path + "/" + dif_size
-        # print(child_path)
-        ie = pd.read_table(child_path,index_col=False,header=1,error_bad_lines=False)
-        ie_daoxu = pd.DataFrame(ie.iloc[::-1])  # 倒序
-        # print(ie_daoxu)
-        a = []
-        for i in range(29):
-            a.append(str(i))
-        ie_daoxu.columns = a
-        b = []
-        for i in range(1, 29, 2):
-            b.append(str(i))
-        b.append("28")
-        b.append("14")
-        ie_jianhua1 = ie_daoxu.drop(columns=b)  # 去除空的列
-        col_name = ["时间", "稳压器压力", "稳压器水位", "上充流量", "SG1给水流量", "SG1出口压力", "SG1出口蒸汽流量", "主蒸汽母管压力", "安全壳压力", "安全壳温度",
-                    "安全壳放射性", "地坑水位", "冷却剂平均温度"]
-        ie_jianhua1.columns = col_name  # 更改列名
-        ie_jianhua2 = ie_jianhua1
-        ie_jianhua2.index = range(ie_jianhua2.shape[0])  # 修改索引从零开始
-        newDF_index = []
-        # time = "00:00:05:"
-        # print(ie_jianhua2)
-        for i in range(ie_jianhua2.shape[0]):
-            c = str(ie_jianhua2.iat[i, 0])
-            if time in c:
-                # d = str(i)
-                newDF_index.append(i)
-                # print(pd.DataFrame(ie_jianhua2.iloc[i]))
-        # print(newDF_index)
-        start_index = int(newDF_index[0])
-        end_inex = int(newDF_index[len(newDF_index) - 1] + 1)
-        data_tiqu = ie_jianhua2.iloc[start_index:end_inex]  # 数据提取
-        data_tiqu.index = range(data_tiqu.shape[0])  # 更改索引，从零开始
-        # print(data_tiqu)
-        data_chuli = [dif_size]  # 可替换为始发事件
-        for i in range(1, data_tiqu.shape[1]):
-            e = 0
-            for j in range(data_tiqu.shape[0]):
-                e = e + data_tiqu.iat[j, i]
-            f = e / (data_tiqu.shape[0])
-            data_chuli.append(f)
-        class_name = dif_size[-8:-4]
-        data_evidence = [class_name]
-        for i in range(1, len(data_chuli)):
-            data_evidence.append(data_chuli[i])
-        data_set.append(data_evidence)
+for child_path, dif_size in evidence_list:
+    # print(child_path)
+    col_name = ["时间"] + CHANNEL_NAMES_ZH
+    # The time column is parsed into a sorted millisecond index once per file; the rows of
+    # second human_time are then found by binary search instead of a string scan of every row
+    if child_path not in indexed_runs:
+        indexed_runs[child_path] = IndexedRun.from_file(child_path)
+    data_tiqu = indexed_runs[child_path].frame(int(human_time), int(human_time) + 1, col_name)  # 数据提取
+    # print(data_tiqu)
+    data_chuli = [dif_size]  # 可替换为始发事件
+    for i in range(1, data_tiqu.shape[1]):
+        e = 0
+        for j in range(data_tiqu.shape[0]):
+            e = e + data_tiqu.iat[j, i]
+        f = e / (data_tiqu.shape[0])
+        data_chuli.append(f)
+    class_name = dif_size[-8:-4]
+    data_evidence = [class_name]
+    for i in range(1, len(data_chuli)):
+        data_evidence.append(data_chuli[i])
+    data_set.append(data_evidence)
 data_source = pd.DataFrame(data_set)
-c = data_source.loc[200]
+# Runs in the order they are read above, with the sub classes of the 20 s split (LOCA 14 / 33 / 53 of 100 runs,
+# MSLB 11 / 25 / 64, SGTR 19 / 14 / 67); the first normal-operation run is the reference for lower / normal / higher
+run_index = RunIndex.from_evidence(evidence_list, {
+    'LOCA': ((Fraction(14, 100), Fraction(47, 100)), 0),
+    'MSLB': ((Fraction(11, 100), Fraction(36, 100)), 3),
+    'SGTR': ((Fraction(19, 100), Fraction(33, 100)), 6),
+    'NORM': ((), 9),
+})
+# the sub classes that get extra samples keep the split the sample counts were tuned on
+increase_index = run_index.with_splits(INCREASE_SUB_CLASS_SPLITS)
+normal_row = run_index.positions('NORM').start
+c = data_source.loc[normal_row]
 for ii in range(data_source.shape[0]):
     for jj in range(1,data_source.shape[1]):
         a = data_source.iloc[ii,jj]
-        b = data_source.iloc[200,jj]
+        b = data_source.iloc[normal_row,jj]
         if float(a) < (c[jj]*0.999):
             data_source.iloc[ii, jj] = "lower"
         elif data_source.iloc[ii,jj] > (c[jj]*1.001):
@@ -101,6 +90,8 @@ for ii in range(data_source.shape[0]):
         else:
             data_source.iloc[ii, jj] = "normal"
 # data_source.to_csv("D:/Bayesian inference/traindata1/check.csv",encoding='utf_8_sig')
+# 事件增加只改变每行的样本数（utils.evidence_weights），不复制数据行
+weights = np.ones(len(data_set), dtype='int64')
 
 if data_type == "train":
     Refine = str(input("Do you further subdivide the initial event?(yes/no):"))
@@ -135,32 +126,14 @@ if data_type == "train":
         # for i in range(253, 305):
         #     data_source.iloc[i, 0] = 'LSGTR'
         ###20s
-        for i in range(14):
-            data_source.iloc[i, 0] = 'SLOCA'
-        for i in range(14, 47):
-            data_source.iloc[i, 0] = 'MLOCA'
-        for i in range(47, 100):
-            data_source.iloc[i, 0] = 'LLOCA'
-        for i in range(100, 111):
-            data_source.iloc[i, 0] = 'SMSLB'
-        for i in range(111, 136):
-            data_source.iloc[i, 0] = 'MMSLB'
-        for i in range(136, 200):
-            data_source.iloc[i, 0] = 'LMSLB'
-        for i in range(200, 205):
-            data_source.iloc[i, 0] = 'NORM'
-        for i in range(205, 224):
-            data_source.iloc[i, 0] = 'SSGTR'
-        for i in range(224, 238):
-            data_source.iloc[i, 0] = 'MSGTR'
-        for i in range(238, 305):
-            data_source.iloc[i, 0] = 'LSGTR'
+        # sub class of every run (SLOCA ... LSGTR, NORM) from the run index of the evidence files
+        data_source.iloc[:, 0] = run_index.sub_classes
         #改回dataset,方便后续事件的增加
         # print(data_source)
         data_set = list(np.array(data_source))
         data_increase = str(input("Do you want to increase some events(yes/no):"))
         if data_increase == 'yes':
-            event = eval(input("please enter event type('SLOCA','MLOCA','LLOCA','SMSLB','MMSLB','LMSLB','NORM','SSGTR','MSGTR','LSGTR'):"))
+            event = parse_event_types(input("please enter event type('SLOCA','MLOCA','LLOCA','SMSLB','MMSLB','LMSLB','NORM','SSGTR','MSGTR','LSGTR'):"))
             # print(len(event))
             for i in range(len(event)):
                 if event[i] == "SLOCA":
@@ -168,96 +141,86 @@ if data_type == "train":
                     # size_type = size_type.split(",")
                     # # print(size_type)
                     # for l in range(len(size_type)):
-                    for j in range(11):
+                    for j in increase_index.positions(sub_class='SLOCA'):
                         number = 473
-                        for ii in range(number):
-                            data_set.append(data_set[j])
+                        weights[j] += number
                 if event[i] == "MLOCA":
                     # size_type = input("please enter MLOCA size(11~39):")
                     # size_type = size_type.split(",")
                     # for l in range(len(size_type)):
-                    for j in range(11,40):
+                    for j in increase_index.positions(sub_class='MLOCA'):
                         number = 26
-                        for ii in range(number):
-                            data_set.append(data_set[j])
+                        weights[j] += number
                 if event[i] == "LLOCA":
                     # size_type = input("please enter LLOCA size(40~99):")
                     # size_type = size_type.split(",")
                     # for l in range(len(size_type)):
-                    for j in range(40,100):
+                    for j in increase_index.positions(sub_class='LLOCA'):
                         # if int(size_type[l]) == j:
                             # number = int(input("please enter %s number:" % j))
                         number = 3
-                        for ii in range(number):
-                            data_set.append(data_set[j])
+                        weights[j] += number
                 if event[i] == "SMSLB":
                     # size_type = input("please enter SMSLB size(100~120):")
                     # size_type = size_type.split(",")
                     # for l in range(len(size_type)):
-                    for j in range(100,121):
+                    for j in increase_index.positions(sub_class='SMSLB'):
                         # if int(size_type[l]) == j:
                             # number = int(input("please enter %s number:" %j))
                         number = 125
-                        for ii in range(number):
-                            data_set.append(data_set[j])
+                        weights[j] += number
                 if event[i] == "MMSLB":
                     # size_type = input("please enter MMSLB size(121~141):")
                     # size_type = size_type.split(",")
                     # for l in range(len(size_type)):
-                    for j in range(121,142):
+                    for j in increase_index.positions(sub_class='MMSLB'):
                         # if int(size_type[l]) == j:
                             # number = int(input("please enter %s number:" %j))
                         number = 7
-                        for ii in range(number):
-                            data_set.append(data_set[j])
+                        weights[j] += number
                 if event[i] == "LMSLB":
                     # size_type = input("please enter LMSLB size(142~199):")
                     # size_type = size_type.split(",")
                     # for l in range(len(size_type)):
-                    for j in range(142,200):
+                    for j in increase_index.positions(sub_class='LMSLB'):
                         # if int(size_type[l]) == j:
                             # number = int(input("please enter %s number:" %j))
                         number = 0
-                        for ii in range(number):
-                            data_set.append(data_set[j])
+                        weights[j] += number
                 if event[i] == "NORM":
                     # size = int(input("please enter NORM size(38):"))
                     # number = int(input("please enter norm number:"))
-                    for j in range(200, 205):
+                    for j in increase_index.positions('NORM'):
                         number = 200000 #1000000#2584683
-                        for ii in range(number):
-                            data_set.append(data_set[j])
+                        weights[j] += number
                 if event[i] == "SSGTR":
                     # size_type = input("please enter SSGTR size(201~211):")
                     # size_type = size_type.split(",")
                     # for l in range(len(size_type)):
-                    for j in range(205,215):
+                    for j in increase_index.positions(sub_class='SSGTR'):
                         # if int(size_type[l]) == j:
                             # number = int(input("please enter %s number:"%j ))
                         number = 1471
-                        for ii in range(number):
-                            data_set.append(data_set[j])
+                        weights[j] += number
                 if event[i] == "MSGTR":
                     # size_type = input("please enter MSGTR size(212~249):")
                     # size_type = size_type.split(",")
                     # for l in range(len(size_type)):
-                    for j in range(215, 253):
+                    for j in increase_index.positions(sub_class='MSGTR'):
                         # if int(size_type[l]) == j:
                             # number = int(input("please enter %s number:" % j))
                         number = 52
-                        for ii in range(number):
-                            data_set.append(data_set[j])
+                        weights[j] += number
                 if event[i] == "LSGTR":
                     # print('1')
                     # size_type = input("please enter LSGTR size(250~299):")
                     # size_type = size_type.split(",")
                     # for l in range(len(size_type)):
-                    for j in range(253, 305):
+                    for j in increase_index.positions(sub_class='LSGTR'):
                         # if int(size_type[l]) == j:
                             # number = int(input("please enter %s number:" % j))
                         number = 12
-                        for ii in range(number):
-                            data_set.append(data_set[j])
+                        weights[j] += number
         if data_increase == 'no':
             pass
     #始发事件工况增加
@@ -273,7 +236,7 @@ if data_type == "train":
         data_set = list(np.array(data_source))
         data_increase = str(input("Do you want to increase some events(yes/no):"))
         if data_increase == 'yes':
-            event = eval(input("please enter event type('LOCA','MSLB','NORM','SGTR'):"))
+            event = parse_event_types(input("please enter event type('LOCA','MSLB','NORM','SGTR'):"))
             # print(len(event))
             for i in range(len(event)):
                 if event[i] == "LOCA":
@@ -283,48 +246,45 @@ if data_type == "train":
                     size_type = size_type.split(",")
                     print(size_type)
                     for l in range(len(size_type)):
-                        for j in range(100):
+                        for j in run_index.positions('LOCA'):
                             if int(size_type[l]) == j:
                                 number = int(input("please enter %s number:" % j))
                                 # number = 200
-                                for ii in range(number):
-                                    data_set.append(data_set[int(size_type[l])])
+                                weights[int(size_type[l])] += number
 
                 if event[i] == "MSLB":
                     size_type = input("please enter MSLB size(100~199):")
                     size_type = size_type.split(",")
                     for l in range(len(size_type)):
-                        for j in range(100, 200):
+                        for j in run_index.positions('MSLB'):
                             if int(size_type[l]) == j:
                                 number = int(input("please enter %s number:" % j))
                                 # number = 200
-                                for ii in range(number):
-                                    data_set.append(data_set[int(size_type[l])])
+                                weights[int(size_type[l])] += number
                 if event[i] == "NORM":
                     size_type = input("please enter NORM size(100~199):")
                     size_type = size_type.split(",")
                     for l in range(len(size_type)):
-                        for j in range(200, 205):
+                        for j in run_index.positions('NORM'):
                             if int(size_type[l]) == j:
                                 number = int(input("please enter %s number:" % j))
                                 # number = 200
-                                for ii in range(number):
-                                    data_set.append(data_set[int(size_type[l])])
+                                weights[int(size_type[l])] += number
                 if event[i] == "SGTR":
                     size_type = input("please enter SGTR size(201~300):")
                     # size_type = [39,40]
                     size_type = size_type.split(",")
                     for l in range(len(size_type)):
-                        for j in range(205, 305):
+                        for j in run_index.positions('SGTR'):
                             if int(size_type[l]) == j:
                                 number = int(input("please enter %s number:" % j))
                                 # number = 200
-                                for ii in range(number):
-                                    data_set.append(data_set[int(size_type[l])])
+                                weights[int(size_type[l])] += number
         if data_increase == 'no':
             pass
 evidence_set = pd.DataFrame(data_set)
-evidence_set.columns = ["始发事件", "稳压器压力", "稳压器水位", "上充流量", "SG1给水流量", "SG1出口压力", "SG1出口蒸汽流量", "主蒸汽母管压力", "安全壳压力", "安全壳温度","安全壳放射性", "地坑水位", "冷却剂平均温度"]
+evidence_set.columns = ["始发事件"] + CHANNEL_NAMES_ZH
+evidence_set = with_weights(evidence_set, weights)
 evidence_set.to_csv(evidence_set_path,encoding='utf_8_sig')
 # print(evidence_set.drop(axis=1,columns=['始发事件']).values.tolist())
 end = tm.time()
@@ -2,6 +2,9 @@ import time
 import pandas as pd
 import numpy as np
 import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from utils.evidence_weights import read_weighted, split_weights, weighted_count, with_weights
 start = time.time()
 pd.set_option('display.max_columns', 1000)
 pd.set_option('display.max_colwidth', 1000)
@@ -15,13 +18,16 @@ if os.path.exists(train_path):
 if os.path.exists(test_path):
     os.remove(test_path)
 data_path = "D:/Bayesian inference/traindata1/data1/train_set.csv"
-df = pd.read_csv(data_path,index_col=0)
+# every evidence row once, with the number of samples it stands for
+df, weights = read_weighted(data_path)
 # new_df = df.groupby('始发事件')
 train_rate = 0.8
 Refine = str(input("Have you further subdivided the initial event?(yes/no):"))
 if Refine == 'yes':
-    # num_tup = np.array([5216,782,261,2639,174,58,1000001,1472,53,13])  # 四类始发事件样本数
-    num_tup = np.array([14,33,53,11,25,64,1000000,19,14,67])
+    # 每个子类的样本数取自证据文件：写出时的子类划分，按增加事件后的样本数计
+    labels = df['始发事件'].values
+    num_tup = np.array([weighted_count(weights, labels == x) for x in
+                        ['SLOCA', 'MLOCA', 'LLOCA', 'SMSLB', 'MMSLB', 'LMSLB', 'NORM', 'SSGTR', 'MSGTR', 'LSGTR']])
     num_train_tup = np.array([(int)(round(i * train_rate)) for i in num_tup])  # round函数对数进行四舍五入处理
     num_test_tup = num_tup - num_train_tup
     # 定义分层抽样的字典，格式为：组名：数据个数
@@ -31,31 +37,27 @@ if Refine == 'yes':
                           'SSGTR': num_test_tup[7],'MSGTR': num_test_tup[8],'LSGTR': num_test_tup[9]}  # 此处要根据不同的事件类型的总数设置抽样的数据
     print(typicalNDict_train,typicalNDict_test)
 if Refine == 'no':
-    num_tup = np.array([100, 100, 1, 100])   # 四类始发事件样本数
+    # 四类始发事件样本数（按增加事件后的样本数计）
+    labels = df['始发事件'].values
+    num_tup = np.array([weighted_count(weights, labels == x) for x in ['LOCA', 'MSLB', 'NORM', 'SGTR']])
     num_train_tup = np.array([(int)(round(i*train_rate)) for i in num_tup])   # round函数对数进行四舍五入处理
     num_test_tup = num_tup - num_train_tup
     # 定义分层抽样的字典，格式为：组名：数据个数
     typicalNDict_train = {'LOCA': num_train_tup[0], 'MSLB': num_train_tup[1], 'NORM': num_train_tup[2], 'SGTR': num_train_tup[3]}  # 此处要根据不同的事件类型的总数设置抽样的数据
     typicalNDict_test = {'LOCA': num_test_tup[0], 'MSLB': num_test_tup[1], 'NORM': num_test_tup[2], 'SGTR': num_test_tup[3]}  # 此处要根据不同的事件类型的总数设置抽样的数据
-#定义抽样函数
-def typicalsamling(group, typicalNDict):
-    name = group.name
-    n = typicalNDict[name]
-    return group.sample(n=n)
-train_data = df.groupby('始发事件').apply(typicalsamling, typicalNDict_train)
+#分层抽样：按样本数从每类的全部样本中抽取，抽中的次数记为训练集的样本数，其余归测试集
+train_weights, test_weights = split_weights(df['始发事件'].values, weights, typicalNDict_train)
+train_data = with_weights(df, train_weights)
 # test_data = df.append(train_data).drop_duplicates(keep=False)
 # train_data = train_data0.drop(train_data0.columns[0],axis=1,inplace=True)
 # mul_index = pd.DataFrame(train_data.index)
 # for i in range(mul_index.shape[0]):
 #     train_data.rename(columns={mul_index.iloc[i,0]:mul_index.iloc[i,0][1]},inplace=True)
 # print(pd.DataFrame(train_data.index))
-train_data.drop(columns='始发事件',inplace=True)
-train_data.reset_index(inplace=True)
-train_data.set_index(train_data.columns[1],inplace=True)
 # train_data.set_index(train_data.columns[0])
 print(train_data)
 # train_data = df.sample(frac=0.8,axis=0)
-test_data = df[~df.index.isin(train_data.index)]
+test_data = with_weights(df, test_weights)
 print(test_data)
 train_data.to_csv(train_path,encoding='utf_8_sig')
 # print(train_data)
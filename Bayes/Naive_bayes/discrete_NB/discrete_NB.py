@@ -3,6 +3,12 @@ import os,shutil
 import pandas as pd
 import numpy as np
 from collections import defaultdict
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from utils.channels import CHANNEL_NAMES_ZH
+from utils.evidence import build_evidence, parse_event_types
+from utils.evidence_weights import read_weighted, split_weights, weighted_count, with_weights
+from utils.run_index import INCREASE_SUB_CLASS_SPLITS
 start = tm.time()
 pd.set_option('display.max_columns', 1000)
 pd.set_option('display.max_colwidth', 1000)
@@ -28,6 +34,10 @@ while True:
         print("enter error,please try it again")
 
 # human_time = str(input("please select the time you want(01~60):"))
+# every evidence file is parsed once for the whole 1..59 s sweep
+evidence = build_evidence(data1path)
+# the sub classes that get extra samples keep the split the sample counts were tuned on
+increase_index = evidence.run_index.with_splits(INCREASE_SUB_CLASS_SPLITS)
 Cal_result = {'时间':[],'准确率':[]}
 for i in range(1,60):
     if os.path.exists(evidence_set_path):
@@ -39,71 +49,17 @@ for i in range(1,60):
         human_time = '0' + str(i)
     else:
         human_time = str(i)
-    time = "00:00:" + human_time + ":"
-    file_list1 = os.listdir(data1path)
     #正常运行参数
     normal = ['NORMAL0.txt', 15478880.0, 0.1728333, 2.8357710000000003, 530.0755000000001, 6965062.0, 526.7943, 6831392.0, 100.06700000000001, 36.377570000000006, 0.0, 0.0, 309.8469999999999]
-    #处理所有的表
-    data_set = []
-    for filename in file_list1:
-        result_path = data1path + "/" + filename
-        result_list = os.listdir(result_path)
-        result_list.sort(key=lambda x: int(x[:-8]))
-        # print(result_list)
-        for dif_size in result_list:
-            child_path = result_path + "/" + dif_size
-            # print(child_path)
-            ie = pd.read_table(child_path,index_col=False,header=1,error_bad_lines=False)
-            ie_daoxu = pd.DataFrame(ie.iloc[::-1])  # 倒序
-            # print(ie_daoxu)
-            a = []
-            for i in range(29):
-                a.append(str(i))
-            ie_daoxu.columns = a
-            b = []
-            for i in range(1, 29, 2):
-                b.append(str(i))
-            b.append("28")
-            b.append("14")
-            ie_jianhua1 = ie_daoxu.drop(columns=b)  # 去除空的列
-            col_name = ["时间", "稳压器压力", "稳压器水位", "上充流量", "SG1给水流量", "SG1出口压力", "SG1出口蒸汽流量", "主蒸汽母管压力", "安全壳压力", "安全壳温度",
-                        "安全壳放射性", "地坑水位", "冷却剂平均温度"]
-            ie_jianhua1.columns = col_name  # 更改列名
-            ie_jianhua2 = ie_jianhua1
-            ie_jianhua2.index = range(ie_jianhua2.shape[0])  # 修改索引从零开始
-            newDF_index = []
-            # time = "00:00:05:"
-            # print(ie_jianhua2)
-            for i in range(ie_jianhua2.shape[0]):
-                c = str(ie_jianhua2.iat[i, 0])
-                if time in c:
-                    # d = str(i)
-                    newDF_index.append(i)
-                    # print(pd.DataFrame(ie_jianhua2.iloc[i]))
-            # print(newDF_index)
-            start_index = int(newDF_index[0])
-            end_inex = int(newDF_index[len(newDF_index) - 1] + 1)
-            data_tiqu = ie_jianhua2.iloc[start_index:end_inex]  # 数据提取
-            data_tiqu.index = range(data_tiqu.shape[0])  # 更改索引，从零开始
-            # print(data_tiqu)
-            data_chuli = [dif_size]  # 可替换为始发事件
-            for i in range(1, data_tiqu.shape[1]):
-                e = 0
-                for j in range(data_tiqu.shape[0]):
-                    e = e + data_tiqu.iat[j, i]
-                f = e / (data_tiqu.shape[0])
-                data_chuli.append(f)
-            class_name = dif_size[-8:-4]
-            data_evidence = [class_name]
-            for i in range(1, len(data_chuli)):
-                data_evidence.append(data_chuli[i])
-            data_set.append(data_evidence)
-    data_source = pd.DataFrame(data_set)
-    c = data_source.loc[200]
+    # per-second channel means of every run, sliced from the evidence tensor built once above
+    data_source = evidence.frame(human_time)
+    # the first normal-operation run is the reference for lower / normal / higher
+    normal_row = evidence.run_index.positions('NORM').start
+    c = data_source.loc[normal_row]
     for ii in range(data_source.shape[0]):
         for jj in range(1,data_source.shape[1]):
             a = data_source.iloc[ii,jj]
-            b = data_source.iloc[200,jj]
+            b = data_source.iloc[normal_row,jj]
             if float(a) < (c[jj]*0.999):
                 data_source.iloc[ii, jj] = "lower"
             elif data_source.iloc[ii,jj] > (c[jj]*1.001):
@@ -111,6 +67,8 @@ for i in range(1,60):
             else:
                 data_source.iloc[ii, jj] = "normal"
     data_source.to_csv("D:/Bayesian inference/traindata1/check.csv",encoding='utf_8_sig')
+    # 事件增加只改变每行的样本数（utils.evidence_weights），不复制数据行
+    weights = np.ones(data_source.shape[0], dtype='int64')
 
     if data_type == "train":
         # Refine = str(input("Do you further subdivide the initial event?(yes/no):"))
@@ -209,26 +167,8 @@ for i in range(1,60):
             # for i in range(254, 305):
             #     data_source.iloc[i, 0] = 'LSGTR'
             ##平均
-            for i in range(11):
-                data_source.iloc[i, 0] = 'SLOCA'
-            for i in range(11, 37):
-                data_source.iloc[i, 0] = 'MLOCA'
-            for i in range(37, 100):
-                data_source.iloc[i, 0] = 'LLOCA'
-            for i in range(100, 111):
-                data_source.iloc[i, 0] = 'SMSLB'
-            for i in range(111, 137):
-                data_source.iloc[i, 0] = 'MMSLB'
-            for i in range(137, 200):
-                data_source.iloc[i, 0] = 'LMSLB'
-            for i in range(200, 205):
-                data_source.iloc[i, 0] = 'NORM'
-            for i in range(205, 219):
-                data_source.iloc[i, 0] = 'SSGTR'
-            for i in range(219, 251):
-                data_source.iloc[i, 0] = 'MSGTR'
-            for i in range(251, 305):
-                data_source.iloc[i, 0] = 'LSGTR'
+            # sub class of every run (SLOCA ... LSGTR, NORM) from the run index of the evidence set
+            data_source.iloc[:, 0] = evidence.run_index.sub_classes
             #改回dataset,方便后续事件的增加
             data_set = list(np.array(data_source))
             # data_increase = str(input("Do you want to increase some events(yes/no):"))
@@ -243,97 +183,87 @@ for i in range(1,60):
                         # size_type = size_type.split(",")
                         # # print(size_type)
                         # for l in range(len(size_type)):
-                        for j in range(11):
+                        for j in increase_index.positions(sub_class='SLOCA'):
                             number = 473
-                            for ii in range(number):
-                                data_set.append(data_set[j])
+                            weights[j] += number
                     if event[i] == "MLOCA":
                         # size_type = input("please enter MLOCA size(11~39):")
                         # size_type = size_type.split(",")
                         # for l in range(len(size_type)):
-                        for j in range(11,40):
+                        for j in increase_index.positions(sub_class='MLOCA'):
                             number = 26
-                            for ii in range(number):
-                                data_set.append(data_set[j])
+                            weights[j] += number
                     if event[i] == "LLOCA":
                         # size_type = input("please enter LLOCA size(40~99):")
                         # size_type = size_type.split(",")
                         # for l in range(len(size_type)):
-                        for j in range(40,100):
+                        for j in increase_index.positions(sub_class='LLOCA'):
                             # if int(size_type[l]) == j:
                                 # number = int(input("please enter %s number:" % j))
                             number = 3
-                            for ii in range(number):
-                                data_set.append(data_set[j])
+                            weights[j] += number
                     if event[i] == "SMSLB":
                         # size_type = input("please enter SMSLB size(100~120):")
                         # size_type = size_type.split(",")
                         # for l in range(len(size_type)):
-                        for j in range(100,121):
+                        for j in increase_index.positions(sub_class='SMSLB'):
                             # if int(size_type[l]) == j:
                                 # number = int(input("please enter %s number:" %j))
                             number = 125
-                            for ii in range(number):
-                                data_set.append(data_set[j])
+                            weights[j] += number
                     if event[i] == "MMSLB":
                         # size_type = input("please enter MMSLB size(121~141):")
                         # size_type = size_type.split(",")
                         # for l in range(len(size_type)):
-                        for j in range(121,142):
+                        for j in increase_index.positions(sub_class='MMSLB'):
                             # if int(size_type[l]) == j:
                                 # number = int(input("please enter %s number:" %j))
                             number = 7
-                            for ii in range(number):
-                                data_set.append(data_set[j])
+                            weights[j] += number
                     if event[i] == "LMSLB":
                         # size_type = input("please enter LMSLB size(142~199):")
                         # size_type = size_type.split(",")
                         # for l in range(len(size_type)):
-                        for j in range(142,200):
+                        for j in increase_index.positions(sub_class='LMSLB'):
                             # if int(size_type[l]) == j:
                                 # number = int(input("please enter %s number:" %j))
                             number = 0
-                            for ii in range(number):
-                                data_set.append(data_set[j])
+                            weights[j] += number
                     if event[i] == "NORM":
                         # print('1')
                         # size = int(input("please enter NORM size(38):"))
                         # number = int(input("please enter norm number:"))
-                        for j in range(200, 205):
+                        for j in increase_index.positions('NORM'):
                             number = 20 #1000000#2584683
-                            for ii in range(number):
-                                data_set.append(data_set[j])
+                            weights[j] += number
                     if event[i] == "SSGTR":
                         # size_type = input("please enter SSGTR size(201~211):")
                         # size_type = size_type.split(",")
                         # for l in range(len(size_type)):
-                        for j in range(205,215):
+                        for j in increase_index.positions(sub_class='SSGTR'):
                             # if int(size_type[l]) == j:
                                 # number = int(input("please enter %s number:"%j ))
                             number = 1471
-                            for ii in range(number):
-                                data_set.append(data_set[j])
+                            weights[j] += number
                     if event[i] == "MSGTR":
                         # size_type = input("please enter MSGTR size(212~249):")
                         # size_type = size_type.split(",")
                         # for l in range(len(size_type)):
-                        for j in range(215, 253):
+                        for j in increase_index.positions(sub_class='MSGTR'):
                             # if int(size_type[l]) == j:
                                 # number = int(input("please enter %s number:" % j))
                             number = 52
-                            for ii in range(number):
-                                data_set.append(data_set[j])
+                            weights[j] += number
                     if event[i] == "LSGTR":
                         # print('1')
                         # size_type = input("please enter LSGTR size(250~299):")
                         # size_type = size_type.split(",")
                         # for l in range(len(size_type)):
-                        for j in range(253, 305):
+                        for j in increase_index.positions(sub_class='LSGTR'):
                             # if int(size_type[l]) == j:
                                 # number = int(input("please enter %s number:" % j))
                             number = 12
-                            for ii in range(number):
-                                data_set.append(data_set[j])
+                            weights[j] += number
             if data_increase == 'no':
                 pass
         #始发事件工况增加
@@ -349,7 +279,7 @@ for i in range(1,60):
             data_set = list(np.array(data_source))
             data_increase = str(input("Do you want to increase some events(yes/no):"))
             if data_increase == 'yes':
-                event = eval(input("please enter event type('LOCA','MSLB','NORM','SGTR'):"))
+                event = parse_event_types(input("please enter event type('LOCA','MSLB','NORM','SGTR'):"))
                 # print(len(event))
                 for i in range(len(event)):
                     if event[i] == "LOCA":
@@ -359,48 +289,45 @@ for i in range(1,60):
                         size_type = size_type.split(",")
                         print(size_type)
                         for l in range(len(size_type)):
-                            for j in range(100):
+                            for j in evidence.run_index.positions('LOCA'):
                                 if int(size_type[l]) == j:
                                     number = int(input("please enter %s number:" % j))
                                     # number = 200
-                                    for ii in range(number):
-                                        data_set.append(data_set[int(size_type[l])])
+                                    weights[int(size_type[l])] += number
 
                     if event[i] == "MSLB":
                         size_type = input("please enter MSLB size(100~199):")
                         size_type = size_type.split(",")
                         for l in range(len(size_type)):
-                            for j in range(100, 200):
+                            for j in evidence.run_index.positions('MSLB'):
                                 if int(size_type[l]) == j:
                                     number = int(input("please enter %s number:" % j))
                                     # number = 200
-                                    for ii in range(number):
-                                        data_set.append(data_set[int(size_type[l])])
+                                    weights[int(size_type[l])] += number
                     if event[i] == "NORM":
                         size_type = input("please enter NORM size(100~199):")
                         size_type = size_type.split(",")
                         for l in range(len(size_type)):
-                            for j in range(200, 205):
+                            for j in evidence.run_index.positions('NORM'):
                                 if int(size_type[l]) == j:
                                     number = int(input("please enter %s number:" % j))
                                     # number = 200
-                                    for ii in range(number):
-                                        data_set.append(data_set[int(size_type[l])])
+                                    weights[int(size_type[l])] += number
                     if event[i] == "SGTR":
                         size_type = input("please enter SGTR size(201~300):")
                         # size_type = [39,40]
                         size_type = size_type.split(",")
                         for l in range(len(size_type)):
-                            for j in range(205, 305):
+                            for j in evidence.run_index.positions('SGTR'):
                                 if int(size_type[l]) == j:
                                     number = int(input("please enter %s number:" % j))
                                     # number = 200
-                                    for ii in range(number):
-                                        data_set.append(data_set[int(size_type[l])])
+                                    weights[int(size_type[l])] += number
             if data_increase == 'no':
                 pass
     evidence_set = pd.DataFrame(data_set)
-    evidence_set.columns = ["始发事件", "稳压器压力", "稳压器水位", "上充流量", "SG1给水流量", "SG1出口压力", "SG1出口蒸汽流量", "主蒸汽母管压力", "安全壳压力", "安全壳温度","安全壳放射性", "地坑水位", "冷却剂平均温度"]
+    evidence_set.columns = ["始发事件"] + CHANNEL_NAMES_ZH
+    evidence_set = with_weights(evidence_set, weights)
     evidence_set.to_csv(evidence_set_path,encoding='utf_8_sig')
     train_path = "D:/Bayesian inference/traindata1/train_data.csv"
     test_path = "D:/Bayesian inference/testdata1/test_data.csv"
@@ -409,24 +336,15 @@ for i in range(1,60):
     if os.path.exists(test_path):
         os.remove(test_path)
     data_path = "D:/Bayesian inference/traindata1/data1/train_set.csv"
-    df = pd.read_csv(data_path,index_col=0)
+    df, weights = read_weighted(data_path)
     train_rate = 0.8
     # Refine = str(input("Have you further subdivided the initial event?(yes/no):"))
     # print(data_increase)
     if Refine == 'yes':
-        # num_tup = np.array([5216,782,261,2639,174,58,1000001,1472,53,13])  # 四类始发事件样本数
-        if data_increase == 'yes':
-            num_tup = np.array([11, 31, 58, 11, 26, 63, 100, 14, 32, 54]) #平均
-            # num_tup = np.array([6, 31, 63, 5, 36, 59, 100, 11, 38, 51]) #48s
-            # num_tup = np.array([14, 30, 56, 7, 22, 71, 100, 15, 39, 46]) #34s
-            # num_tup = np.array([14,33,53,11,25,64,100,19,14,67]) #20s
-            # num_tup = np.array([11, 29, 60, 21, 21, 58, 100, 11, 38, 51]) #6s
-        if data_increase == 'no':
-            um_tup = np.array([11, 31, 58, 11, 26, 63, 5, 14, 32, 54])  # 平均
-            # num_tup = np.array([6, 31, 63, 5, 36, 59, 5, 11, 38, 51])  # 48s
-            # num_tup = np.array([14, 30, 56, 7, 22, 71, 5, 15, 39, 46]) #34s
-            # num_tup = np.array([14, 33, 53, 11, 25, 64, 5, 19, 14, 67]) #20S
-            # num_tup = np.array([11, 29, 60, 21, 21, 58, 5, 11, 38, 51]) #6s
+        # 每个子类的样本数取自刚写出的证据文件：运行索引划分的子类，按增加事件后的样本数计
+        labels = df['始发事件'].values
+        num_tup = np.array([weighted_count(weights, labels == x) for x in
+                            ['SLOCA', 'MLOCA', 'LLOCA', 'SMSLB', 'MMSLB', 'LMSLB', 'NORM', 'SSGTR', 'MSGTR', 'LSGTR']])
         num_train_tup = np.array([(int)(round(i * train_rate)) for i in num_tup])  # round函数对数进行四舍五入处理
         num_test_tup = num_tup - num_train_tup
         # 定义分层抽样的字典，格式为：组名：数据个数
@@ -436,27 +354,24 @@ for i in range(1,60):
                               'SSGTR': num_test_tup[7],'MSGTR': num_test_tup[8],'LSGTR': num_test_tup[9]}  # 此处要根据不同的事件类型的总数设置抽样的数据
         # print(typicalNDict_train,typicalNDict_test)
     if Refine == 'no':
-        num_tup = np.array([100, 100, 1, 100])   # 四类始发事件样本数
+        # 四类始发事件样本数（按增加事件后的样本数计）
+        labels = df['始发事件'].values
+        num_tup = np.array([weighted_count(weights, labels == x) for x in ['LOCA', 'MSLB', 'NORM', 'SGTR']])
         num_train_tup = np.array([(int)(round(i*train_rate)) for i in num_tup])   # round函数对数进行四舍五入处理
         num_test_tup = num_tup - num_train_tup
         # 定义分层抽样的字典，格式为：组名：数据个数
         typicalNDict_train = {'LOCA': num_train_tup[0], 'MSLB': num_train_tup[1], 'NORM': num_train_tup[2], 'SGTR': num_train_tup[3]}  # 此处要根据不同的事件类型的总数设置抽样的数据
         typicalNDict_test = {'LOCA': num_test_tup[0], 'MSLB': num_test_tup[1], 'NORM': num_test_tup[2], 'SGTR': num_test_tup[3]}  # 此处要根据不同的事件类型的总数设置抽样的数据
-    #定义抽样函数
-    def typicalsamling(group, typicalNDict):
-        name = group.name
-        n = typicalNDict[name]
-        return group.sample(n=n)
     def load_data():
         data_path = "D:/Bayesian inference/traindata1/train_data.csv"
-        df = pd.read_csv(data_path,index_col=0)
+        df, weights = read_weighted(data_path)
         data = df.values
-        return data
+        return data, weights
     # a = load_data()
     # print(a)
     ##极大似然估计
 
-    def trainNB(data):
+    def trainNB(data, weights):
         labels = data[:,0]
         # SLOCA = (sum([1 for l in labels if l == 'SLOCA']) + 1)/ float(len(labels)+9)
         # MLOCA = (sum([1 for l in labels if l == 'MLOCA']) + 1)/ float(len(labels)+9)
@@ -499,6 +414,8 @@ for i in range(1,60):
         NBClassify = {'SLOCA':{},'MLOCA':{},'LLOCA':{},'SMSLB':{},'MMSLB':{},'LMSLB':{},'NORM':{},'SSGTR':{},'MSGTR':{},'LSGTR':{}}
         for label in NBClassify.keys():
             sub_data = data[data[:,0] == label]
+            # 每行代表的样本数（utils.evidence_weights），计数按样本数加权
+            sub_weights = weights[data[:,0] == label]
             # sub_data = pd.DataFrame(sub_data)
             # print(pd.DataFrame(sub_data))
             sub_data = np.array(sub_data)
@@ -509,17 +426,17 @@ for i in range(1,60):
                 # print(len(d))
                 # print(tags)
                 def lapulas():
-                    return 1/float(float((len(d) + len(tags))))
+                    return 1/float(float((sub_weights.sum() + len(tags))))
                 NBClassify[label][k] = defaultdict(lapulas)
                 for tag in tags:
                     a = 0
-                    a += sum([1 for i in d if i == tag])
+                    a += weighted_count(sub_weights, d == tag)
                     # print(a)
                     if a != 0:
-                        NBClassify[label][k][tag] = (a + 1 ) /float((len(d) + len(tags)))#添加拉普拉斯平滑
+                        NBClassify[label][k][tag] = (a + 1 ) /float((sub_weights.sum() + len(tags)))#添加拉普拉斯平滑
 
                     else:
-                        NBClassify[label][k][tag] = 1 / float((len(d) + len(tags)))
+                        NBClassify[label][k][tag] = 1 / float((sub_weights.sum() + len(tags)))
         # print(pd.DataFrame(NBClassify))
         # print(NBClassify)
 
@@ -596,25 +513,24 @@ for i in range(1,60):
         return np.array(predict_vec)
     acuracy = []
     for i in range(300):
-        train_data = df.groupby('始发事件').apply(typicalsamling, typicalNDict_train)
-        train_data.drop(columns='始发事件',inplace=True)
-        train_data.reset_index(inplace=True)
-        train_data.set_index(train_data.columns[1],inplace=True)
+        # 分层抽样：按样本数从每类的全部样本中抽取，抽中的次数记为训练集的样本数，其余归测试集
+        train_weights, test_weights = split_weights(df['始发事件'].values, weights, typicalNDict_train)
+        train_data = with_weights(df, train_weights)
         # print(train_data)
-        test_data = df[~df.index.isin(train_data.index)]
+        test_data = with_weights(df, test_weights)
         # print(test_data)
         train_data.to_csv(train_path,encoding='utf_8_sig')
         test_data.to_csv(test_path,encoding='utf_8_sig')
 
-        a = pd.read_csv("D:/Bayesian inference/testdata1/test_data.csv",index_col=0)
+        a, test_weights = read_weighted("D:/Bayesian inference/testdata1/test_data.csv")
         b = a.values.tolist()
         b = np.array(b)
         # print(b.shape[0])
         test = a.drop(axis=1,columns=['始发事件']).values.tolist()
         # print(test)
         # print(len(test))
-        data = load_data()
-        SLOCA1,MLOCA1,LLOCA1,SMSLB1,MMSLB1,LMSLB1,NORM1,SSGTR1,MSGTR1,LSGTR1,NBClassify1 = trainNB(data)
+        data, data_weights = load_data()
+        SLOCA1,MLOCA1,LLOCA1,SMSLB1,MMSLB1,LMSLB1,NORM1,SSGTR1,MSGTR1,LSGTR1,NBClassify1 = trainNB(data, data_weights)
         # print(LOCA,MSLB,NORM,SGTR)
         # print(NBClassify1)
         predict_vec = testNB(test,SLOCA1,MLOCA1,LLOCA1,SMSLB1,MMSLB1,LMSLB1,NORM1,SSGTR1,MSGTR1,LSGTR1,NBClassify1)
@@ -626,17 +542,17 @@ for i in range(1,60):
         sd2 = []
         for i in range(len(predict_vec)):
             if predict_vec[i] == b[i,0]:
-                count += 1
+                count += test_weights[i]
             else:
                 sd0 = [predict_vec[i],b[i,0]]
                 if predict_vec[i][-4:] == b[i,0][-4:]:
-                    same += 1
+                    same += test_weights[i]
                     sd1.append(sd0)
                     # print(predict_vec[i], b[i, 0])
                 else:
                     sd2.append(sd0)
                     # print(predict_vec[i], b[i, 0])
-                    different += 1
+                    different += test_weights[i]
                 # print(predict_vec[i],b[i,0])
         sd1 = np.array(sd1)
         sd1 = np.array(list(set(tuple(t) for t in sd1)))
@@ -649,7 +565,7 @@ for i in range(1,60):
         # print('大类错误：',different)
         # print('大类错误类型:')
         # print(sd2)
-        accuracy0 = count/len(predict_vec)
+        accuracy0 = count/test_weights.sum()
         # print('准确率:',accuracy0)
         acuracy.append(accuracy0)
     a_max = np.max(acuracy)
@@ -1,6 +1,10 @@
 import pandas as pd
 import numpy as np
+import os
+import sys
 from collections import defaultdict
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from utils.evidence_weights import read_weighted, weighted_count
 # import ma
 # import heapq
 pd.set_option('display.max_columns', 1000)
@@ -11,22 +15,24 @@ pd.set_option('display.unicode.east_asian_width', True)
 
 def load_data():
     data_path = "D:/Bayesian inference/traindata1/train_data.csv"
-    df = pd.read_csv(data_path,index_col=0)
+    df, weights = read_weighted(data_path)
     data = df.values
-    return data
+    return data, weights
 # a = load_data()
 # print(a)
 ##极大似然估计
 
-def trainNB(data):
+def trainNB(data, weights):
     labels = data[:,0]
-    LOCA = (sum([1 for l in labels if l == 'LOCA']) + 1)/ float(len(labels)+4)
-    MSLB = (sum([1 for l in labels if l == 'MSLB']) + 1)/ float(len(labels)+4)
-    NORM = (sum([1 for l in labels if l == 'NORM']) + 1)/ float(len(labels)+4)
-    SGTR = (sum([1 for l in labels if l == 'SGTR']) + 1)/ float(len(labels)+4)
+    LOCA = (weighted_count(weights, labels == 'LOCA') + 1)/ float(weights.sum()+4)
+    MSLB = (weighted_count(weights, labels == 'MSLB') + 1)/ float(weights.sum()+4)
+    NORM = (weighted_count(weights, labels == 'NORM') + 1)/ float(weights.sum()+4)
+    SGTR = (weighted_count(weights, labels == 'SGTR') + 1)/ float(weights.sum()+4)
     NBClassify = {'LOCA':{},'MSLB':{},'NORM':{},'SGTR':{}}
     for label in NBClassify.keys():
         sub_data = data[data[:,0] == label]
+        # 每行代表的样本数（utils.evidence_weights），计数按样本数加权
+        sub_weights = weights[data[:,0] == label]
         # sub_data = pd.DataFrame(sub_data)
         # print(pd.DataFrame(sub_data))
         sub_data = np.array(sub_data)
@@ -37,17 +43,17 @@ def trainNB(data):
             # print(len(d))
             # print(tags)
             def lapulas():
-                return 1/float(float((len(d) + len(tags))))
+                return 1/float(float((sub_weights.sum() + len(tags))))
             NBClassify[label][k] = defaultdict(lapulas)
             for tag in tags:
                 a = 0
-                a += sum([1 for i in d if i == tag])
+                a += weighted_count(sub_weights, d == tag)
                 # print(a)
                 if a != 0:
-                    NBClassify[label][k][tag] = (a + 1 ) /float((len(d) + len(tags)))#添加拉普拉斯平滑
+                    NBClassify[label][k][tag] = (a + 1 ) /float((sub_weights.sum() + len(tags)))#添加拉普拉斯平滑
 
                 else:
-                    NBClassify[label][k][tag] = 1 / float((len(d) + len(tags)))
+                    NBClassify[label][k][tag] = 1 / float((sub_weights.sum() + len(tags)))
             # print(NBClassify[label][k])
     # print(NBClassify)
     return LOCA,MSLB,NORM,SGTR,NBClassify
@@ -88,23 +94,23 @@ def testNB(data,LOCA1,MSLB1,NORM1,SGTR1,NBClassify1):
             predict_vec.append('SGTR')
     return np.array(predict_vec)
 if __name__ == "__main__":
-    a = pd.read_csv("D:/Bayesian inference/testdata1/test_data.csv",index_col=0)
+    a, test_weights = read_weighted("D:/Bayesian inference/testdata1/test_data.csv")
     b = a.values.tolist()
     b = np.array(b)
     # print(b.shape[0])
     test = a.drop(axis=1,columns=['始发事件']).values.tolist()
     # print(test)
     # print(len(test))
-    data = load_data()
-    LOCA1,MSLB1,NORM1,SGTR1,NBClassify1 = trainNB(data)
+    data, weights = load_data()
+    LOCA1,MSLB1,NORM1,SGTR1,NBClassify1 = trainNB(data, weights)
     # print(LOCA,MSLB,NORM,SGTR)
     predict_vec = testNB(test,LOCA1,MSLB1,NORM1,SGTR1,NBClassify1)
     # print(predict_vec.shape[0])
     count = 0
     for i in range(len(predict_vec)):
         if predict_vec[i] == b[i,0]:
-            count += 1
+            count += test_weights[i]
         else:
             print(predict_vec[i],b[i,0])
-    accuracy = count/len(predict_vec)
+    accuracy = count/test_weights.sum()
     print(accuracy)
\ No newline at end of file
@@ -1,7 +1,9 @@
+import os
+import sys
 import numpy as np
 import pandas as pd
 import torch
-from sklearn.preprocessing import LabelEncoder, MinMaxScaler
+from sklearn.preprocessing import LabelEncoder
 from sklearn.model_selection import train_test_split
 from torch.utils.data import TensorDataset
 from torch.utils.data import DataLoader
@@ -9,17 +11,16 @@ from torch import nn
 import torch.nn.functional as F
 import time
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from utils.balancing import balanced_sampler, loss_weight
+from utils.channels import CHANNEL_NAMES
+from utils.checkpoint import Checkpointer
+from utils.convergence import Convergence
+from utils.dataset_store import DatasetStore, fingerprint, is_store
+from utils.evaluation import Evaluator
+from utils.scaler import chunked, load_or_fit
+from utils.windows import SlidingWindows
 
-def slicewindow(data, time_length):
-    '''
-    
-    '''
-    X = []
-    for i in range(0, len(data) - time_length + 1, time_length):
-        end = i + time_length
-        oneX = data[i:end, :]
-        X.append(oneX)
-    return np.asarray(X, dtype='float64')
 
 '''
 50s的卷积神经网络
@@ -74,25 +75,70 @@ if __name__ == "__main__":
     time_start = time.time()
     time_sequence_length = 20
     interpolation_number = 3
-    total_dataset_path = 'C:/Users/1/Desktop/total_dataset' + str(time_sequence_length) + str(interpolation_number) + '.csv'
-    total_labelset_path = 'C:/Users/1/Desktop/total_labelset' + str(time_sequence_length) + str(interpolation_number) + '.csv'
-    dataset = pd.read_csv(total_dataset_path, index_col=0)
-    labelset = pd.read_csv(total_labelset_path, index_col=0)
-    min_max_scaler = MinMaxScaler()
-    min_max_scaler.fit(dataset)
-    data = min_max_scaler.transform(dataset)
-    X = slicewindow(data, time_sequence_length)
+    # the 12 channels the kernels were laid out for
+    channels = CHANNEL_NAMES
+    # 每次运行按完整分辨率（run_length行）只存一份，训练时从中截取time_sequence_length行的窗口；
+    # 数据集由本目录的sequence_data_interpolation.py写出
+    run_length = 60
+    total_dataset_path = './processed_data/CNN_total_dataset' + str(run_length) + str(interpolation_number)
+    # 归一化只在训练集的窗口上分块拟合（'minmax'或'standard'），与模型保存在一起，数据和划分不变时直接读取
+    scaler_kind = 'minmax'
+    scaler_chunk = 4096
+    scaler_path = './models/CNN' + str(time_sequence_length) + str(interpolation_number) + '_scaler.json'
+    # 类别平衡（utils.balancing），权重取自训练集标签，不复制样本：'loss'按类别加权交叉熵，'sampler'按类别等概率抽样，None不平衡
+    balance = 'loss'
+    # 测试集评估（utils.evaluation，不建计算图）：每eval_steps步和/或每eval_seconds秒一次；
+    # eval_background为True时在后台线程上评估权重的副本，不阻塞训练
+    eval_steps = 10
+    eval_seconds = None
+    eval_background = False
+    # 每checkpoint_epochs轮和/或每checkpoint_seconds秒保存一次检查点（模型、优化器、随机数状态和轮数，
+    # utils.checkpoint，在后台线程写入），重新运行时从最近的检查点继续；测试准确率最高的权重另存为best_model_path
+    epochs = 5000
+    checkpoint_path = './models/CNN' + str(time_sequence_length) + str(interpolation_number) + '_checkpoint.pth'
+    best_model_path = './models/CNN' + str(time_sequence_length) + str(interpolation_number) + '.pth'
+    checkpoint_epochs = 10
+    checkpoint_seconds = None
+    # 提前停止（utils.convergence）：测试集损失连续patience次评估的改善都不超过min_delta，或训练超过max_seconds秒时停止；
+    # lr_factor：连续lr_patience次评估没有改善时学习率乘以它（None时学习率不变）
+    monitor = 'loss'
+    patience = 30
+    min_delta = 1e-4
+    lr_factor = 0.6
+    lr_patience = 10
+    max_seconds = None
+    if is_store(total_dataset_path):
+        # binary store written by sequence_data_interpolation.py, labels stored alongside
+        store = DatasetStore(total_dataset_path)
+        dataset = store.read(channels)
+        labelset = pd.DataFrame({'0': store.labels})
+    else:
+        # export_csv导出的csv（没有行索引列）
+        total_labelset_path = './processed_data/CNN_total_labelset' + str(run_length) + str(interpolation_number) + '.csv'
+        dataset = pd.read_csv(total_dataset_path + '.csv', dtype='float32')[channels]
+        labelset = pd.read_csv(total_labelset_path, dtype={'0': str})
+    data = np.asarray(dataset)
     y = np.array(labelset['0'])
     encoder = LabelEncoder()
     encoder.fit(y)
     y = encoder.transform(y)
-    X_train, X_test, Y_train, Y_test = train_test_split(X, y, test_size=0.2, random_state=6, stratify=y)
-    X_train, Y_train = torch.FloatTensor(X_train), torch.LongTensor(Y_train)
+    # 不复制数据的float32滑动窗口视图：每次运行取前time_sequence_length行，窗口不跨越两次运行；
+    # CNN20的全连接层按20行的窗口设计
+    windows = SlidingWindows(data, time_sequence_length, run_length, run_length=run_length, run_labels=y)
+    train_index, test_index = train_test_split(np.arange(len(windows)), test_size=0.2, random_state=6,
+                                               stratify=windows.labels)
+    scaler = load_or_fit(scaler_path, (windows[x] for x in chunked(train_index, scaler_chunk)), scaler_kind,
+                         dataset=total_dataset_path, fingerprint=fingerprint(total_dataset_path), channels=channels,
+                         train_windows=len(train_index))
+    X_train, X_test = windows[train_index], windows[test_index]
+    X_train, Y_train = torch.from_numpy(scaler.transform(X_train, out=X_train)), torch.from_numpy(windows.labels[train_index])
     print(X_train.size())
-    X_test, Y_test = torch.FloatTensor(X_test), torch.LongTensor(Y_test)
+    X_test, Y_test = torch.from_numpy(scaler.transform(X_test, out=X_test)), torch.from_numpy(windows.labels[test_index])
     train_dataset = TensorDataset(X_train, Y_train)
     test_dataset = TensorDataset(X_test, Y_test)
-    train_loader = DataLoader(dataset=train_dataset, batch_size=len(X_train), shuffle=True, num_workers=6)
+    sampler = balanced_sampler(windows.labels[train_index]) if balance == 'sampler' else None
+    train_loader = DataLoader(dataset=train_dataset, batch_size=len(X_train), shuffle=sampler is None, sampler=sampler,
+                              num_workers=6)
     test_loader = DataLoader(dataset=test_dataset, batch_size=len(X_test), shuffle=True, num_workers=6)
 
     cnn = CNN20()
@@ -100,9 +146,33 @@ if __name__ == "__main__":
     device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
     cnn.to(device)
     optimizer = torch.optim.Adam(cnn.parameters(), lr=0.01)
-    loss_func = nn.CrossEntropyLoss()
-    accuracy_list = []
-    for epoch in range(5000):
+    class_weight = loss_weight(windows.labels[train_index], cnn.fc2.out_features, balance)
+    loss_func = nn.CrossEntropyLoss(weight=None if class_weight is None else class_weight.to(device))
+    # 测试集只变形并传到设备上一次
+    X_test = X_test.view(len(X_test), -1, time_sequence_length, 12).to(device)
+    Y_test = Y_test.to(device)
+    checkpointer = Checkpointer(checkpoint_path, best_model_path, every_epochs=checkpoint_epochs,
+                                every_seconds=checkpoint_seconds, generators=(getattr(sampler, 'generator', None),))
+
+    convergence = Convergence(monitor, patience, min_delta, optimizer, lr_factor, lr_patience, max_seconds=max_seconds)
+
+    def report(result, model):
+        print('Epoch:', result.info['epoch'], '| train loss: %.4f' % result.info['loss'],
+              '| test loss: %.4f' % result.loss, '| test accuracy: %.2f' % result.accuracy)
+        checkpointer.track(result.accuracy, model)
+        convergence.observe(result)
+
+    evaluator = Evaluator(cnn, (X_test,), Y_test, every_steps=eval_steps, every_seconds=eval_seconds,
+                          loss_func=loss_func, background=eval_background, callback=report)
+    start_epoch, state = checkpointer.resume(cnn, optimizer)
+    if 'evaluation' in state:
+        evaluator.load_state_dict(state['evaluation'])
+    if 'convergence' in state:
+        convergence.load_state_dict(state['convergence'])
+    epochs_done = start_epoch
+    for epoch in range(start_epoch, epochs):
+        if convergence.stop():
+            break
         for step, (b_x, b_y) in enumerate(train_loader):
             b_x = b_x.view(len(X_train), -1, time_sequence_length, 12)
             b_x, b_y = b_x.to(device), b_y.to(device)
@@ -112,18 +182,20 @@ if __name__ == "__main__":
             optimizer.zero_grad()
             loss.backward()
             optimizer.step()
-            if step % 10 == 0:
-                X_test = X_test.view(len(X_test), -1, time_sequence_length, 12)
-                X_test = X_test.to(device)
-                Y_test = Y_test.to(device)
-                test_out = cnn(X_test)
-                pred_y = torch.max(test_out, 1)[1].data
-                accuracy = pred_y.eq(Y_test.data.view_as(pred_y)).cpu().sum() / len(Y_test)
-                accuracy_list.append(accuracy)
-                print('Epoch:', epoch, '| train loss: %.4f' % loss.data.numpy(), '| test accuracy: %.2f' % accuracy)
-    print('max accuracy:{}'.format(max(accuracy_list)))
-    test_output = cnn(X_test[:20].view(20, -1, time_sequence_length, 12))
-    pred_y = torch.max(test_output, 1)[1].data.numpy()
+            evaluator.step(epoch=epoch, loss=loss.detach())
+            if convergence.stop():
+                break
+        epochs_done = epoch + 1
+        checkpointer.step(epoch, cnn, optimizer, force=epoch == epochs - 1 or convergence.stopped,
+                          evaluation=evaluator.state_dict(), convergence=convergence.state_dict())
+    evaluator.wait()
+    checkpointer.wait()
+    print(convergence.summary(epochs_done, epochs))
+    accuracy_list = evaluator.accuracies
+    print('max accuracy:{}'.format(max(accuracy_list)), '| weights saved in', best_model_path)
+    with torch.inference_mode():
+        test_output = cnn(X_test[:20])
+    pred_y = torch.max(test_output, 1)[1].cpu().numpy()
     print(pred_y, 'pred number')
     print(Y_test[:10], 'real number')
     time_end = time.time()
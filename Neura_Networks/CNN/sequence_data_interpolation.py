@@ -1,56 +1,43 @@
 import pandas as pd
-import math
 import time
-import numpy as np
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from utils.dataset_store import DatasetStore, is_store, write_dataset
+from utils.interpolation import interpolate_blocks, interpolated_blocks, sub_class_labels
+from utils.run_index import load_run_index
 class Interpolation:
     def __init__(self,path,interpalation_times,time_length):
         self.path = path
-        self.data = pd.read_csv(self.path, index_col=0).fillna(axis=0, method='ffill')
-        # self.data.drop('12',axis=1,inplace=True)
+        # dataset<T>是utils.dataset_store的二进制存储（或旧的csv，没有行索引列），每列是一个通道（utils.channels）
+        if is_store(self.path):
+            self.data = DatasetStore(self.path).to_frame().ffill()
+        else:
+            self.data = pd.read_csv(self.path + '.csv', dtype='float32').ffill()
         self.interpolation_times = interpalation_times
-        self.LOCA_data = self.data[0:2000]
-        self.MSLB_data = self.data[2000:4000]
-        self.SGTR_data = self.data[4000:6000]
-        self.NORM_data = self.data[6000:6100]
         self.time_length = time_length
+        # 各类事故的行号取自数据集的运行索引（utils.run_index），没有索引时按每类100次运行
+        self.run_index = load_run_index(self.path, time_length)
+        self.LOCA_data = self.data[self.run_index.rows('LOCA')]
+        self.MSLB_data = self.data[self.run_index.rows('MSLB')]
+        self.SGTR_data = self.data[self.run_index.rows('SGTR')]
+        self.NORM_data = self.data[self.run_index.rows('NORM')]
         self.total_label = []
     @staticmethod
-    def interpolation(data, time_length):
-        data = data.copy()
-        data_1 = data[time_length:data.shape[0]] #方便插值，去掉尺寸为0.01的样本
-        data_1.index = range(data_1.shape[0])
-        data_2 = data[0:(data.shape[0] - time_length)] #方便插值，去掉尺寸为1的样本
-        data_2.index = range(data_2.shape[0])
-        data_interpolation = (data_1 + data_2) / 2
-        data_interpolation = data_interpolation.assign(order = np.arange(1, data_interpolation.shape[0], 2).repeat(time_length)[:data_interpolation.shape[0]]) #添加order方便将数据插入到指定位置
-        data = data.assign(order = np.arange(0, data.shape[0], 2).repeat(time_length)[:data.shape[0]])
-        data_out = pd.concat([data, data_interpolation], axis=0, ignore_index=True)
-        data_out = data_out.assign(sub_order = np.arange(0,data_out.shape[0]))
-        # data_out.to_csv('C:/Users/1/Desktop/no.csv')
-        data_out.sort_values(['order','sub_order'], ascending=[True, True], inplace=True)
-        # data_out.to_csv('C:/Users/1/Desktop/yes.csv')
-        data_out.drop(['order','sub_order'], axis=1, inplace=True)
-        data_out = data_out.reset_index(drop=True)
-        return data_out
+    def interpolation(data, time_length, levels=1):
+        # 在相邻两个样本（time_length行一块）之间插入均值，levels次插值一次算完
+        values = interpolate_blocks(data.values, time_length, levels)
+        return pd.DataFrame(values, columns=data.columns)
     def cyclic_interpolation(self):
-        for i in range(self.interpolation_times):
-            self.LOCA_data = self.interpolation(self.LOCA_data, self.time_length)
-            self.MSLB_data = self.interpolation(self.MSLB_data, self.time_length)
-            self.SGTR_data = self.interpolation(self.SGTR_data, self.time_length)
-            self.NORM_data = self.interpolation(self.NORM_data, self.time_length)
+        self.LOCA_data = self.interpolation(self.LOCA_data, self.time_length, self.interpolation_times)
+        self.MSLB_data = self.interpolation(self.MSLB_data, self.time_length, self.interpolation_times)
+        self.SGTR_data = self.interpolation(self.SGTR_data, self.time_length, self.interpolation_times)
+        self.NORM_data = self.interpolation(self.NORM_data, self.time_length, self.interpolation_times)
         total_data = pd.concat([self.LOCA_data, self.MSLB_data, self.SGTR_data, self.NORM_data], axis=0, ignore_index=False)
         total_data = total_data.reset_index(drop=True)
         return total_data
-    @staticmethod
-    def accident_label(small_number, medium_number, large_number, label_number):
-        label = []
-        for i in range(small_number):
-            label.append(str(label_number))
-        for i in range(small_number, medium_number):
-            label.append(str(label_number + 1))
-        for i in range(medium_number, large_number):
-            label.append(str(label_number + 2))
-        return label
+    def accident_label(self, accident, data):
+        return [str(x) for x in sub_class_labels(accident, int(data.shape[0] / self.time_length))]
     def add_label(self):
         '''
         直接按比例添加
@@ -58,29 +45,14 @@ class Interpolation:
         MSLB:11,26,63
         SGTR:14,32,54
         '''
-        LOCA_num = int(self.LOCA_data.shape[0] / self.time_length)
-        MSLB_num = int(self.MSLB_data.shape[0] / self.time_length)
-        SGTR_num = int(self.SGTR_data.shape[0] / self.time_length)
-        NORM_num = int(self.NORM_data.shape[0] / self.time_length)
-        SLOCA = math.ceil(LOCA_num * 0.11)
-        MLOCA = math.ceil(LOCA_num * 0.31)
-        LLOCA = LOCA_num
-        LOCA_label = self.accident_label(SLOCA, MLOCA, LLOCA, 0)
+        LOCA_label = self.accident_label('LOCA', self.LOCA_data)
         # self.LOCA_data['label'] = LOCA_label
-        SMSLB = math.ceil(MSLB_num * 0.11)
-        MMSLB = math.ceil(MSLB_num * 0.26)
-        LMSLB = MSLB_num
-        MSLB_label = self.accident_label(SMSLB, MMSLB, LMSLB, 3)
+        MSLB_label = self.accident_label('MSLB', self.MSLB_data)
         # self.MSLB_data['label'] = MSLB_label
-        SSGTR = math.ceil(SGTR_num * 0.14)
-        MSGTR = math.ceil(SGTR_num * 0.32)
-        LSGTR = SGTR_num
-        SGTR_label = self.accident_label(SSGTR, MSGTR, LSGTR, 6)
+        SGTR_label = self.accident_label('SGTR', self.SGTR_data)
         # self.SGTR_data['label'] = SGTR_label
         #添加正常工况标签
-        NORM_label = []
-        for i in range(NORM_num):
-            NORM_label.append('9')
+        NORM_label = self.accident_label('NORM', self.NORM_data)
         # self.NORM_data['label'] = NORM_label
         self.total_label = LOCA_label + MSLB_label + SGTR_label + NORM_label
         self.total_label = pd.DataFrame(self.total_label)
@@ -90,29 +62,38 @@ if __name__ == "__main__":
     # if os.path.exists('D:\\deeplearning\\dataset3'):
     #     shutil.rmtree('D:\\deeplearning\\dataset3')
     # os.mkdir('D:\\deeplearning\\dataset3')
+    # 每次运行的行数：按完整分辨率插值，CNN.py再从中截取time_sequence_length行的窗口
+    time_length = 60
+    # 上一步genarate_sequence_data.py生成的数据集（相对路径）
+    time_dataset_path = './sequence_data/dataset' + str(time_length)
+    run_index = load_run_index(time_dataset_path, time_length)
     while True:
         interpolation_number = input('请输入插值次数（正整数）：')
         if not (interpolation_number.isdigit()):
             print('输入错误请重新输入！')
         else:
             interpolation_number = int(interpolation_number)
-            samples_number = ((2**interpolation_number - 1)*99 + 100)*3 + ((2**interpolation_number - 1)*4 + 5)
-            samples_growth = samples_number/305
+            samples_number = sum(interpolated_blocks(len(run_index.positions(x)), interpolation_number)
+                                 for x in run_index.accident_types)
+            samples_growth = samples_number/len(run_index)
             print('样本数将达到{}个，增长了{:.2%}'.format(samples_number, samples_growth))
             go_on = input('是否继续(Y/N):')
             if (go_on == 'Y'):
                 break
             else:
                 continue
-    # for time_dataset in os.listdir('D:\\deeplearning\\dataset1'):
-    time_length = 20
-    time_dataset_path = 'C:/Users/1/Desktop/dataset' + str(time_length) + '.csv'
+    # export_csv：另外在存储旁边写一份csv（数据集和标签）
+    export_csv = False
     chazhi = Interpolation(time_dataset_path, interpolation_number, time_length)
     total_dataset = chazhi.cyclic_interpolation()
     total_labelset = chazhi.add_label()
-    total_dataset_path = 'C:/Users/1/Desktop/total_dataset' + str(time_length)  + str(interpolation_number) + '.csv'
-    total_labelset_path = 'C:/Users/1/Desktop/total_labelset' + str(time_length)  + str(interpolation_number) + '.csv'
-    total_dataset.to_csv(total_dataset_path)
-    total_labelset.to_csv(total_labelset_path)
+    # 插值后的数据集写成processed_data下CNN自己的存储，每个窗口的标签存在一起（labels.npy）
+    os.makedirs('./processed_data', exist_ok=True)
+    total_dataset_path = './processed_data/CNN_total_dataset' + str(time_length) + str(interpolation_number)
+    write_dataset(total_dataset_path, total_dataset, labels=total_labelset[0].values, window_length=time_length)
+    if export_csv:
+        total_labelset_path = './processed_data/CNN_total_labelset' + str(time_length) + str(interpolation_number) + '.csv'
+        total_dataset.to_csv(total_dataset_path + '.csv', index=False)
+        total_labelset.to_csv(total_labelset_path, index=False)
     time_end = time.time()
     print('总共用时：', time_end - time_start)
\ No newline at end of file
@@ -1,44 +1,73 @@
 #数据集划分
+import os
+import sys
 import torch
 import pandas as pd
 from torch.utils.data import DataLoader
 from torch.utils.data import TensorDataset
-from sklearn.preprocessing import LabelEncoder,MinMaxScaler
+from sklearn.preprocessing import LabelEncoder
 from sklearn.model_selection import train_test_split
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from utils.balancing import balanced_sampler, loss_weight
+from utils.dataset_store import DatasetStore, fingerprint, is_store
+from utils.scaler import StreamingScaler, chunked, load_or_fit
 class pro_data:
-    def __init__(self, data_path, test_size, seed, train_batch_size, test_batch_size, num_workers):
+    # scaler_path: 归一化参数保存的位置（模型旁边），数据和划分不变时直接读取；None则每次重新拟合
+    # balance: 类别平衡（utils.balancing），'loss'按类别加权损失（class_weight），'sampler'按类别等概率抽样，None不平衡
+    def __init__(self, data_path, test_size, seed, train_batch_size, test_batch_size, num_workers,
+                 scaler_path=None, scaler_kind='minmax', scaler_chunk=65536, balance=None):
         self.data_path = data_path
         self.test_size = test_size
         self.seed = seed
         self.train_batch_size = train_batch_size
         self.test_batch_size = test_batch_size
         self.num_workers = num_workers
+        self.scaler_path = scaler_path
+        self.scaler_kind = scaler_kind
+        self.scaler_chunk = scaler_chunk
+        self.scaler = None
+        self.balance = balance
+        self.class_weight = None
         self.X_train = []
         self.X_test = []
         self.Y_train = []
         self.Y_test = []
     def data_dividing(self):
-        data = pd.read_csv(self.data_path, index_col=0)
-        data = data.fillna(axis=0,method='ffill')
-        data = data.values
-        X = data[:, :-1].astype(float)
-        Y = data[:, -1]
+        # data_interpolation.py写出的存储（标签存在一起），或旧的csv（最后一列是标签）
+        if is_store(self.data_path):
+            store = DatasetStore(self.data_path)
+            # 特征直接读成float32，训练时与张量共享内存
+            X = store.to_frame().ffill().to_numpy(dtype='float32')
+            Y = store.labels
+        else:
+            data = pd.read_csv(self.data_path + '.csv', index_col=0)
+            data = data.ffill()
+            X = data.iloc[:, :-1].to_numpy(dtype='float32')
+            Y = data.iloc[:, -1].values
         encoder = LabelEncoder()
         encoder.fit(Y)
         Y = encoder.transform(Y)
         self.X_train, self.X_test, self.Y_train, self.Y_test = train_test_split(X, Y, test_size=0.2, random_state=self.seed, stratify=Y)
-        #归一化
-        min_max_scaler = MinMaxScaler()
-        min_max_scaler.fit(self.X_train)
-        self.X_train = min_max_scaler.transform(self.X_train)
-        min_max_scaler.fit(self.X_test)
-        self.X_test = min_max_scaler.transform(self.X_test)
+        #归一化：只在训练集上分块拟合，测试集和推理用同一组参数
+        chunks = (self.X_train[x] for x in chunked(range(len(self.X_train)), self.scaler_chunk))
+        if self.scaler_path is None:
+            self.scaler = StreamingScaler(self.scaler_kind).fit_chunks(chunks)
+        else:
+            self.scaler = load_or_fit(self.scaler_path, chunks, self.scaler_kind, dataset=self.data_path,
+                                      fingerprint=fingerprint(self.data_path), seed=self.seed,
+                                      train_rows=len(self.X_train))
+        self.scaler.transform(self.X_train, out=self.X_train)
+        self.scaler.transform(self.X_test, out=self.X_test)
+        self.class_weight = loss_weight(self.Y_train, 10, self.balance)
     def data_load(self):
-        X_train, Y_train = torch.FloatTensor(self.X_train), torch.LongTensor(self.Y_train)
-        X_test, Y_test = torch.FloatTensor(self.X_test), torch.LongTensor(self.Y_test)
+        X_train, Y_train = torch.from_numpy(self.X_train), torch.from_numpy(self.Y_train)
+        X_test, Y_test = torch.from_numpy(self.X_test), torch.from_numpy(self.Y_test)
         train_dataset = TensorDataset(X_train, Y_train)
         test_dataset = TensorDataset(X_test, Y_test)
-        train_loader = DataLoader(dataset=train_dataset, batch_size=self.train_batch_size, shuffle=True, num_workers=self.num_workers)
+        sampler = balanced_sampler(self.Y_train, seed=self.seed) if self.balance == 'sampler' else None
+        train_loader = DataLoader(dataset=train_dataset, batch_size=self.train_batch_size, shuffle=sampler is None,
+                                  sampler=sampler, num_workers=self.num_workers)
         test_loader = DataLoader(dataset=test_dataset, batch_size=self.test_batch_size, shuffle=True, num_workers=self.num_workers)
         print('长度：{}'.format(len(test_loader.dataset)))
         return train_loader, test_loader
@@ -69,7 +98,7 @@ def train(epoch):
         #     data, traget = data.cuda(), target.cuda()
         optimizer.zero_grad()
         output = model(data)
-        loss = F.cross_entropy(output, target)
+        loss = F.cross_entropy(output, target, weight=class_weight)
         loss.backward()
         optimizer.step() #更新所有参数
         total_loss += loss.item()
@@ -119,21 +148,23 @@ if __name__ == '__main__':
     import pandas as pd
     import numpy as np
     time_start = time.time()
-    dataset_path = 'D:/deeplearning/dataset3'
+    dataset_path = './dataset3'
     accuraccy = []
     # for subdataset in os.listdir(dataset_path):
-    subdataset = '10.csv'
+    subdataset = '10'
     model = Net()
     optimizer = optim.SGD(model.parameters(), lr=0.2, momentum=0.5)
     scheduler = torch.optim.lr_scheduler.ReduceLROnPlateau(optimizer, factor=0.6, mode='min', patience=20, verbose=True)
-    visual_path = ('./' + subdataset).replace('.csv','')
-    model_path = ('./' + subdataset).replace('csv','pth')
+    visual_path = './' + subdataset
+    model_path = './' + subdataset + '.pth'
     if os.path.exists(visual_path):
         shutil.rmtree(visual_path)
     writer = SummaryWriter(visual_path)
-    subdataset_path = 'D:/deeplearning/dataset3/' + subdataset
-    Pro_data = pro_data(subdataset_path, 0.3, 1, 5, 30824, 14)
+    subdataset_path = os.path.join(dataset_path, subdataset)
+    scaler_path = model_path.replace('.pth', '_scaler.json')
+    Pro_data = pro_data(subdataset_path, 0.3, 1, 5, 30824, 14, scaler_path=scaler_path, balance='loss')
     Pro_data.data_dividing()
+    class_weight = Pro_data.class_weight
     train_loader,test_loader = Pro_data.data_load()
     Acc = 0
     for epoch in range(1, 1500):
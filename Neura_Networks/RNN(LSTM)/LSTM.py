@@ -349,7 +349,7 @@
 # import torch
 # from sklearn.preprocessing import LabelEncoder, MinMaxScaler
 # from sklearn.model_selection import train_test_split
-# from torch.utils.data import TensorDataset, DataLoader
+# from torch.utils.data import TensorDataset, DataLoader, Subset
 # from torch import nn
 # import time
 
@@ -452,30 +452,34 @@
 #second gpt code
 
 #!/usr/bin/env python3
+import os
+import sys
 import numpy as np
 import pandas as pd
 import torch
-from sklearn.preprocessing import LabelEncoder, MinMaxScaler
+from sklearn.preprocessing import LabelEncoder
 from sklearn.model_selection import train_test_split
-from torch.utils.data import TensorDataset, DataLoader
+from torch.utils.data import TensorDataset, DataLoader, Subset
 from torch import nn
+from torch.nn.utils.rnn import pack_padded_sequence
 import time
 
-def slicewindow(data, time_length):
-    """
-    Create dataset with a sliding window.
-    Assumes data is 2D (num_samples, num_features) and returns a 3D
-    array of shape (num_windows, time_length, num_features).
-    """
-    X = []
-    for i in range(0, len(data) - time_length + 1, time_length):
-        end = i + time_length
-        oneX = data[i:end, :]
-        X.append(oneX)
-    return np.asarray(X, dtype='float64')
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from utils.balancing import balanced_sampler, loss_weight
+from utils.batching import TensorBatcher
+from utils.channels import CHANNEL_NAMES
+from utils.checkpoint import Checkpointer
+from utils.convergence import Convergence
+from utils.dataset_store import DatasetStore, fingerprint, is_store
+from utils.evaluation import Evaluator
+from utils.run_index import load_run_index
+from utils.scaler import chunked, load_or_fit
+from utils.sequences import RunSequences, SequenceBatcher, pad_runs
+from utils.window_dataset import AdjacentRunMixup, InterpolatedWindowDataset
+from utils.windows import SlidingWindows, leading_rows
 
 class RNN(nn.Module):
-    def __init__(self, input_size=10): # adjusted input_size to 10
+    def __init__(self, input_size=10): # one input per channel
         super(RNN, self).__init__()
         self.rnn = nn.LSTM(
             input_size=input_size,
@@ -484,78 +488,245 @@ class RNN(nn.Module):
             batch_first=True
         )
         self.out = nn.Linear(20, 10) # output layer remains as is (10 classes)
-    def forward(self, x):
-        r_out, (h_n, h_c) = self.rnn(x, None)
-        out = self.out(r_out[:, -1, :])
-        return out
+    def forward(self, x, lengths=None):
+        if lengths is None:
+            r_out, (h_n, h_c) = self.rnn(x, None)
+            out = self.out(r_out[:, -1, :])
+            return out
+        # Padded runs of different lengths: the packed LSTM stops at each run's last real row, and h_n (in batch
+        # order again) is the hidden state there, not after the padding
+        packed = pack_padded_sequence(x, lengths.cpu(), batch_first=True, enforce_sorted=False)
+        r_out, (h_n, h_c) = self.rnn(packed, None)
+        return self.out(h_n[-1])
 
 if __name__ == "__main__":
     time_start = time.time()
     time_length = 20
     interpolation_number = 3
+    # Channels the model is trained on (canonical names from utils.channels); only these columns are parsed
+    channels = CHANNEL_NAMES[2:]
+    # Build the interpolated windows on the fly instead of reading the materialised total_dataset<T><k>
+    lazy_interpolation = True
+    # True trains on the whole runs of sequence_data/dataset_whole (genarate_sequence_data.py with whole_runs),
+    # 60 s to about 3 min each, instead of time_length windows: run_batch_size runs of similar length per step,
+    # padded to the longest of them and packed (utils.sequences), each classified at its own last row
+    variable_length = False
+    run_batch_size = 16
+    # Rows per run in the stored datasets: every run is stored once at full resolution and the model's
+    # time_length window is cut from it as a view; datasets generated at time_length rows per run still work
+    run_length = 60
+    if not is_store('./sequence_data/dataset' + str(run_length)):
+        run_length = time_length
+    # Stored windows (lazy_interpolation = False): rows between window starts; the default keeps one window, the
+    # first time_length seconds, per run, and a window never crosses from one run into the next
+    stride = run_length
+    # > 0: train on this many batches per epoch of random mixes of adjacent break-size runs (needs lazy_interpolation)
+    mixup_batches = 0
     # Use relative paths for processed data (make sure the preprocessing scripts have run)
-    total_dataset_path = './processed_data/total_dataset' + str(time_length) + str(interpolation_number) + '.csv'
-    total_labelset_path = './processed_data/total_labelset' + str(time_length) + str(interpolation_number) + '.csv'
-
-    # Read dataset and labelset. (Labels column is named '0' in the CSV.)
-    dataset = pd.read_csv(total_dataset_path, index_col=0)
-    labelset = pd.read_csv(total_labelset_path)
-
-    # Fit scaler on dataset and transform.
-    min_max_scaler = MinMaxScaler()
-    min_max_scaler.fit(dataset)
-    data = min_max_scaler.transform(dataset)
-    # Create sliding windows.  The returned shape will be (num_windows, time_length, num_features)
-    X = slicewindow(data, time_length)
-
-    # Extract label column; here labelset['0'] contains the labels.
-    y = np.array(labelset['0'])
-    encoder = LabelEncoder()
-    encoder.fit(y)
-    y = encoder.transform(y)
-
-    # Split data into train and test sets.
-    X_train, X_test, Y_train, Y_test = train_test_split(X, y, test_size=0.2, 
-                                                        random_state=6, stratify=y)
-    X_train, Y_train = torch.FloatTensor(X_train), torch.LongTensor(Y_train)
-    X_test, Y_test = torch.FloatTensor(X_test), torch.LongTensor(Y_test)
-
-    train_dataset = TensorDataset(X_train, Y_train)
-    test_dataset = TensorDataset(X_test, Y_test)
-
-    # Adjust num_workers if necessary (suggested max on your system seems to be 8).
-    train_loader = DataLoader(dataset=train_dataset, batch_size=len(X_train), 
-                            shuffle=True, num_workers=8)
-    test_loader = DataLoader(dataset=test_dataset, batch_size=len(X_test), 
-                            shuffle=True, num_workers=8)
+    total_dataset_path = './processed_data/total_dataset' + str(run_length) + str(interpolation_number)
+    total_labelset_path = './processed_data/total_labelset' + str(run_length) + str(interpolation_number) + '.csv'
+    # Per-channel scaling ('minmax' or 'standard'), fitted on the training windows only, scaler_chunk windows at a
+    # time, and saved next to the model; reused while the data, channels and split it was fitted on are unchanged
+    scaler_kind = 'minmax'
+    scaler_chunk = 4096
+    scaler_path = './models/LSTM' + str(time_length) + str(interpolation_number) + '_scaler.json'
+    # Class balance from the training labels, without duplicating windows (utils.balancing): 'loss' weights the
+    # cross entropy per class, 'sampler' draws every class equally often into the batch, None trains as is
+    balance = 'loss'
+    # Windows per optimizer step (None: the whole training set in one step). Pre-built windows are batched in
+    # process (utils.batching); lazily interpolated ones come from a DataLoader whose loader_workers processes
+    # persist across epochs (0: built in the main process)
+    batch_size = 256
+    loader_workers = 8
+    epochs = 100
+    # Report the training time until the test accuracy first reaches this
+    target_accuracy = 0.9
+    # Test-set evaluation (utils.evaluation, without autograd) every eval_steps optimizer steps and/or every
+    # eval_seconds seconds; eval_background evaluates a copy of the weights on a thread while training goes on
+    eval_steps = 10
+    eval_seconds = None
+    eval_background = False
+    # Checkpoints of the model, optimizer, random state and epoch (utils.checkpoint, written off the training
+    # thread) every checkpoint_epochs epochs and/or checkpoint_seconds seconds; a rerun resumes after the last one.
+    # The weights of the best test accuracy so far are kept in best_model_path
+    model_name = 'LSTM' + ('_whole' if variable_length else str(time_length) + str(interpolation_number))
+    checkpoint_path = './models/' + model_name + '_checkpoint.pth'
+    best_model_path = './models/' + model_name + '.pth'
+    checkpoint_epochs = 1
+    checkpoint_seconds = None
+    # Stop early (utils.convergence) once the test loss has not improved by more than min_delta in patience
+    # evaluations, or after max_seconds of training; lr_factor scales the learning rate after lr_patience
+    # evaluations without improvement (None keeps lr fixed)
+    monitor = 'loss'
+    patience = 30
+    min_delta = 1e-4
+    lr_factor = 0.6
+    lr_patience = 10
+    max_seconds = None
+
+    if variable_length:
+        whole_path = './sequence_data/dataset_whole'
+        runs = RunSequences.from_store(whole_path, channels)
+        y = runs.labels
+        train_index, test_index = train_test_split(np.arange(len(runs)), test_size=0.2,
+                                                   random_state=6, stratify=y)
+        scaler = load_or_fit(scaler_path, (runs.rows(x) for x in chunked(train_index, scaler_chunk)), scaler_kind,
+                             dataset=whole_path, fingerprint=fingerprint(whole_path), channels=channels,
+                             train_runs=len(train_index))
+        runs = RunSequences(scaler.transform(runs.data), runs.lengths, runs.labels)
+        X_test, test_lengths = pad_runs([torch.from_numpy(runs.run(i)) for i in test_index])
+        Y_test = torch.from_numpy(y[test_index])
+        test_inputs = (X_test, test_lengths)
+        sampler = balanced_sampler(y[train_index]) if balance == 'sampler' else None
+        train_loader = SequenceBatcher([torch.from_numpy(runs.run(i)) for i in train_index],
+                                       torch.from_numpy(y[train_index]), batch_size=run_batch_size, sampler=sampler)
+    elif lazy_interpolation:
+        # Only the base windows of sequence_data/dataset<T> are loaded; the interpolated windows and their
+        # labels are built per item by utils.window_dataset (same windows as total_dataset<T><k>). Interpolation
+        # is per row, so cutting the runs to time_length rows first gives the same windows as cutting afterwards.
+        base_path = './sequence_data/dataset' + str(run_length)
+        base = leading_rows(DatasetStore(base_path).to_frame(channels).ffill().values, run_length, time_length)
+        class_runs = load_run_index(base_path, time_length).class_runs()
+        window_dataset = InterpolatedWindowDataset.from_rows(base, time_length, interpolation_number,
+                                                             class_runs=class_runs)
+        y = window_dataset.labels
+        train_index, test_index = train_test_split(np.arange(len(window_dataset)), test_size=0.2,
+                                                   random_state=6, stratify=y)
+        scaler = load_or_fit(scaler_path, (np.stack([window_dataset.window(i) for i in x])
+                                           for x in chunked(train_index, scaler_chunk)), scaler_kind,
+                             dataset=base_path, fingerprint=fingerprint(base_path), levels=interpolation_number,
+                             channels=channels,
+                             train_windows=len(train_index))
+        window_dataset.transform = scaler.transform
+        train_dataset = Subset(window_dataset, train_index)
+        X_test = torch.stack([window_dataset[i][0] for i in test_index])
+        Y_test = torch.LongTensor(y[test_index])
+        test_dataset = TensorDataset(X_test, Y_test)
+        test_inputs = (X_test,)
+        sampler = balanced_sampler(y[train_index]) if balance == 'sampler' else None
+        if mixup_batches:
+            # The mixup batches draw their own pairs of adjacent runs, so there are no training items for a
+            # class-balanced sampler to pick from; balance = 'loss' still weights the classes
+            if sampler is not None:
+                raise ValueError("mixup_batches draws its own run pairs; use balance = 'loss' or None, not 'sampler'")
+            # Only pairs of runs whose interpolated windows are all training windows are mixed, so no mix
+            # reproduces a test window
+            train_loader = AdjacentRunMixup.from_rows(scaler.transform(base), time_length,
+                                                      batch_size or len(train_dataset), class_runs=class_runs,
+                                                      batches_per_epoch=mixup_batches,
+                                                      pairs=window_dataset.covered_pairs(train_index))
+        else:
+            train_loader = DataLoader(dataset=train_dataset, batch_size=batch_size or len(train_dataset),
+                                      shuffle=sampler is None, sampler=sampler, num_workers=loader_workers,
+                                      persistent_workers=loader_workers > 0)
+    else:
+        if is_store(total_dataset_path):
+            # Binary store from sequence_data_interpolation.py: a memory map / chunk read, labels stored alongside
+            store = DatasetStore(total_dataset_path)
+            dataset = store.read(channels)
+            labelset = pd.DataFrame({'0': store.labels})
+        else:
+            # Read dataset and labelset. (Labels column is named '0' in the CSV.)
+            dataset = pd.read_csv(total_dataset_path + '.csv', usecols=channels, dtype='float32')[channels]
+            labelset = pd.read_csv(total_labelset_path)
+        data = np.asarray(dataset)
+
+        # Extract label column; here labelset['0'] contains the labels.
+        y = np.array(labelset['0'])
+        encoder = LabelEncoder()
+        encoder.fit(y)
+        y = encoder.transform(y)
+
+        # float32 strided view of the sliding windows, shape (num_windows, window_length, num_features);
+        # only the train / test windows gathered below are copied, and scaled in place
+        windows = SlidingWindows(data, time_length, stride, run_length=run_length, run_labels=y)
+        y = windows.labels
+
+        # Split data into train and test sets.
+        train_index, test_index = train_test_split(np.arange(len(windows)), test_size=0.2,
+                                                   random_state=6, stratify=y)
+        scaler = load_or_fit(scaler_path, (windows[x] for x in chunked(train_index, scaler_chunk)), scaler_kind,
+                             dataset=total_dataset_path, fingerprint=fingerprint(total_dataset_path), channels=channels,
+                             stride=stride, train_windows=len(train_index))
+        X_train = windows[train_index]
+        X_test = windows[test_index]
+        X_train = torch.from_numpy(scaler.transform(X_train, out=X_train))
+        X_test = torch.from_numpy(scaler.transform(X_test, out=X_test))
+        Y_train, Y_test = torch.from_numpy(y[train_index]), torch.from_numpy(y[test_index])
+
+        train_dataset = TensorDataset(X_train, Y_train)
+        test_dataset = TensorDataset(X_test, Y_test)
+        test_inputs = (X_test,)
+
+        # The windows are already tensors: shuffled index batches in process, no worker processes
+        sampler = balanced_sampler(y[train_index]) if balance == 'sampler' else None
+        train_loader = TensorBatcher(X_train, Y_train, batch_size=batch_size, sampler=sampler)
 
     # Set input_size based on your dataset's feature dimension.
-    input_size = X_train.shape[2]  # should be 10 now
-    rnn = RNN()
+    input_size = X_test.shape[2]  # len(channels)
+    rnn = RNN(input_size)
     print(rnn)
     optimizer = torch.optim.Adam(rnn.parameters(), lr=0.01)
-    loss_func = nn.CrossEntropyLoss()
-    accuracy_list = []
-
-# Training (using 3 epochs for quick testing)
-    for epoch in range(100):
-        for step, (b_x, b_y) in enumerate(train_loader):
-            # b_x is already of shape [batch, time_length, input_size] i.e. (N, 20, 10)
-            output = rnn(b_x)
+    loss_func = nn.CrossEntropyLoss(weight=loss_weight(y[train_index], rnn.out.out_features, balance))
+    checkpointer = Checkpointer(checkpoint_path, best_model_path, every_epochs=checkpoint_epochs,
+                                every_seconds=checkpoint_seconds, generators=(getattr(train_loader, 'generator', None),
+                                                                              getattr(sampler, 'generator', None)))
+
+    convergence = Convergence(monitor, patience, min_delta, optimizer, lr_factor, lr_patience, max_seconds=max_seconds)
+
+    def report(result, model):
+        print('Epoch:', result.info['epoch'], '| train loss: %.4f' % result.info['loss'],
+              '| test loss: %.4f' % result.loss, '| test accuracy: %.2f' % result.accuracy)
+        checkpointer.track(result.accuracy, model)
+        convergence.observe(result)
+
+    evaluator = Evaluator(rnn, test_inputs, Y_test, every_steps=eval_steps, every_seconds=eval_seconds,
+                          loss_func=loss_func, background=eval_background, callback=report)
+    start_epoch, state = checkpointer.resume(rnn, optimizer)
+    if 'evaluation' in state:
+        evaluator.load_state_dict(state['evaluation'])
+    if 'convergence' in state:
+        convergence.load_state_dict(state['convergence'])
+    epochs_done = start_epoch
+    # Training throughput and time to target_accuracy count the training steps only, not the evaluations
+    samples_seen = state.get('samples_seen', 0)
+    train_time = state.get('train_time', 0.0)
+
+    # Training: up to epochs epochs, from the epoch after the last checkpoint, until convergence stops it
+    for epoch in range(start_epoch, epochs):
+        if convergence.stop():
+            break
+        tick = time.time()
+        for step, (*b_x, b_y) in enumerate(train_loader):
+            # b_x is (windows of shape [batch, time_length, input_size] i.e. (N, 20, len(channels)),) or, with
+            # variable_length, (padded runs of shape [batch, longest run, input_size], run lengths)
+            output = rnn(*b_x)
             loss = loss_func(output, b_y)
             optimizer.zero_grad()
             loss.backward()
             optimizer.step()
-            if step % 10 == 0:
-                # Evaluate using the test set without additional reshaping.
-                test_out = rnn(X_test)
-                pred_y = torch.max(test_out, 1)[1].data
-                accuracy = pred_y.eq(Y_test.data.view_as(pred_y)).cpu().sum() / len(Y_test)
-                accuracy_list.append(accuracy)
-                print('Epoch:', epoch, '| train loss: %.4f' % loss.item(), 
-                    '| test accuracy: %.2f' % accuracy)
-    print('Max accuracy:{}'.format(max(accuracy_list)))
-    test_output = rnn(X_test[:20])
+            samples_seen += len(b_y)
+            train_time += time.time() - tick
+            evaluator.step(epoch=epoch, loss=loss.detach(), train_time=train_time)
+            tick = time.time()
+            if convergence.stop():
+                break
+        epochs_done = epoch + 1
+        checkpointer.step(epoch, rnn, optimizer, force=epoch == epochs - 1 or convergence.stopped,
+                          samples_seen=samples_seen, train_time=train_time, evaluation=evaluator.state_dict(),
+                          convergence=convergence.state_dict())
+    evaluator.wait()
+    checkpointer.wait()
+    print(convergence.summary(epochs_done, epochs))
+    accuracy_list = evaluator.accuracies
+    time_to_target = next((x.info['train_time'] for x in evaluator.history if x.accuracy >= target_accuracy), None)
+    print('Max accuracy:{}'.format(max(accuracy_list)), '| weights saved in', best_model_path)
+    print('Training: %.0f samples/s' % (samples_seen / train_time), '| time to %.2f test accuracy: %s'
+          % (target_accuracy, 'not reached' if time_to_target is None else '%.1f s' % time_to_target))
+    if variable_length:
+        print('Padding: %.1f%% of the batched rows' % (100 * train_loader.padding))
+    with torch.inference_mode():
+        test_output = rnn(*(x[:20] for x in test_inputs))
     pred_y = torch.max(test_output, 1)[1].data.numpy()
     print(pred_y, 'predicted labels')
     print(Y_test[:20], 'true labels')
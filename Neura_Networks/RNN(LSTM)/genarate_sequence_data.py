@@ -102,136 +102,142 @@
 
 #!/usr/bin/env python3
 import os
-import shutil
+import sys
 import numpy as np
 import pandas as pd
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from utils.channels import CHANNEL_NAMES, resolve_channels
+from utils.raw_cache import RawRunCache, export_merged_run, list_raw_runs, read_raw_run
+from utils.aggregation import aggregate_runs
+from utils.ingest import ingest_incremental, ingest_types
+from utils.dataset_store import write_dataset
+from utils.run_index import RUN_INDEX_FILE, RunIndex
+
 #Display all columns and rows, and set maximum column width for display
 pd.set_option('display.max_columns', 1000)
 pd.set_option('display.max_rows', 1000)
 pd.set_option('max_colwidth', 5000)
 
 class PreData:
-    def __init__(self, path, name, time_length, start):
+    def __init__(self, path, name, time_length, start, cache=None, bin_width=1.0, channels=None):
         self.name = name
         self.path = path
-        # Use a relative folder for processed data output
+        # Merged text files are only written here when merge_file(export=True) is asked for
         self.final_path = './Pre_data'
-        self.file_name_list = os.listdir(self.path)
-        self.file_path = ''
+        self.run_files = []
+        self.runs = []
         self.file_count = 0
+        # time_length is the window length in seconds (None: every run over its whole duration),
+        # bin_width the averaging bin in seconds
         self.time_length = time_length
+        # Rows of every run collated so far
+        self.run_lengths = []
+        self.bin_width = bin_width
         self.start = start
+        # Binary run cache (utils.raw_cache); when set, runs are memory-mapped instead of parsed from text
+        self.cache = cache
+        # utils.channels selection; None keeps all 12 channels, a subset is the only thing parsed from the text files
+        self.channels = channels
         self.final_path_children = os.path.join(self.final_path, self.name)
-        if os.path.exists(self.final_path_children):
-            shutil.rmtree(self.final_path_children)
     def determine_file_order(self):
-        # Sort file names by extracting an integer from the filename (adjust if needed)
-        self.file_name_list = [x for x in self.file_name_list if not x.startswith('.')]
-
-        self.file_name_list.sort(key=lambda x: int(x[5:-2]))
-        self.file_count = len(self.file_name_list)
-    def merge_file(self):
-        for i in range(0, self.file_count, 2):
-            file_1 = self.file_name_list[i]
-            file_2 = self.file_name_list[i + 1]
-
-            # Construct full path for file_1 and file_2
-            file_1_path = os.path.join(self.path, file_1)
-            file_2_path = os.path.join(self.path, file_2)
-            # Output will be written in the same folder (you might change this if desired)
-            output_filename = str(int(i/2 + 1)) + self.name + ".txt"
-            output_file_path = os.path.join(self.path, output_filename)
-            
-            print("Processing merge:", file_1_path, "and", file_2_path, "into", output_file_path)
-            
-            with open(file_1_path, 'r') as fa:
-                with open(file_2_path, 'r') as fb:
-                    with open(output_file_path, 'w') as fc:
-                        for line in fa:
-                            fc.write(line.strip('\r\n'))
-                            fc.write('\t')
-                            fc.write(fb.readline())
-
-            # file_1_2 = str(int(i/2 + 1)) + self.name + ".txt"
-            # print('Hello Guys! Testiing hori hai')
-            # print(self.path)
-            # print(os.path)
-            
-            # os.chdir(self.path)
-            # with open(file_1, 'r') as fa:
-            #     with open(file_2, 'r') as fb:
-            #         with open(file_1_2, 'w') as fc:
-            #             for line in fa:
-            #                 fc.write(line.strip('\r\n'))
-            #                 fc.write(fb.readline())
-    def move_file(self):
-        os.makedirs(self.final_path, exist_ok=True)
-        os.makedirs(self.final_path_children, exist_ok=True)
-        self.file_name_list = os.listdir(self.path)
-        for filename in self.file_name_list:
-            if '.txt' in filename:
-                self.file_path = os.path.join(self.path, filename)
-                shutil.move(self.file_path, self.final_path_children)
+        # (run number, <TYPE>-NN-1, <TYPE>-NN-2) sorted by run number, halves always in -1/-2 order
+        self.run_files = list_raw_runs(os.path.dirname(os.path.normpath(self.path)), self.name)
+        self.file_count = 2 * len(self.run_files)
+    def merge_file(self, export=False):
+        # Join the two channel halves of every run in memory; nothing is written unless export is set
+        self.runs = []
+        for run_number, file_1_path, file_2_path in self.run_files:
+            print("Processing merge:", file_1_path, "and", file_2_path)
+            self.runs.append(read_raw_run(file_1_path, file_2_path, self.channels))
+            if export:
+                os.makedirs(self.final_path_children, exist_ok=True)
+                output_file_path = os.path.join(self.final_path_children, str(run_number) + self.name + ".txt")
+                export_merged_run(file_1_path, file_2_path, output_file_path)
     def data_collation(self):
-        self.file_name_list = os.listdir(self.final_path_children)
-        # Sort by filename assuming the filename starts with a number.
-        self.file_name_list.sort(key=lambda x: int(x[:-8]))
-        time_sequence_value = []
-        for txt in self.file_name_list:
-            print("Processing file:", txt)
-            # Read the text file; header row is assumed at line index 1; adjust if necessary.
-            Txt = pd.read_table(os.path.join(self.final_path_children, txt),
-            index_col=False, header=1, on_bad_lines='skip')
-            Txt = pd.DataFrame(Txt.iloc[::-1]) # reverse the order
-            Txt = Txt.dropna(axis=1) # drop empty columns
-            # Define new column names (translated to English)
-            col_names = ["Time1", "RegulatorPressure", "RegulatorWaterLevel",
-            "UpFlow", "SG1FeedwaterFlow", "SG1OutletPressure",
-            "SG1SteamFlow", "Time2", "MainSteamPipePressure",
-            "ContainmentPressure", "ContainmentTemperature",
-            "ContainmentRadioactivity", "SumpWaterLevel", "AverageCoolantTemperature"]
-            print(Txt.head())
-            Txt.columns = col_names # rename columns
-            Txt = Txt.drop(columns="Time2") # remove duplicate time column
-            Txt.index = range(Txt.shape[0])
-            for t in range(self.time_length):
-                # Create time string in HH:MM:SS format for each second in the window.
-                if t < 10:
-                    second_str = "00:00:0" + str(t)
-                else:
-                    second_str = "00:00:" + str(t)
-                same_second_value = []
-                for j in range(1, Txt.shape[1]):
-                    same_second_parameters_value = []
-                    for i in range(Txt.shape[0]):
-                        # Debug print can be commented out if not needed.
-                        #print(second_str, Txt.iloc[i, 0])
-                        if second_str in Txt.iloc[i, 0]:
-                            same_second_parameters_value.append(Txt.iloc[i, j])
-                    #print(same_second_parameters_value, len(same_second_parameters_value))
-                    average_value = np.mean(same_second_parameters_value)
-                    #print(average_value)
-                    same_second_value.append(average_value)
-                time_sequence_value.append(same_second_value)
-        return time_sequence_value
-    
-#Accident type starting indices    
-Type = {'LOCA': 0, 'MSLB': 100, 'SGTR': 200, 'NORM': 300}
-#Use relative path to the raw data folder provided in the repository.
-basic_path = os.path.join('.', 'raw_data') + os.sep
-print(f'Basic Path: {basic_path}')
-all_time_sequence_value = []
+        if self.cache is not None:
+            return self.cached_data_collation()
+        # Bin means of the in-memory runs from merge_file, one grouped reduction for the whole type
+        return self.bin_means(self.runs).tolist()
+    def cached_data_collation(self):
+        # Same bin means as data_collation, computed for all cached runs of this type at once
+        runs = self.cache.load_all(self.name, self.channels)
+        print("Processing runs:", self.name, len(runs))
+        return self.bin_means(runs).tolist()
+    def bin_means(self, runs):
+        if self.time_length is None:
+            # Whole runs differ in duration, so each is reduced on its own
+            means = [aggregate_runs([x], self.bin_width)[0] for x in runs]
+        else:
+            means = list(aggregate_runs(runs, self.bin_width, self.time_length))
+        self.run_lengths += [x.shape[0] for x in means]
+        return np.concatenate(means)
 
-for (accident, starting_point) in Type.items():
-    pre_data = PreData(os.path.join(basic_path, accident), accident, 50, starting_point)
-    pre_data.determine_file_order()
-    pre_data.merge_file()
-    pre_data.move_file()
-    time_sequence_value = pre_data.data_collation()
-    all_time_sequence_value += time_sequence_value
+if __name__ == "__main__":
+    #Accident type starting indices
+    Type = {'LOCA': 0, 'MSLB': 100, 'SGTR': 200, 'NORM': 300}
+    #Use relative path to the raw data folder provided in the repository.
+    basic_path = os.path.join('.', 'raw_data') + os.sep
+    print(f'Basic Path: {basic_path}')
+    # Worker processes for ingestion; 1 keeps the sequential PreData path
+    workers = os.cpu_count()
+    # Seconds stored per run: the full resolution every model cuts its own window length from (utils.windows)
+    time_length = 60
+    # True stores every run over its whole duration instead (60 s to about 3 min, the rows of every run in
+    # runs.json), for the variable-length training of LSTM.py
+    whole_runs = False
+    window_length = None if whole_runs else time_length
+    # use_cache=False pairs the raw halves in memory on every run; export_merged also writes Pre_data/<TYPE>/<n><TYPE>.txt
+    use_cache = True
+    export_merged = False
+    # Channels written to the dataset (canonical names from utils.channels); None keeps all 12
+    channels = None
+    # The dataset is written as a chunked float32 store (utils.dataset_store); export_csv also writes the old csv
+    dataset_path = './sequence_data/dataset' + ('_whole' if whole_runs else str(time_length))
+    export_csv = False
+    all_time_sequence_value = []
+    run_lengths = []
+    if use_cache and not export_merged:
+        # Only runs that are new or changed since the last call (see ./cache/means/<key>/manifest.json) are parsed;
+        # the dataset is reassembled from the stored per-run means in Type / run order
+        results, ingested = ingest_incremental(basic_path, list(Type), workers=workers, cache_dir='./cache',
+                                               window_length=window_length, channels=channels)
+        print("Ingested runs:", len(ingested))
+        for accident in Type:
+            all_time_sequence_value += np.concatenate(list(results[accident])).tolist()
+            run_lengths += [x.shape[0] for x in results[accident]]
+    elif workers > 1 and not export_merged:
+        # Runs of all types are parsed/aggregated in a process pool and come back in Type / run order
+        results = ingest_types(basic_path, list(Type), workers=workers, window_length=window_length,
+                               channels=channels)
+        for accident in Type:
+            all_time_sequence_value += np.concatenate(list(results[accident])).tolist()
+            run_lengths += [x.shape[0] for x in results[accident]]
+    else:
+        raw_cache = None
+        if use_cache:
+            # Parse raw_data into the binary cache once; later runs only memory-map it
+            raw_cache = RawRunCache('./cache')
+            raw_cache.build(basic_path, list(Type))
+        for (accident, starting_point) in Type.items():
+            pre_data = PreData(os.path.join(basic_path, accident), accident, window_length, starting_point,
+                               cache=raw_cache, channels=channels)
+            if raw_cache is None:
+                pre_data.determine_file_order()
+                pre_data.merge_file(export=export_merged)
+            time_sequence_value = pre_data.data_collation()
+            all_time_sequence_value += time_sequence_value
+            run_lengths += pre_data.run_lengths
 
-all_time_sequence_value = pd.DataFrame(all_time_sequence_value)
-#Save the merged time-sequence data to a relative folder (create folder "sequence_data" if needed)
-os.makedirs('./sequence_data', exist_ok=True)
-all_time_sequence_value.to_csv('./sequence_data/dataset20.csv', index=False)
\ No newline at end of file
+    # The header carries the channel names, so later scripts select channels by name
+    all_time_sequence_value = pd.DataFrame(all_time_sequence_value,
+                                           columns=[CHANNEL_NAMES[x] for x in resolve_channels(channels)])
+    #Save the merged time-sequence data to a relative folder (create folder "sequence_data" if needed)
+    os.makedirs('./sequence_data', exist_ok=True)
+    write_dataset(dataset_path, all_time_sequence_value, window_length=window_length)
+    # Run id, type, break-size rank, sub class and rows of every run, so later scripts look runs up instead of
+    # assuming 100 runs per type
+    RunIndex.from_raw(basic_path, list(Type), time_length).with_lengths(run_lengths).save(
+        os.path.join(dataset_path, RUN_INDEX_FILE))
+    if export_csv:
+        all_time_sequence_value.to_csv(dataset_path + '.csv', index=False)
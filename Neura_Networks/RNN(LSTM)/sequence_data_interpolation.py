@@ -124,60 +124,54 @@
 
 #!/usr/bin/env python3
 import pandas as pd
-import math
 import time
 import numpy as np
 import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from utils.dataset_store import DatasetStore, is_store, write_dataset
+from utils.interpolation import interpolate_blocks, interpolated_blocks, sub_class_labels
+from utils.run_index import load_run_index
 
 class Interpolation:
     def __init__(self, path, interpolation_times, time_length):
         self.path = path
-        self.data = pd.read_csv(self.path, index_col=0).fillna(method='ffill')
-        # Optionally drop a column if needed, here commented out.
-        # self.data.drop('12', axis=1, inplace=True)
+        # dataset<T> is a utils.dataset_store store (or the old csv, written without an index);
+        # every column is a channel named after utils.channels
+        if is_store(self.path):
+            self.data = DatasetStore(self.path).to_frame().ffill()
+        else:
+            self.data = pd.read_csv(self.path + '.csv', dtype='float32').ffill()
         self.interpolation_times = interpolation_times
-        # Assuming the data records are in the following order:
-        # LOCA: rows 0 to 1999, MSLB: 2000 to 3999, SGTR: 4000 to 5999, NORM: 6000 to 6099.
-        self.LOCA_data = self.data.iloc[0:2000].copy()
-        self.MSLB_data = self.data.iloc[2000:4000].copy()
-        self.SGTR_data = self.data.iloc[4000:6000].copy()
-        self.NORM_data = self.data.iloc[6000:6100].copy()
         self.time_length = time_length
+        # Rows of every accident type come from the run index stored with the dataset (utils.run_index)
+        self.run_index = load_run_index(self.path, time_length)
+        self.LOCA_data = self.data.iloc[self.run_index.rows('LOCA')]
+        self.MSLB_data = self.data.iloc[self.run_index.rows('MSLB')]
+        self.SGTR_data = self.data.iloc[self.run_index.rows('SGTR')]
+        self.NORM_data = self.data.iloc[self.run_index.rows('NORM')]
         self.total_label = []
     @staticmethod
-    def interpolation(data, time_length):
-        data = data.copy()
-        data_1 = data.iloc[time_length:].reset_index(drop=True)
-        data_2 = data.iloc[:(data.shape[0] - time_length)].reset_index(drop=True)
-        data_interpolation = (data_1 + data_2) / 2
-        # Add an 'order' column to facilitate inserting data at specific positions
-        data_interpolation = data_interpolation.assign(order=np.arange(1, data_interpolation.shape[0]*2, 2)[:data_interpolation.shape[0]])
-        data = data.assign(order=np.arange(0, data.shape[0]*2, 2)[:data.shape[0]])
-        data_out = pd.concat([data, data_interpolation], axis=0, ignore_index=True)
-        data_out = data_out.assign(sub_order=np.arange(0, data_out.shape[0]))
-        data_out.sort_values(['order', 'sub_order'], ascending=[True, True], inplace=True)
-        data_out.drop(['order', 'sub_order'], axis=1, inplace=True)
-        data_out = data_out.reset_index(drop=True)
-        return data_out
+    def interpolation(data, time_length, levels=1, out=None):
+        # Insert the mean of every two neighbouring time_length-row blocks (runs) between them, levels times over;
+        # utils.interpolation fills all levels in one preallocated array (out, when given)
+        values = interpolate_blocks(data.values, time_length, levels, out=out)
+        return pd.DataFrame(values, columns=data.columns, copy=False)
     def cyclic_interpolation(self):
-        for i in range(self.interpolation_times):
-            self.LOCA_data = self.interpolation(self.LOCA_data, self.time_length)
-            self.MSLB_data = self.interpolation(self.MSLB_data, self.time_length)
-            self.SGTR_data = self.interpolation(self.SGTR_data, self.time_length)
-            self.NORM_data = self.interpolation(self.NORM_data, self.time_length)
-        total_data = pd.concat([self.LOCA_data, self.MSLB_data, self.SGTR_data, self.NORM_data], axis=0, ignore_index=True)
-        total_data = total_data.reset_index(drop=True)
-        return total_data
-    @staticmethod
-    def accident_label(small_number, medium_number, large_number, label_number):
-        label = []
-        for i in range(small_number):
-            label.append(str(label_number))
-        for i in range(small_number, medium_number):
-            label.append(str(label_number + 1))
-        for i in range(medium_number, large_number):
-            label.append(str(label_number + 2))
-        return label
+        # Every type is interpolated straight into its rows of one float32 array, so the result is never
+        # concatenated or converted
+        classes = [self.LOCA_data, self.MSLB_data, self.SGTR_data, self.NORM_data]
+        rows = [interpolated_blocks(x.shape[0] // self.time_length, self.interpolation_times) * self.time_length
+                for x in classes]
+        total = np.empty((sum(rows), self.data.shape[1]), dtype='float32')
+        offsets = np.concatenate([[0], np.cumsum(rows)])
+        self.LOCA_data, self.MSLB_data, self.SGTR_data, self.NORM_data = [
+            self.interpolation(x, self.time_length, self.interpolation_times, out=total[offsets[i]:offsets[i + 1]])
+            for i, x in enumerate(classes)]
+        return pd.DataFrame(total, columns=self.data.columns, copy=False)
+    def accident_label(self, accident, data):
+        return [str(x) for x in sub_class_labels(accident, int(data.shape[0] / self.time_length))]
     def add_label(self):
         """
         Add accident labels according to specified proportions.
@@ -185,27 +179,12 @@ class Interpolation:
         MSLB: 11%, 26%, 63%
         SGTR: 14%, 32%, 54%
         """
-        LOCA_num = int(self.LOCA_data.shape[0] / self.time_length)
-        MSLB_num = int(self.MSLB_data.shape[0] / self.time_length)
-        SGTR_num = int(self.SGTR_data.shape[0] / self.time_length)
-        NORM_num = int(self.NORM_data.shape[0] / self.time_length)
-        SLOCA = math.ceil(LOCA_num * 0.11)
-        MLOCA = math.ceil(LOCA_num * 0.31)
-        LLOCA = LOCA_num
-        LOCA_label = self.accident_label(SLOCA, MLOCA, LLOCA, 0)
-        
-        SMSLB = math.ceil(MSLB_num * 0.11)
-        MMSLB = math.ceil(MSLB_num * 0.26)
-        LMSLB = MSLB_num
-        MSLB_label = self.accident_label(SMSLB, MMSLB, LMSLB, 3)
-        
-        SSGTR = math.ceil(SGTR_num * 0.14)
-        MSGTR = math.ceil(SGTR_num * 0.32)
-        LSGTR = SGTR_num
-        SGTR_label = self.accident_label(SSGTR, MSGTR, LSGTR, 6)
-        
+        # utils.interpolation.sub_class_labels splits every type at math.ceil of these proportions
+        LOCA_label = self.accident_label('LOCA', self.LOCA_data)
+        MSLB_label = self.accident_label('MSLB', self.MSLB_data)
+        SGTR_label = self.accident_label('SGTR', self.SGTR_data)
         # Add normal operation label
-        NORM_label = ['9'] * NORM_num
+        NORM_label = self.accident_label('NORM', self.NORM_data)
         
         self.total_label = LOCA_label + MSLB_label + SGTR_label + NORM_label
         self.total_label = pd.DataFrame(self.total_label)
@@ -213,32 +192,40 @@ class Interpolation:
     
 if __name__ == "__main__":
     time_start = time.time()
+    # Rows per run of the dataset created by the previous script; runs are interpolated at full resolution
+    # and the training scripts cut their window length from the result
+    time_length = 60
+    # Use a relative path for the input dataset created by the previous script.
+    time_dataset_path = './sequence_data/dataset' + str(time_length)
+    run_index = load_run_index(time_dataset_path, time_length)
     while True:
         interpolation_number = input("Please enter the number of interpolations (positive integer): ")
         if not(interpolation_number.isdigit()):
             print("Invalid input, please try again!")
         else:
             interpolation_number = int(interpolation_number)
-            samples_number = ((2**interpolation_number - 1) * 99 + 100) * 3 + ((2**interpolation_number - 1) * 4 + 5)
-            samples_growth = samples_number / 305
+            samples_number = sum(interpolated_blocks(len(run_index.positions(x)), interpolation_number)
+                                 for x in run_index.accident_types)
+            samples_growth = samples_number / len(run_index)
             print("The total number of samples will reach {} (an increase of {:.2%}).".format(samples_number, samples_growth))
             go_on = input("Continue (Y/N): ")
             if go_on.upper() == 'Y':
                 break
             else:
                 continue
-    time_length = 20
-    # Use a relative path for the input dataset created by the previous script.
-    time_dataset_path = './sequence_data/dataset' + str(time_length) + '.csv'
+    # export_csv also writes the processed dataset and labels as csv files next to the store
+    export_csv = False
     chazhi = Interpolation(time_dataset_path, interpolation_number, time_length)
     total_dataset = chazhi.cyclic_interpolation()
     total_labelset = chazhi.add_label()
 
-    # Save processed CSV files into a relative folder 'processed_data'
+    # Save the processed dataset, with one label per window stored alongside, into 'processed_data'
     os.makedirs('./processed_data', exist_ok=True)
-    total_dataset_path = './processed_data/total_dataset' + str(time_length) + str(interpolation_number) + '.csv'
-    total_labelset_path = './processed_data/total_labelset' + str(time_length) + str(interpolation_number) + '.csv'
-    total_dataset.to_csv(total_dataset_path, index=False)
-    total_labelset.to_csv(total_labelset_path, index=False)
+    total_dataset_path = './processed_data/total_dataset' + str(time_length) + str(interpolation_number)
+    write_dataset(total_dataset_path, total_dataset, labels=total_labelset[0].values, window_length=time_length)
+    if export_csv:
+        total_labelset_path = './processed_data/total_labelset' + str(time_length) + str(interpolation_number) + '.csv'
+        total_dataset.to_csv(total_dataset_path + '.csv', index=False)
+        total_labelset.to_csv(total_labelset_path, index=False)
     time_end = time.time()
     print("Total time taken:", time_end - time_start)
\ No newline at end of file
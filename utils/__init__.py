@@ -0,0 +1,5 @@
+"""
+Shared data and training helpers for the accident diagnosis scripts.
+Run the scripts from the repository root so that the relative data folders
+(raw_data, cache, sequence_data, processed_data) resolve.
+"""
@@ -0,0 +1,56 @@
+"""
+Class balance from weights instead of duplicated rows.
+
+NORM has 5 runs against 100 per accident type, so every class count comes
+from the training labels themselves: class_weights gives the weight of a
+class-weighted loss (sklearn's 'balanced' n_samples / (n_classes * count)),
+balanced_sampler a sampler that draws every class equally often. Neither
+copies a window.
+"""
+import numpy as np
+import torch
+from torch.utils.data import WeightedRandomSampler
+
+BALANCE_MODES = (None, 'loss', 'sampler')
+
+
+def class_counts(labels, n_classes=None):
+    labels = np.asarray(labels, dtype='int64')
+    return np.bincount(labels, minlength=n_classes or 0)
+
+
+def class_weights(labels, n_classes=None):
+    """
+    float32 weight of every class; classes absent from labels get 0.
+    """
+    counts = class_counts(labels, n_classes)
+    weights = np.zeros(counts.shape[0], dtype='float32')
+    present = counts > 0
+    weights[present] = counts.sum() / (present.sum() * counts[present])
+    return weights
+
+
+def sample_weights(labels, n_classes=None):
+    """
+    Weight of every sample: the weight of its class.
+    """
+    return class_weights(labels, n_classes)[np.asarray(labels, dtype='int64')]
+
+
+def balanced_sampler(labels, num_samples=None, seed=0):
+    """
+    WeightedRandomSampler drawing num_samples (default len(labels)) indices
+    with replacement, every class with the same probability.
+    """
+    weights = torch.from_numpy(sample_weights(labels).astype('float64'))
+    return WeightedRandomSampler(weights, num_samples or len(weights), replacement=True,
+                                 generator=torch.Generator().manual_seed(seed))
+
+
+def loss_weight(labels, n_classes, balance):
+    """
+    The weight= tensor of a cross-entropy loss for balance mode 'loss', else None.
+    """
+    if balance not in BALANCE_MODES:
+        raise ValueError('unknown balance mode {!r}, expected one of {}'.format(balance, BALANCE_MODES))
+    return torch.from_numpy(class_weights(labels, n_classes)) if balance == 'loss' else None
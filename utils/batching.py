@@ -0,0 +1,57 @@
+"""
+Mini-batches of tensors that are already in memory.
+
+A DataLoader over a TensorDataset collates every batch item by item, and
+with num_workers it starts worker processes each epoch to hand back data
+that the main process already holds. TensorBatcher shuffles an index
+permutation and slices the tensors with it in process, one index_select
+per tensor per batch.
+"""
+import torch
+
+
+class TensorBatcher:
+    """
+    tensors: equally long tensors (e.g. X_train, Y_train), batched together.
+    batch_size: None for one batch of everything.
+    sampler: optional iterable of indices drawn anew every epoch (e.g.
+             utils.balancing.balanced_sampler); replaces the shuffle.
+    Iterating yields one tuple of batches per step, as a DataLoader over a
+    TensorDataset does.
+    """
+    def __init__(self, *tensors, batch_size=None, shuffle=True, drop_last=False, sampler=None, seed=0):
+        if not tensors:
+            raise ValueError('no tensors to batch')
+        if any(x.shape[0] != tensors[0].shape[0] for x in tensors):
+            raise ValueError('tensors of different lengths: {}'.format([x.shape[0] for x in tensors]))
+        self.tensors = tensors
+        self.batch_size = batch_size or tensors[0].shape[0]
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.sampler = sampler
+        self.generator = torch.Generator().manual_seed(seed)
+
+    @property
+    def n_samples(self):
+        return len(self.sampler) if self.sampler is not None else self.tensors[0].shape[0]
+
+    def __len__(self):
+        if self.drop_last:
+            return self.n_samples // self.batch_size
+        return -(-self.n_samples // self.batch_size)
+
+    def __iter__(self):
+        if self.sampler is not None:
+            order = torch.as_tensor(list(self.sampler), dtype=torch.int64)
+        elif self.shuffle:
+            order = torch.randperm(self.n_samples, generator=self.generator)
+        else:
+            order = None
+        for step in range(len(self)):
+            start = step * self.batch_size
+            stop = min(start + self.batch_size, self.n_samples)
+            if order is None:
+                yield tuple(x[start:stop] for x in self.tensors)
+            else:
+                index = order[start:stop]
+                yield tuple(x.index_select(0, index) for x in self.tensors)
@@ -0,0 +1,70 @@
+"""
+Channel schema of the simulator exports.
+
+Every run is split over two files: <TYPE>-NN-1 holds the first six channels
+and <TYPE>-NN-2 the last six, each after its own time column. CHANNELS lists
+them once, in that order, with the raw column id of the export, the canonical
+name used by the utils and the neural network scripts, the Chinese name and
+short code used by the Bayes scripts, the unit and the dtype they are decoded
+to. The hard-coded column layouts of the scripts derive from it.
+"""
+from collections import namedtuple
+
+Channel = namedtuple('Channel', ['raw_id', 'name', 'name_zh', 'code', 'unit', 'dtype'])
+
+# unit is '' where the export does not say and the magnitude does not make it obvious
+CHANNELS = [
+    Channel('rcpppzr', 'RegulatorPressure', '稳压器压力', 'RP', 'Pa', 'float32'),
+    Channel('rcp054rcp007mnzoyout', 'RegulatorWaterLevel', '稳压器水位', 'RWL', '', 'float32'),
+    Channel('rcv501std0102fvol', 'UpFlow', '上充流量', 'UDF', 'kg/s', 'float32'),
+    Channel('fwfrcp001gv', 'SG1FeedwaterFlow', 'SG1给水流量', 'SG1WF', 'kg/s', 'float32'),
+    Channel('rcppmssga', 'SG1OutletPressure', 'SG1出口压力', 'SG1OP', 'Pa', 'float32'),
+    Channel('msfsg(1)', 'SG1SteamFlow', 'SG1出口蒸汽流量', 'SG1SF', 'kg/s', 'float32'),
+    Channel('gpv001pnt10113ppntm', 'MainSteamPipePressure', '主蒸汽母管压力', 'MSHP', 'Pa', 'float32'),
+    Channel('evf507ety101mpzoyout', 'ContainmentPressure', '安全壳压力', 'CP', 'kPa', 'float32'),
+    Channel('chtcon(1)', 'ContainmentTemperature', '安全壳温度', 'CT', 'degC', 'float32'),
+    Channel('chavg(1)', 'ContainmentRadioactivity', '安全壳放射性', 'CR', '', 'float32'),
+    Channel('chlhsumpa', 'SumpWaterLevel', '地坑水位', 'PWL', 'm', 'float32'),
+    Channel('rcptavgn', 'AverageCoolantTemperature', '冷却剂平均温度', 'AT', 'degC', 'float32'),
+]
+CHANNELS_PER_HALF = 6
+
+CHANNEL_NAMES = [x.name for x in CHANNELS]
+CHANNEL_NAMES_ZH = [x.name_zh for x in CHANNELS]
+CHANNEL_CODES = [x.code for x in CHANNELS]
+
+
+def channel_index(channel):
+    """
+    Position of a channel in CHANNELS; channel may be a position, a canonical
+    name, a raw column id, a Chinese name or a short code.
+    """
+    if isinstance(channel, int):
+        if not 0 <= channel < len(CHANNELS):
+            raise ValueError('no channel at position {}'.format(channel))
+        return channel
+    for i, x in enumerate(CHANNELS):
+        if channel in (x.name, x.raw_id, x.name_zh, x.code):
+            return i
+    raise ValueError('unknown channel {!r}'.format(channel))
+
+
+def resolve_channels(channels=None):
+    """
+    Sorted CHANNELS positions of a channel selection; None selects all of them.
+    """
+    if channels is None:
+        return list(range(len(CHANNELS)))
+    positions = sorted(set(channel_index(x) for x in channels))
+    if not positions:
+        raise ValueError('empty channel selection')
+    return positions
+
+
+def split_by_half(positions):
+    """
+    Positions within the -1 and the -2 file of a sorted channel selection.
+    """
+    first = [x for x in positions if x < CHANNELS_PER_HALF]
+    second = [x - CHANNELS_PER_HALF for x in positions if x >= CHANNELS_PER_HALF]
+    return first, second
@@ -0,0 +1,194 @@
+"""
+Periodic checkpoints and best-model weights for the training loops.
+
+Checkpointer saves the model, the optimizer, the random number generators
+(python, numpy, torch and any loader generators it is given), the epoch
+and whatever else the loop passes in, so resume() picks a killed run up at
+the epoch after the last checkpoint. track() keeps the weights of the best
+evaluation in a second file (a plain state_dict, as FCNN.py saves its
+model).
+
+The state is copied to the CPU on the calling thread (small next to an
+epoch for these models); torch.save runs on a writer thread. Every file is
+written to <path>.tmp and moved into place with os.replace, so a crash
+mid-write leaves the previous checkpoint intact, and a save that comes
+while the writer is busy replaces the one still waiting for the same file
+instead of queueing behind it.
+"""
+import copy
+import os
+import random
+import threading
+import time
+
+import numpy as np
+import torch
+
+
+def _detached(obj):
+    # CPU copy of the tensors of a (nested) state_dict, safe to write while training goes on
+    if torch.is_tensor(obj):
+        return obj.detach().to('cpu', copy=True)
+    if isinstance(obj, dict):
+        return {k: _detached(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_detached(x) for x in obj]
+    return copy.deepcopy(obj)
+
+
+def rng_state(generators=()):
+    state = {'python': random.getstate(), 'numpy': np.random.get_state(), 'torch': torch.get_rng_state(),
+             'generators': [x.get_state() for x in generators]}
+    if torch.cuda.is_available():
+        state['cuda'] = torch.cuda.get_rng_state_all()
+    return state
+
+
+def set_rng_state(state, generators=()):
+    random.setstate(state['python'])
+    np.random.set_state(state['numpy'])
+    torch.set_rng_state(state['torch'])
+    for generator, generator_state in zip(generators, state['generators']):
+        generator.set_state(generator_state)
+    if 'cuda' in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state['cuda'])
+
+
+def atomic_save(obj, path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + '.tmp'
+    torch.save(obj, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+class Checkpointer:
+    """
+    path: the checkpoint file, replaced at every save.
+    best_path: file of the best weights seen by track() (None: not kept).
+    every_epochs, every_seconds: save once this many epochs / seconds have
+                                 passed since the last save, whichever comes
+                                 first; None leaves that one out.
+    generators: torch.Generator objects of the loaders and samplers whose
+                state is saved and restored with the others (None entries
+                are skipped).
+    mode: 'max' when a larger tracked score is better (accuracy), 'min' for a loss.
+    background: write on the writer thread (False writes before returning).
+    """
+    def __init__(self, path, best_path=None, every_epochs=1, every_seconds=None, generators=(), mode='max',
+                 background=True):
+        if mode not in ('max', 'min'):
+            raise ValueError("mode must be 'max' or 'min', got {!r}".format(mode))
+        self.path = path
+        self.best_path = best_path
+        self.every_epochs = every_epochs
+        self.every_seconds = every_seconds
+        self.generators = [x for x in generators if x is not None]
+        self.mode = mode
+        self.background = background
+        self.best = None
+        self._last_epoch = None
+        self._last_time = time.time()
+        self._pending = {}
+        self._writing = False
+        self._error = None
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def resume(self, model, optimizer=None):
+        """
+        Restore model, optimizer, generators and the best score from the
+        checkpoint at path, if there is one. Returns (first epoch to train,
+        the state passed to save), or (0, {}) to start from scratch.
+        """
+        if not os.path.exists(self.path):
+            return 0, {}
+        checkpoint = torch.load(self.path, map_location='cpu', weights_only=False)
+        model.load_state_dict(checkpoint['model'])
+        if optimizer is not None and checkpoint['optimizer'] is not None:
+            optimizer.load_state_dict(checkpoint['optimizer'])
+        set_rng_state(checkpoint['rng'], self.generators)
+        self.best = checkpoint['best']
+        self._last_epoch = checkpoint['epoch']
+        print('Resumed from', self.path, 'after epoch', checkpoint['epoch'])
+        return checkpoint['epoch'] + 1, checkpoint['state']
+
+    def due(self, epoch):
+        last = self._last_epoch if self._last_epoch is not None else -1
+        if self.every_epochs and epoch - last >= self.every_epochs:
+            return True
+        return self.every_seconds is not None and time.time() - self._last_time >= self.every_seconds
+
+    def save(self, epoch, model, optimizer=None, **state):
+        """
+        Checkpoint after epoch: the model, optimizer and state are copied now and written in the background.
+        """
+        self._last_epoch = epoch
+        self._last_time = time.time()
+        checkpoint = {'epoch': epoch, 'model': _detached(model.state_dict()),
+                      'optimizer': None if optimizer is None else _detached(optimizer.state_dict()),
+                      'rng': rng_state(self.generators), 'best': self.best, 'state': copy.deepcopy(state)}
+        self._submit(self.path, checkpoint)
+
+    def step(self, epoch, model, optimizer=None, force=False, **state):
+        """
+        save if a checkpoint is due after epoch, or force (e.g. after the last epoch).
+        """
+        if force or self.due(epoch):
+            self.save(epoch, model, optimizer, **state)
+
+    def track(self, score, model):
+        """
+        Keep model's weights in best_path if score beats every score so far.
+        Returns whether it did.
+        """
+        if self.best is not None and (score <= self.best if self.mode == 'max' else score >= self.best):
+            return False
+        self.best = score
+        if self.best_path is not None:
+            self._submit(self.best_path, _detached(model.state_dict()))
+        return True
+
+    def _submit(self, path, obj):
+        if not self.background:
+            atomic_save(obj, path)
+            return
+        with self._cond:
+            self._raise_error()
+            # a newer save of the same file replaces the one the writer has not started on
+            self._pending[path] = obj
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._write_loop, daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                path, obj = self._pending.popitem()
+                self._writing = True
+            try:
+                atomic_save(obj, path)
+            except Exception as e:
+                self._error = e
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError('writing a checkpoint failed') from error
+
+    def wait(self):
+        """
+        Block until every submitted file is written.
+        """
+        with self._cond:
+            while self._pending or self._writing:
+                self._cond.wait()
+            self._raise_error()
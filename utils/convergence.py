@@ -0,0 +1,127 @@
+"""
+Early stopping, plateau learning-rate decay and a wall-clock budget.
+
+The LSTM and CNN loops ran a fixed number of epochs at lr=0.01 whether or
+not the test metric still moved. Convergence is fed every evaluation
+(utils.evaluation) and is asked by the training loop whether to stop: once
+the monitored test loss or accuracy has not improved by more than min_delta
+for patience evaluations, or once max_seconds of training have passed. With
+lr_factor it also steps a ReduceLROnPlateau on the same metric, as FCNN.py
+does with its test loss.
+
+Evaluations can arrive on the background evaluation thread; they are only
+queued there, and the scheduler and counters are updated by stop() on the
+training thread, so the learning rate never changes in the middle of a step.
+"""
+import threading
+import time
+
+import torch
+
+MONITORS = ('loss', 'accuracy')
+
+
+class Convergence:
+    """
+    monitor: 'loss' (the Evaluator needs a loss_func) or 'accuracy'.
+    patience: evaluations without improvement before stopping (None: never).
+    min_delta: smallest change that counts as an improvement.
+    optimizer, lr_factor, lr_patience, min_lr: ReduceLROnPlateau(optimizer,
+        factor=lr_factor, patience=lr_patience) on the monitored metric;
+        lr_factor None leaves the learning rate alone.
+    max_seconds: wall-clock budget of the training, over resumes (None: none).
+    """
+    def __init__(self, monitor='loss', patience=30, min_delta=0.0, optimizer=None, lr_factor=None, lr_patience=10,
+                 min_lr=0.0, max_seconds=None):
+        if monitor not in MONITORS:
+            raise ValueError('unknown monitor {!r}, expected one of {}'.format(monitor, MONITORS))
+        if lr_factor is not None and optimizer is None:
+            raise ValueError('lr_factor needs the optimizer')
+        self.monitor = monitor
+        self.mode = 'min' if monitor == 'loss' else 'max'
+        self.patience = patience
+        self.min_delta = min_delta
+        self.max_seconds = max_seconds
+        self.optimizer = optimizer
+        self.scheduler = None
+        if lr_factor is not None:
+            self.scheduler = torch.optim.lr_scheduler.ReduceLROnPlateau(
+                optimizer, mode=self.mode, factor=lr_factor, patience=lr_patience, threshold=min_delta,
+                threshold_mode='abs', min_lr=min_lr)
+        self.best = None
+        self.bad_evaluations = 0
+        self.reason = None
+        self.elapsed_before = 0.0
+        self._start = time.time()
+        self._pending = []
+        self._lock = threading.Lock()
+
+    @property
+    def elapsed(self):
+        return self.elapsed_before + time.time() - self._start
+
+    @property
+    def stopped(self):
+        return self.reason is not None
+
+    def observe(self, result):
+        """
+        Queue an Evaluation; safe to call from the evaluation thread.
+        """
+        value = result.loss if self.monitor == 'loss' else result.accuracy
+        if value is None:
+            raise ValueError('evaluation has no {}; give the Evaluator a loss_func'.format(self.monitor))
+        with self._lock:
+            self._pending.append(value)
+
+    def _improved(self, value):
+        if self.best is None:
+            return True
+        if self.mode == 'min':
+            return value < self.best - self.min_delta
+        return value > self.best + self.min_delta
+
+    def stop(self):
+        """
+        Apply the evaluations queued since the last call; True once training should end.
+        """
+        with self._lock:
+            values, self._pending = self._pending, []
+        for value in values:
+            if self.scheduler is not None:
+                self.scheduler.step(value)
+            if self._improved(value):
+                self.best = value
+                self.bad_evaluations = 0
+            else:
+                self.bad_evaluations += 1
+            if self.reason is None and self.patience is not None and self.bad_evaluations >= self.patience:
+                self.reason = 'test {} not improved in {} evaluations'.format(self.monitor, self.bad_evaluations)
+        if self.reason is None and self.max_seconds is not None and self.elapsed >= self.max_seconds:
+            self.reason = 'time budget of {:.0f} s used'.format(self.max_seconds)
+        return self.reason is not None
+
+    def summary(self, epochs_done, epochs):
+        """
+        What stopping saved against running all epochs, estimated at the mean epoch time so far.
+        """
+        lr = '' if self.optimizer is None else ' | final lr: %g' % self.optimizer.param_groups[0]['lr']
+        if not self.stopped or epochs_done >= epochs:
+            return 'Ran all %d epochs in %.1f s%s' % (epochs, self.elapsed, lr)
+        saved = epochs - epochs_done
+        return 'Stopped after %d of %d epochs (%s): %d epochs, about %.0f s saved%s' % (
+            epochs_done, epochs, self.reason, saved, self.elapsed / max(epochs_done, 1) * saved, lr)
+
+    def state_dict(self):
+        return {'best': self.best, 'bad_evaluations': self.bad_evaluations, 'reason': self.reason,
+                'elapsed': self.elapsed,
+                'scheduler': None if self.scheduler is None else self.scheduler.state_dict()}
+
+    def load_state_dict(self, state):
+        self.best = state['best']
+        self.bad_evaluations = state['bad_evaluations']
+        self.reason = state['reason']
+        self.elapsed_before = state['elapsed']
+        self._start = time.time()
+        if self.scheduler is not None and state['scheduler'] is not None:
+            self.scheduler.load_state_dict(state['scheduler'])
@@ -0,0 +1,206 @@
+"""
+Chunked binary store for the derived datasets (sequence_data/dataset<T>,
+processed_data/total_dataset<T><k>).
+
+A store is a directory:
+
+    index.json      columns, rows, window length, chunk layout, compression
+    labels.npy      optional, one label per window
+    data.npy        uncompressed stores: the whole (rows, columns) float32 array
+    chunk_NNNNN.z   compressed stores: zlib-compressed float32 row chunks
+
+Uncompressed stores are read as a memory map. Compressed stores keep chunks
+of whole windows, so reading a window decompresses at most one chunk; the
+last decompressed chunk is kept for the next read.
+"""
+import hashlib
+import json
+import os
+import shutil
+import zlib
+
+import numpy as np
+import pandas as pd
+
+CHUNK_ROWS = 4096
+INDEX_FILE = 'index.json'
+LABELS_FILE = 'labels.npy'
+DATA_FILE = 'data.npy'
+
+
+def _chunk_rows(chunk_rows, window_length):
+    # whole windows per chunk, so a window never spans two chunks
+    if window_length:
+        return max(1, chunk_rows // window_length) * window_length
+    return chunk_rows
+
+
+def write_dataset(path, data, labels=None, columns=None, window_length=None, compression='zlib', level=6,
+                  chunk_rows=CHUNK_ROWS):
+    """
+    Write a (rows, columns) array (or DataFrame) as a store at path, replacing
+    what is there. labels holds one label per window of window_length rows;
+    compression is 'zlib' or None.
+    """
+    if hasattr(data, 'columns'):
+        columns = [str(x) for x in data.columns] if columns is None else columns
+        data = data.values
+    data = np.ascontiguousarray(data, dtype='float32')
+    if data.ndim != 2:
+        raise ValueError('expected a (rows, columns) array, got shape {}'.format(data.shape))
+    columns = [str(x) for x in (columns if columns is not None else range(data.shape[1]))]
+    if len(columns) != data.shape[1]:
+        raise ValueError('{} column names for {} columns'.format(len(columns), data.shape[1]))
+    if compression not in ('zlib', None):
+        raise ValueError('unknown compression {!r}'.format(compression))
+    if window_length and data.shape[0] % window_length:
+        raise ValueError('{} rows are not a whole number of {}-row windows'.format(data.shape[0], window_length))
+    if labels is not None:
+        labels = np.asarray(labels)
+        if labels.dtype == object:
+            # keep labels.npy loadable without pickle
+            labels = labels.astype(str)
+        if window_length and labels.shape[0] != data.shape[0] // window_length:
+            raise ValueError('{} labels for {} windows'.format(labels.shape[0], data.shape[0] // window_length))
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    os.makedirs(path)
+    index = {
+        'columns': columns,
+        'dtype': 'float32',
+        'rows': int(data.shape[0]),
+        'window_length': window_length,
+        'compression': compression,
+        'chunk_rows': _chunk_rows(chunk_rows, window_length),
+        'chunks': [],
+        'labels': LABELS_FILE if labels is not None else None,
+    }
+    if compression is None:
+        np.save(os.path.join(path, DATA_FILE), data)
+    else:
+        for n, start in enumerate(range(0, data.shape[0], index['chunk_rows'])):
+            chunk = data[start:start + index['chunk_rows']]
+            name = 'chunk_{:05d}.z'.format(n)
+            with open(os.path.join(path, name), 'wb') as f:
+                f.write(zlib.compress(chunk.tobytes(), level))
+            index['chunks'].append({'file': name, 'start': start, 'rows': int(chunk.shape[0])})
+    if labels is not None:
+        np.save(os.path.join(path, LABELS_FILE), labels)
+    with open(os.path.join(path, INDEX_FILE), 'w') as f:
+        json.dump(index, f, indent=1)
+    return DatasetStore(path)
+
+
+def is_store(path):
+    return os.path.exists(os.path.join(path, INDEX_FILE))
+
+
+def fingerprint(path):
+    """
+    Digest of the name, size and modification time of every file of the
+    dataset at path (a store, or the csv at path + '.csv'). It changes
+    whenever the dataset is rewritten, so state derived from it (a fitted
+    scaler) can record it and be rebuilt when it no longer matches.
+    """
+    if is_store(path):
+        files = sorted(os.path.join(path, x) for x in os.listdir(path))
+    else:
+        files = [x for x in (path, path + '.csv') if os.path.isfile(x)]
+    digest = hashlib.sha1()
+    for name in files:
+        stat = os.stat(name)
+        digest.update('{}:{}:{}\n'.format(os.path.basename(name), stat.st_size, stat.st_mtime_ns).encode())
+    return digest.hexdigest()
+
+
+class DatasetStore:
+    """
+    Read side of a store written by write_dataset.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, INDEX_FILE), 'r') as f:
+            self.index = json.load(f)
+        self.columns = self.index['columns']
+        self.window_length = self.index['window_length']
+        self._data = None
+        self._cached_chunk = (None, None)
+        if self.index['compression'] is None:
+            self._data = np.load(os.path.join(path, DATA_FILE), mmap_mode='r')
+
+    def __len__(self):
+        return self.index['rows']
+
+    @property
+    def shape(self):
+        return (self.index['rows'], len(self.columns))
+
+    @property
+    def n_windows(self):
+        return len(self) // self.window_length if self.window_length else 0
+
+    @property
+    def labels(self):
+        if self.index['labels'] is None:
+            return None
+        return np.load(os.path.join(self.path, self.index['labels']))
+
+    def _column_positions(self, columns):
+        if columns is None:
+            return None
+        return [self.columns.index(str(x)) for x in columns]
+
+    def _chunk(self, n):
+        if self._cached_chunk[0] != n:
+            entry = self.index['chunks'][n]
+            with open(os.path.join(self.path, entry['file']), 'rb') as f:
+                chunk = np.frombuffer(zlib.decompress(f.read()), dtype='float32')
+            self._cached_chunk = (n, chunk.reshape(entry['rows'], len(self.columns)))
+        return self._cached_chunk[1]
+
+    def rows(self, start, stop, columns=None):
+        """
+        Rows [start, stop) as a float32 array (a memory-map view when the store
+        is uncompressed and all columns are asked for).
+        """
+        positions = self._column_positions(columns)
+        start, stop, _ = slice(start, stop).indices(len(self))
+        if self._data is not None:
+            block = self._data[start:stop]
+        elif start >= stop:
+            block = np.empty((0, len(self.columns)), dtype='float32')
+        else:
+            chunk_rows = self.index['chunk_rows']
+            first, last = start // chunk_rows, (stop - 1) // chunk_rows
+            if first == last:
+                block = self._chunk(first)[start - first * chunk_rows:stop - first * chunk_rows]
+                return block if positions is None else block[:, positions]
+            # several chunks: decompress them one at a time straight into the requested rows and columns
+            block = np.empty((stop - start, len(self.columns) if positions is None else len(positions)),
+                             dtype='float32')
+            for n in range(first, last + 1):
+                offset = n * chunk_rows
+                part = self._chunk(n)[max(start - offset, 0):stop - offset]
+                row = max(offset - start, 0)
+                block[row:row + part.shape[0]] = part if positions is None else part[:, positions]
+            return block
+        return block if positions is None else block[:, positions]
+
+    def window(self, i, columns=None):
+        """
+        Window i, shape (window_length, columns).
+        """
+        if not self.window_length:
+            raise ValueError('{} has no window length'.format(self.path))
+        if not 0 <= i < self.n_windows:
+            raise IndexError('window {} out of range ({} windows)'.format(i, self.n_windows))
+        return self.rows(i * self.window_length, (i + 1) * self.window_length, columns)
+
+    def read(self, columns=None):
+        """
+        The whole dataset, shape (rows, columns).
+        """
+        return self.rows(0, len(self), columns)
+
+    def to_frame(self, columns=None):
+        return pd.DataFrame(self.read(columns), columns=columns if columns is not None else self.columns)
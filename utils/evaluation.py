@@ -0,0 +1,139 @@
+"""
+Test-set evaluation hook for the training loops.
+
+The loops ran the whole test set through the model every 10 steps with
+autograd on, building a graph nobody used, and CNN.py re-viewed and
+re-transferred X_test every time. Evaluator is given the test inputs once,
+already shaped and on the model's device, evaluates under
+torch.inference_mode, and only when due: every_steps training steps and/or
+every_seconds seconds after the last evaluation.
+
+With background=True the evaluation runs on a worker thread against a
+snapshot of the weights (a copy of the model the current state is loaded
+into), so the training step does not wait for it; an evaluation that comes
+due while the previous one is still running is skipped.
+"""
+import copy
+import threading
+import time
+from collections import namedtuple
+
+import torch
+
+# step: training steps done when the weights were taken; info: what the loop passed to Evaluator.step
+Evaluation = namedtuple('Evaluation', ['step', 'accuracy', 'loss', 'info'])
+
+
+class Evaluator:
+    """
+    model: the model being trained.
+    inputs: tuple of model inputs for the test set (e.g. (X_test,) or
+            (X_test, lengths)), shaped and on the model's device.
+    targets: test labels, on the same device.
+    every_steps, every_seconds: evaluate once this many steps / seconds have
+                                passed since the last evaluation, whichever
+                                comes first; None leaves that one out. The
+                                first step is always evaluated.
+    loss_func: optional, to report the test loss as well.
+    callback: called with every Evaluation and the model it was made with
+              (the snapshot in the background), on the thread that made it.
+    """
+    def __init__(self, model, inputs, targets, every_steps=10, every_seconds=None, loss_func=None, callback=None,
+                 background=False):
+        self.model = model
+        self.inputs = tuple(inputs)
+        self.targets = targets
+        self.every_steps = every_steps
+        self.every_seconds = every_seconds
+        self.loss_func = loss_func
+        self.callback = callback
+        self.background = background
+        self.history = []
+        self.steps = 0
+        self._last_step = None
+        self._last_time = None
+        self._snapshot = copy.deepcopy(model) if background else None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def due(self):
+        if self._last_step is None:
+            return True
+        if self.every_steps and self.steps - self._last_step >= self.every_steps:
+            return True
+        return self.every_seconds is not None and time.time() - self._last_time >= self.every_seconds
+
+    def step(self, **info):
+        """
+        Count one training step and evaluate if due; info (epoch, train loss,
+        ...) is kept with the result. Returns the Evaluation when it was made
+        here, None when it was not due or went to the background thread.
+        """
+        self.steps += 1
+        if not self.due():
+            return None
+        if not self.background:
+            self._mark()
+            return self._run(self.model, self.steps, info)
+        if self._thread is not None and self._thread.is_alive():
+            return None
+        self._mark()
+        self._snapshot.load_state_dict(self.model.state_dict())
+        self._thread = threading.Thread(target=self._run, args=(self._snapshot, self.steps, info), daemon=True)
+        self._thread.start()
+        return None
+
+    def _mark(self):
+        self._last_step = self.steps
+        self._last_time = time.time()
+
+    def evaluate(self, model=None):
+        """
+        (accuracy, loss or None) of model (default the trained one) on the test set.
+        """
+        model = model or self.model
+        training = model.training
+        model.eval()
+        try:
+            with torch.inference_mode():
+                output = model(*self.inputs)
+                accuracy = (output.argmax(1) == self.targets).float().mean().item()
+                loss = self.loss_func(output, self.targets).item() if self.loss_func is not None else None
+        finally:
+            model.train(training)
+        return accuracy, loss
+
+    def _run(self, model, step, info):
+        accuracy, loss = self.evaluate(model)
+        result = Evaluation(step, accuracy, loss, info)
+        with self._lock:
+            self.history.append(result)
+        if self.callback is not None:
+            self.callback(result, model)
+        return result
+
+    def wait(self):
+        """
+        Let a background evaluation that is still running finish.
+        """
+        if self._thread is not None:
+            self._thread.join()
+
+    def state_dict(self):
+        """
+        Step count and results so far, to be saved with a checkpoint.
+        """
+        with self._lock:
+            return {'steps': self.steps, 'last_step': self._last_step, 'history': list(self.history)}
+
+    def load_state_dict(self, state):
+        self.steps = state['steps']
+        self._last_step = state['last_step']
+        self._last_time = time.time()
+        with self._lock:
+            self.history = list(state['history'])
+
+    @property
+    def accuracies(self):
+        with self._lock:
+            return [x.accuracy for x in self.history]
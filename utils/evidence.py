@@ -0,0 +1,93 @@
+"""
+Evidence tensor for the Bayesian scripts.
+
+The 1..59 s sweeps in BN.py, discrete_NB.py and Gauss_NB.py need the mean of
+every channel of every run over each second. build_evidence reads every
+evidence file once and keeps those means in a single (runs, seconds,
+channels) float32 array; each second of the sweep is then a slice.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.aggregation import per_second_mean
+from utils.run_index import EVIDENCE_SUB_CLASS_SPLITS, RunIndex
+from utils.time_index import IndexedRun
+
+SECONDS = range(1, 60)
+
+
+def evidence_files(data1path):
+    """
+    [(path, file name), ...] in the order the Bayes scripts index their rows:
+    sub folders alphabetically (LOCA, MSLB, NORMAL, SGTR), files by break size.
+    """
+    files = []
+    for filename in sorted(os.listdir(data1path)):
+        result_path = data1path + "/" + filename
+        result_list = os.listdir(result_path)
+        result_list.sort(key=lambda x: int(x[:-8]))
+        files += [(result_path + "/" + x, x) for x in result_list]
+    return files
+
+
+class EvidenceSet:
+    """
+    values: (runs, seconds, channels) float32 per-second channel means.
+    labels: class name of every run (the file name without break size and extension).
+    names: file name of every run.
+    run_index: utils.run_index.RunIndex of the runs (type, break-size rank, sub class).
+    """
+    def __init__(self, values, labels, names, seconds=SECONDS, run_index=None):
+        self.values = values
+        self.labels = labels
+        self.names = names
+        self.seconds = list(seconds)
+        self.run_index = run_index
+
+    def at(self, second):
+        """
+        (runs, channels) means of one second.
+        """
+        return self.values[:, self.seconds.index(int(second))]
+
+    def frame(self, second, dtype='float64'):
+        """
+        The evidence table of one second as the scripts build it: class name
+        in column 0, the channel means in columns 1..12 (as dtype; float32
+        keeps the evidence values without a copy).
+        """
+        data_source = pd.DataFrame(self.at(second).astype(dtype, copy=False), columns=range(1, self.values.shape[2] + 1))
+        data_source.insert(0, 0, self.labels)
+        return data_source
+
+
+def parse_event_types(text):
+    """
+    Event types typed at a prompt ('SLOCA','NORM' or ['SLOCA', 'NORM'] or SLOCA, NORM) as a list, without eval.
+    """
+    names = [x.strip(' \'"[]()') for x in text.split(',')]
+    return [x for x in names if x]
+
+
+def build_evidence(data1path, seconds=SECONDS, dtype='float32', channels=None, splits=EVIDENCE_SUB_CLASS_SPLITS):
+    """
+    Parse every evidence file under data1path once and return an EvidenceSet
+    with the mean of each second in seconds ([s, s + 1) in run time).
+    channels (a utils.channels selection) limits the columns that are decoded;
+    splits sets the sub classes of the run index.
+    """
+    seconds = list(seconds)
+    files = evidence_files(data1path)
+    values = None
+    for i, (path, name) in enumerate(files):
+        run = IndexedRun.from_file(path, channels=channels)
+        means = per_second_mean(run.time_ms, run.values, 1.0, window_length=max(seconds) + 1)[seconds]
+        if values is None:
+            values = np.empty((len(files), len(seconds), means.shape[1]), dtype=dtype)
+        values[i] = means
+    if values is None:
+        values = np.empty((0, len(seconds), 0), dtype=dtype)
+    return EvidenceSet(values, [x[1][-8:-4] for x in files], [x[1] for x in files], seconds,
+                       RunIndex.from_evidence(files, splits))
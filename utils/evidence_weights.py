@@ -0,0 +1,65 @@
+"""
+Evidence rows with a multiplicity instead of duplicated copies.
+
+The discrete Bayes scripts oversample rare events ("increase some events")
+by repeating evidence rows. An evidence csv (train_set.csv, train_data.csv,
+test_data.csv) now keeps every distinct row once with its multiplicity in
+WEIGHT_COLUMN, so it stays at one row per run whatever the oversampling;
+the stratified split draws from the multiset and the counts of the naive
+Bayes training are weighted, which gives the same result as the copies.
+"""
+import numpy as np
+import pandas as pd
+
+# multiplicity of the row: the number of identical samples it stands for
+WEIGHT_COLUMN = '样本数'
+
+
+def with_weights(frame, weights):
+    """
+    frame with WEIGHT_COLUMN appended, without the rows of weight 0.
+    """
+    weights = np.asarray(weights, dtype='int64')
+    if weights.shape[0] != frame.shape[0]:
+        raise ValueError('{} weights for {} rows'.format(weights.shape[0], frame.shape[0]))
+    return frame.assign(**{WEIGHT_COLUMN: weights})[weights > 0]
+
+
+def read_weighted(path):
+    """
+    (frame, weights) of an evidence csv; files written before the weight
+    column existed have one sample per row.
+    """
+    frame = pd.read_csv(path, index_col=0)
+    if WEIGHT_COLUMN in frame.columns:
+        weights = frame.pop(WEIGHT_COLUMN).to_numpy(dtype='int64')
+    else:
+        weights = np.ones(frame.shape[0], dtype='int64')
+    return frame, weights
+
+
+def split_weights(labels, weights, n_by_class, rng=None):
+    """
+    Stratified split of weighted rows, as group.sample(n) per class over the
+    rows repeated weight times: n_by_class[label] samples of every class go to
+    train (a multivariate hypergeometric draw over its rows), the rest to test.
+    Returns (train weights, test weights), both aligned with labels.
+    """
+    rng = np.random.default_rng(rng)
+    labels = np.asarray(labels)
+    weights = np.asarray(weights, dtype='int64')
+    train = np.zeros_like(weights)
+    for label in pd.unique(labels):
+        rows = np.flatnonzero(labels == label)
+        n = n_by_class[label]
+        if n > weights[rows].sum():
+            raise ValueError('cannot draw {} samples of {} from {}'.format(n, label, weights[rows].sum()))
+        train[rows] = rng.multivariate_hypergeometric(weights[rows], n)
+    return train, weights - train
+
+
+def weighted_count(weights, mask):
+    """
+    Number of samples of the rows selected by mask.
+    """
+    return int(np.asarray(weights)[np.asarray(mask)].sum())
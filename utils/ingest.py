@@ -0,0 +1,157 @@
+"""
+Parallel ingestion of raw simulator runs.
+
+Every run pair is parsed (or memory-mapped from the run cache) and aggregated
+in a worker process; results come back in accident-type / run-number order,
+which is the row order the Interpolation classes slice on.
+ingest_incremental keeps a manifest (utils.manifest) so that only new or
+changed runs go to the pool; the bin means of the others are read back from
+their per-run outputs.
+Callers must sit behind an `if __name__ == "__main__":` guard, since worker
+processes re-import the main module on Windows.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from utils.aggregation import aggregate_runs
+from utils.channels import resolve_channels
+from utils.manifest import Manifest
+from utils.raw_cache import RawRunCache, list_raw_runs, read_raw_run, run_id
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def ordered_map(func, tasks, workers=None, chunksize=1):
+    """
+    map() over a process pool; results keep the order of tasks.
+    workers=1 runs in-process, None uses every core.
+    """
+    tasks = list(tasks)
+    workers = default_workers() if workers is None else workers
+    workers = min(workers, len(tasks))
+    if workers <= 1:
+        return [func(*task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_call, [(func, task) for task in tasks], chunksize=chunksize))
+
+
+def _call(func_and_task):
+    func, task = func_and_task
+    return func(*task)
+
+
+def ingest_run(accident, run_number, path_1, path_2, cache_dir=None, bin_width=1.0, window_length=50,
+               refresh=False, channels=None):
+    """
+    Bin means of one run, shape (n_bins, channels). The run is taken from
+    (and, if missing, added to) the cache when cache_dir is given;
+    refresh re-parses it into the cache even if it is there. channels
+    restricts the result (and, without a cache, the parsing) to a
+    utils.channels selection.
+    """
+    if cache_dir is None:
+        run = read_raw_run(path_1, path_2, channels)
+    else:
+        cache = RawRunCache(cache_dir)
+        if refresh or not cache.contains(accident, run_number):
+            cache.ingest(accident, run_number, path_1, path_2)
+        run = cache.load(accident, run_number, channels)
+    return aggregate_runs([run], bin_width, window_length)[0]
+
+
+def ingest_types(raw_dir, accident_types, workers=None, cache_dir=None, bin_width=1.0, window_length=50,
+                 channels=None):
+    """
+    Fan every run of every accident type out to a worker pool.
+    Returns {accident: (runs, n_bins, channels)} in accident_types / run-number order;
+    with window_length=None every run keeps its whole duration, and a type whose
+    runs differ in length maps to a list of (n_bins, channels) arrays.
+    """
+    tasks = []
+    counts = []
+    for accident in accident_types:
+        runs = list_raw_runs(raw_dir, accident)
+        counts.append(len(runs))
+        for run_number, path_1, path_2 in runs:
+            tasks.append((accident, run_number, path_1, path_2, cache_dir, bin_width, window_length, False, channels))
+    workers = default_workers() if workers is None else workers
+    chunksize = max(1, len(tasks) // (4 * max(workers, 1)))
+    means = ordered_map(ingest_run, tasks, workers, chunksize)
+    return _group_by_type(accident_types, counts, means)
+
+
+def _group_by_type(accident_types, counts, means):
+    result = {}
+    start = 0
+    for accident, count in zip(accident_types, counts):
+        group = means[start:start + count]
+        if not count:
+            result[accident] = np.empty((0, 0, 0))
+        elif len(set(x.shape for x in group)) == 1:
+            result[accident] = np.stack(group)
+        else:
+            # whole runs (window_length=None) of different durations stay a list
+            result[accident] = group
+        start += count
+    return result
+
+
+def means_key(bin_width=1.0, window_length=50, channels=None):
+    """
+    Name of the means directory for one set of ingestion parameters, e.g.
+    'bin1000ms_60s_all' or 'bin1000ms_whole_0-3'; window_length None is a
+    whole run.
+    """
+    channels = resolve_channels(channels)
+    window = 'whole' if window_length is None else '{:g}s'.format(window_length)
+    selected = 'all' if channels == resolve_channels(None) else '-'.join(str(x) for x in channels)
+    return 'bin{}ms_{}_{}'.format(int(round(bin_width * 1000)), window, selected)
+
+
+def ingest_incremental(raw_dir, accident_types, workers=None, cache_dir='./cache', bin_width=1.0,
+                       window_length=50, manifest_path=None, channels=None):
+    """
+    ingest_types that only parses runs which are new or changed since the
+    last call. The bin means of every run are kept in
+    <cache_dir>/means/<key>/<TYPE>/<TYPE>-NN.npy and listed in
+    <cache_dir>/means/<key>/manifest.json, key naming the bin width, window
+    length and channels (means_key), so switching between settings keeps the
+    means of each. The result is reassembled from them in accident_types /
+    run-number order, so a run added to the middle of a type lands in its
+    place, not at the end.
+    Returns ({accident: (runs, n_bins, channels)} as ingest_types, ingested run ids).
+    """
+    means_dir = os.path.join(cache_dir, 'means', means_key(bin_width, window_length, channels))
+    manifest = Manifest(manifest_path or os.path.join(means_dir, 'manifest.json'))
+    params = {'bin_width': bin_width, 'window_length': window_length, 'channels': resolve_channels(channels)}
+    listed = []
+    tasks = []
+    counts = []
+    for accident in accident_types:
+        runs = list_raw_runs(raw_dir, accident)
+        counts.append(len(runs))
+        for run_number, path_1, path_2 in runs:
+            listed.append((accident, run_number, path_1, path_2))
+            if not manifest.is_current(run_id(accident, run_number), [path_1, path_2], params):
+                tasks.append((accident, run_number, path_1, path_2, cache_dir, bin_width, window_length, True,
+                              channels))
+    workers = default_workers() if workers is None else workers
+    chunksize = max(1, len(tasks) // (4 * max(workers, 1)))
+    for task, run_means in zip(tasks, ordered_map(ingest_run, tasks, workers, chunksize)):
+        accident, run_number, path_1, path_2 = task[:4]
+        output = os.path.join(means_dir, accident, run_id(accident, run_number) + '.npy')
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        np.save(output, run_means)
+        manifest.record(run_id(accident, run_number), accident, run_number, [path_1, path_2], output, params)
+    # runs deleted from raw_data drop out of the manifest (and so out of the dataset)
+    present = set(run_id(x[0], x[1]) for x in listed)
+    for name in manifest.run_ids():
+        if manifest[name]['accident'] in accident_types and name not in present:
+            manifest.discard(name)
+    manifest.save()
+    means = [np.load(manifest[run_id(x[0], x[1])]['output']) for x in listed]
+    return _group_by_type(accident_types, counts, means), [run_id(x[0], x[1]) for x in tasks]
@@ -0,0 +1,95 @@
+"""
+Closed-form block interpolation between adjacent runs.
+
+The interpolation scripts treat a class as n consecutive blocks (one per run,
+sorted by break size) of block_length rows and, per pass, insert the mean of
+every two neighbouring blocks between them. After k passes original block b
+sits at block b * 2**k and every block in between is the mean of the two
+blocks step rows apart on either side, for step = 2**(k-1), ..., 2, 1. The
+whole result is filled into one preallocated array with strided writes, in
+that order, so it equals k sequential passes bit for bit.
+"""
+import math
+
+import numpy as np
+
+# (accident type, first run, end run) of the rows the interpolation scripts slice, one block per run
+CLASS_RUNS = [('LOCA', 0, 100), ('MSLB', 100, 200), ('SGTR', 200, 300), ('NORM', 300, 305)]
+# add_label: small / medium / large break fractions and the label of the small breaks
+SUB_CLASS_SPLITS = {'LOCA': ((0.11, 0.31), 0), 'MSLB': ((0.11, 0.26), 3), 'SGTR': ((0.14, 0.32), 6), 'NORM': ((), 9)}
+
+
+def interpolated_blocks(n_blocks, levels):
+    """
+    Number of blocks after levels passes over n_blocks blocks.
+    """
+    return (n_blocks - 1) * 2 ** levels + 1 if n_blocks else 0
+
+
+def interpolate_blocks(data, block_length, levels, dtype=None, out=None):
+    """
+    data: (n_blocks * block_length, channels) rows, block after block.
+    Returns (interpolated_blocks(n_blocks, levels) * block_length, channels),
+    written into out when given (e.g. this class's rows of a preallocated
+    dataset, so the classes are never concatenated).
+    """
+    data = np.asarray(data)
+    rows, channels = data.shape
+    if block_length <= 0 or rows % block_length:
+        raise ValueError('{} rows are not a whole number of {}-row blocks'.format(rows, block_length))
+    if levels < 0:
+        raise ValueError('levels must be >= 0, got {}'.format(levels))
+    blocks = data.reshape(-1, block_length, channels)
+    n_blocks = blocks.shape[0]
+    shape = (interpolated_blocks(n_blocks, levels) * block_length, channels)
+    if out is None:
+        out = np.empty(shape, dtype=dtype or data.dtype)
+    elif out.shape != shape or not out.flags['C_CONTIGUOUS']:
+        raise ValueError('out must be a C-contiguous {} array, got {}'.format(shape, out.shape))
+    result = out
+    out = out.reshape(-1, block_length, channels)
+    spacing = 2 ** levels
+    out[::spacing] = blocks
+    step = spacing // 2
+    while step >= 1:
+        # blocks at odd multiples of step, from their neighbours filled in the coarser pass
+        left = out[0:-step:2 * step]
+        right = out[2 * step::2 * step]
+        target = out[step::2 * step]
+        np.add(right, left, out=target)
+        target /= 2
+        step //= 2
+    return result
+
+
+def interpolated_window(blocks, position, levels, memo=None):
+    """
+    Block position of interpolate_blocks(blocks, ..., levels) without building
+    the rest: the same midpoint-of-neighbours recursion, so the result is
+    bit-identical. blocks: (n_blocks, block_length, channels).
+    """
+    spacing = 2 ** levels
+    if position % spacing == 0:
+        return blocks[position // spacing]
+    memo = {} if memo is None else memo
+    if position not in memo:
+        step = position & -position
+        right = interpolated_window(blocks, position + step, levels, memo)
+        left = interpolated_window(blocks, position - step, levels, memo)
+        memo[position] = (right + left) / 2
+    return memo[position]
+
+
+def sub_class_labels(accident, n_windows):
+    """
+    Integer labels of the n_windows windows of one accident type, split by
+    break size as Interpolation.add_label does (math.ceil of the fractions).
+    """
+    fractions, label = SUB_CLASS_SPLITS[accident]
+    labels = np.full(n_windows, label, dtype='int64')
+    if fractions:
+        small = math.ceil(n_windows * fractions[0])
+        medium = math.ceil(n_windows * fractions[1])
+        labels[small:medium] = label + 1
+        labels[medium:] = label + 2
+    return labels
@@ -0,0 +1,99 @@
+"""
+Manifest of the raw runs that have already been ingested.
+
+One json file maps every run id to the size, mtime and sha1 of its two raw
+halves and to the per-run output (the bin means) written for it. A run is
+re-ingested only when it is new or one of its halves changed; size and mtime
+are checked first and the hash is only computed when they differ, so an
+untouched raw_data folder costs one stat() per file.
+"""
+import hashlib
+import json
+import os
+
+BUFFER_SIZE = 1 << 20
+
+
+def file_digest(path, buffer_size=BUFFER_SIZE):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(buffer_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def describe_source(path, digest=None):
+    return {'path': path, 'size': os.path.getsize(path), 'mtime': os.path.getmtime(path),
+            'sha1': digest if digest is not None else file_digest(path)}
+
+
+class Manifest:
+    """
+    Run id -> {accident, run_number, sources, output, params} stored at path.
+    params holds whatever the output depends on besides the sources (bin width,
+    window length); an entry with other params is treated as stale.
+    """
+    def __init__(self, path='./cache/manifest.json'):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.entries = json.load(f)['runs']
+
+    def __contains__(self, run_id):
+        return run_id in self.entries
+
+    def __getitem__(self, run_id):
+        return self.entries[run_id]
+
+    def run_ids(self):
+        return list(self.entries)
+
+    def is_current(self, run_id, sources, params=None):
+        """
+        True when run_id is recorded with the same params, its output exists
+        and none of its sources changed.
+        """
+        entry = self.entries.get(run_id)
+        if entry is None or entry.get('params') != params or not os.path.exists(entry['output']):
+            return False
+        if len(entry['sources']) != len(sources):
+            return False
+        for recorded, path in zip(entry['sources'], sources):
+            if recorded['path'] != path or recorded['size'] != os.path.getsize(path):
+                return False
+            if recorded['mtime'] != os.path.getmtime(path):
+                # touched but maybe not edited: only the content decides
+                if recorded['sha1'] != file_digest(path):
+                    return False
+                recorded['mtime'] = os.path.getmtime(path)
+        return True
+
+    def record(self, run_id, accident, run_number, sources, output, params=None):
+        self.entries[run_id] = {
+            'accident': accident,
+            'run_number': run_number,
+            'sources': [describe_source(x) for x in sources],
+            'output': output,
+            'params': params,
+        }
+        return self.entries[run_id]
+
+    def discard(self, run_id):
+        self.entries.pop(run_id, None)
+
+    def save(self):
+        """
+        Write the manifest atomically (temp file + rename), so an interrupted
+        ingestion never leaves a half-written manifest behind.
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump({'runs': self.entries}, f, indent=1, sort_keys=True)
+        os.replace(temp_path, self.path)
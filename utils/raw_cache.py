@@ -0,0 +1,198 @@
+"""
+Binary cache for the raw simulator runs in raw_data/<TYPE>/<TYPE>-NN-1 / -2.
+
+Every run is stored once as a float32 .npy array of shape (rows, 13): column 0
+is the time in integer milliseconds, columns 1..12 are the channels in
+CHANNEL_NAMES order. A small .json sidecar records where the array came from.
+Loading a run is a memory map, so the text files are only parsed once.
+
+    python -m utils.raw_cache ./raw_data ./cache
+"""
+import json
+import os
+import re
+import sys
+
+import numpy as np
+
+from utils.channels import CHANNEL_NAMES, resolve_channels
+from utils.tokenizer import count_rows, iter_blocks, iter_run_blocks
+
+COLUMN_NAMES = ["time_ms"] + CHANNEL_NAMES
+ACCIDENT_TYPES = ['LOCA', 'MSLB', 'SGTR', 'NORM']
+RAW_FILE_PATTERN = re.compile(r'^([A-Za-z]+)-(\d+)-([12])$')
+
+
+def read_raw_half(path):
+    """
+    Parse one half of a run (time column + 6 channels, newest row first).
+    Returns (time_ms, values) in chronological order.
+    """
+    blocks = list(iter_blocks(path, dtype='float64'))
+    if not blocks:
+        return np.empty(0, dtype='int64'), np.empty((0, 6), dtype='float64')
+    return np.concatenate([x[0] for x in blocks]), np.concatenate([x[1] for x in blocks])
+
+
+def read_raw_run(path_1, path_2, channels=None):
+    """
+    Join the two channel halves of a run row by row in memory.
+    Returns one (rows, 13) float32 array in chronological order; no merged
+    file is written (see export_merged_run for that). With channels only
+    those columns are decoded and the array is (rows, 1 + len(channels)).
+    """
+    blocks = [np.column_stack((time_ms, values)).astype('float32')
+              for time_ms, values in iter_run_blocks(path_1, path_2, dtype='float64', channels=channels)]
+    if not blocks:
+        return np.empty((0, 1 + len(resolve_channels(channels))), dtype='float32')
+    return np.concatenate(blocks)
+
+
+def export_merged_run(path_1, path_2, output_path):
+    """
+    Optional export of a run as one merged text file (the old Pre_data/<TYPE>/<n><TYPE>.txt layout).
+    """
+    with open(path_1, 'r') as fa, open(path_2, 'r') as fb, open(output_path, 'w') as fc:
+        for line in fa:
+            fc.write(line.strip('\r\n'))
+            fc.write('\t')
+            fc.write(fb.readline())
+
+
+def list_raw_runs(raw_dir, accident):
+    """
+    Return [(run_number, path_1, path_2), ...] for one accident type sorted by run number.
+    """
+    halves = {}
+    accident_dir = os.path.join(raw_dir, accident)
+    for filename in os.listdir(accident_dir):
+        match = RAW_FILE_PATTERN.match(filename)
+        if match is None or match.group(1) != accident:
+            continue
+        halves.setdefault(int(match.group(2)), {})[match.group(3)] = os.path.join(accident_dir, filename)
+    runs = []
+    for run_number in sorted(halves):
+        pair = halves[run_number]
+        if '1' not in pair or '2' not in pair:
+            raise ValueError('{}-{:02d} is missing one of its halves'.format(accident, run_number))
+        runs.append((run_number, pair['1'], pair['2']))
+    return runs
+
+
+def run_id(accident, run_number):
+    return '{}-{:02d}'.format(accident, run_number)
+
+
+class RawRunCache:
+    """
+    Loader for the binary run cache. build() ingests raw_data once, load()
+    memory-maps a run afterwards.
+    """
+    def __init__(self, cache_dir='./cache'):
+        self.cache_dir = cache_dir
+
+    def _run_path(self, accident, run_number, extension):
+        return os.path.join(self.cache_dir, accident, run_id(accident, run_number) + extension)
+
+    def contains(self, accident, run_number):
+        return (os.path.exists(self._run_path(accident, run_number, '.npy')) and
+                os.path.exists(self._run_path(accident, run_number, '.json')))
+
+    def accident_types(self):
+        if not os.path.isdir(self.cache_dir):
+            return []
+        found = [x for x in os.listdir(self.cache_dir) if os.path.isdir(os.path.join(self.cache_dir, x))]
+        # keep the usual LOCA, MSLB, SGTR, NORM order first
+        return [x for x in ACCIDENT_TYPES if x in found] + sorted(x for x in found if x not in ACCIDENT_TYPES)
+
+    def run_numbers(self, accident):
+        accident_dir = os.path.join(self.cache_dir, accident)
+        if not os.path.isdir(accident_dir):
+            return []
+        numbers = []
+        for filename in os.listdir(accident_dir):
+            if filename.endswith('.json'):
+                numbers.append(int(filename[len(accident) + 1:-5]))
+        return sorted(numbers)
+
+    def metadata(self, accident, run_number):
+        with open(self._run_path(accident, run_number, '.json'), 'r') as f:
+            return json.load(f)
+
+    def load(self, accident, run_number, channels=None):
+        """
+        Memory-map one run as a read-only (rows, 13) float32 array. With
+        channels, only the time column and those channels are copied out.
+        """
+        run = np.load(self._run_path(accident, run_number, '.npy'), mmap_mode='r')
+        if channels is None:
+            return run
+        return run[:, [0] + [x + 1 for x in resolve_channels(channels)]]
+
+    def load_all(self, accident, channels=None):
+        return [self.load(accident, x, channels) for x in self.run_numbers(accident)]
+
+    def ingest(self, accident, run_number, path_1, path_2):
+        """
+        Stream a run pair straight into its .npy file block by block, so runs
+        of any length are cached in constant memory.
+        """
+        os.makedirs(os.path.join(self.cache_dir, accident), exist_ok=True)
+        path = self._run_path(accident, run_number, '.npy')
+        rows = count_rows(path_1)
+        run = np.lib.format.open_memmap(path, mode='w+', dtype='float32', shape=(rows, len(COLUMN_NAMES)))
+        filled = 0
+        for time_ms, values in iter_run_blocks(path_1, path_2, dtype='float64'):
+            if filled + time_ms.shape[0] > rows:
+                raise ValueError('{} has more rows than counted'.format(path_1))
+            run[filled:filled + time_ms.shape[0], 0] = time_ms
+            run[filled:filled + time_ms.shape[0], 1:] = values
+            filled += time_ms.shape[0]
+        run.flush()
+        if filled != rows:
+            # blank lines in the source; keep only the parsed rows
+            run = np.array(run[:filled])
+            np.save(path, run)
+        return self._write_metadata(accident, run_number, run, [path_1, path_2])
+
+    def store(self, accident, run_number, run, sources):
+        os.makedirs(os.path.join(self.cache_dir, accident), exist_ok=True)
+        np.save(self._run_path(accident, run_number, '.npy'), run.astype('float32', copy=False))
+        return self._write_metadata(accident, run_number, run, sources)
+
+    def _write_metadata(self, accident, run_number, run, sources):
+        meta = {
+            'run_id': run_id(accident, run_number),
+            'accident': accident,
+            'run_number': run_number,
+            'rows': int(run.shape[0]),
+            'columns': COLUMN_NAMES,
+            'dtype': 'float32',
+            'time_start_ms': int(run[0, 0]) if run.shape[0] else 0,
+            'time_end_ms': int(run[-1, 0]) if run.shape[0] else 0,
+            'sources': [{'path': x, 'size': os.path.getsize(x), 'mtime': os.path.getmtime(x)} for x in sources],
+        }
+        with open(self._run_path(accident, run_number, '.json'), 'w') as f:
+            json.dump(meta, f, indent=1)
+        return meta
+
+    def build(self, raw_dir, accident_types=None, overwrite=False):
+        """
+        Ingest every run pair under raw_dir that is not cached yet.
+        Returns the run ids that were (re)built.
+        """
+        built = []
+        for accident in (accident_types or ACCIDENT_TYPES):
+            for run_number, path_1, path_2 in list_raw_runs(raw_dir, accident):
+                if not overwrite and self.contains(accident, run_number):
+                    continue
+                meta = self.ingest(accident, run_number, path_1, path_2)
+                built.append(meta['run_id'])
+                print('cached', meta['run_id'], meta['rows'])
+        return built
+
+
+if __name__ == "__main__":
+    raw_dir = sys.argv[1] if len(sys.argv) > 1 else './raw_data'
+    cache_dir = sys.argv[2] if len(sys.argv) > 2 else './cache'
+    RawRunCache(cache_dir).build(raw_dir)
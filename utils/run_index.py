@@ -0,0 +1,217 @@
+"""
+Run index of a dataset: one record per run, in dataset order.
+
+    run_id     <TYPE>-NN (or the evidence file name)
+    accident   accident type
+    rank       break-size rank within the type (0 = smallest)
+    sub_class  SLOCA / MLOCA / LLOCA, ..., NORM
+    label      integer label of the sub class (add_label numbering, NORM = 9)
+    offset     first row of the run in the dataset
+    length     rows of the run
+
+genarate_sequence_data.py writes it next to the sequence dataset (runs.json
+in the store directory). Types and sub classes are contiguous, so the rows,
+runs and labels of any of them are looked up instead of being spelled out as
+row ranges that only hold for 100 runs per type.
+"""
+import json
+import math
+import os
+from collections import namedtuple
+from fractions import Fraction
+
+import numpy as np
+
+from utils.interpolation import CLASS_RUNS, SUB_CLASS_SPLITS
+from utils.raw_cache import list_raw_runs, run_id
+
+RUN_INDEX_FILE = 'runs.json'
+SUB_CLASS_PREFIXES = ('S', 'M', 'L')
+# evidence folders named differently from the accident type
+ACCIDENT_ALIASES = {'NORMAL': 'NORM'}
+# Sub classes of the Bayes evidence runs (the averaged split of the Bayes scripts: LOCA 11 / 26 / 63 of 100 runs,
+# MSLB 11 / 26 / 63, SGTR 14 / 32 / 54). Fractions keep math.ceil exact, so 100 runs split at exactly 11 and 37.
+EVIDENCE_SUB_CLASS_SPLITS = {
+    'LOCA': ((Fraction(11, 100), Fraction(37, 100)), 0),
+    'MSLB': ((Fraction(11, 100), Fraction(37, 100)), 3),
+    'SGTR': ((Fraction(14, 100), Fraction(46, 100)), 6),
+    'NORM': ((), 9),
+}
+
+# Sub classes the Bayes scripts oversample ("increase some events"): the 6 s split the extra sample counts were tuned
+# on (LOCA 11 / 29 / 60 of 100 runs, MSLB 21 / 21 / 58, SGTR 10 / 38 / 52), i.e. the old index ranges 0~10, 11~39,
+# 40~99, 100~120, ... of the evidence rows
+INCREASE_SUB_CLASS_SPLITS = {
+    'LOCA': ((Fraction(11, 100), Fraction(40, 100)), 0),
+    'MSLB': ((Fraction(21, 100), Fraction(42, 100)), 3),
+    'SGTR': ((Fraction(10, 100), Fraction(48, 100)), 6),
+    'NORM': ((), 9),
+}
+
+RunRecord = namedtuple('RunRecord', ['run_id', 'accident', 'rank', 'sub_class', 'label', 'offset', 'length'])
+
+
+def sub_class_bounds(n_runs, fractions):
+    """
+    First rank of the medium and of the large breaks of a type with n_runs runs.
+    """
+    return [math.ceil(n_runs * x) for x in fractions]
+
+
+class RunIndex:
+    """
+    records: RunRecord of every run in dataset order; runs of one accident
+    type, and of one sub class, must be contiguous.
+    """
+    def __init__(self, records):
+        self.records = [RunRecord(*x) for x in records]
+        self._positions = {}
+        self._by_id = {}
+        for i, record in enumerate(self.records):
+            for key in (('accident', record.accident), ('sub_class', record.sub_class)):
+                first, end = self._positions.get(key, (i, i))
+                if end != i:
+                    raise ValueError('runs of {} {} are not contiguous'.format(*key))
+                self._positions[key] = (first, i + 1)
+            self._by_id[record.run_id] = i
+
+    @classmethod
+    def build(cls, runs, window_length, splits=SUB_CLASS_SPLITS):
+        """
+        runs: [(accident type, [run id, ...] by break size), ...] in dataset order.
+        splits: {accident type: (sub class fractions, label of the small breaks)}.
+        """
+        records = []
+        offset = 0
+        for accident, run_ids in runs:
+            accident = ACCIDENT_ALIASES.get(accident, accident)
+            fractions, label = splits[accident]
+            bounds = sub_class_bounds(len(run_ids), fractions)
+            for rank, name in enumerate(run_ids):
+                part = sum(rank >= x for x in bounds)
+                sub_class = SUB_CLASS_PREFIXES[part] + accident if fractions else accident
+                records.append(RunRecord(name, accident, rank, sub_class, label + part, offset, window_length))
+                offset += window_length
+        return cls(records)
+
+    @classmethod
+    def from_raw(cls, raw_dir, accident_types, window_length, splits=SUB_CLASS_SPLITS):
+        """
+        Index of the runs under raw_dir as genarate_sequence_data.py lays them out.
+        """
+        return cls.build([(accident, [run_id(accident, x[0]) for x in list_raw_runs(raw_dir, accident)])
+                          for accident in accident_types], window_length, splits)
+
+    @classmethod
+    def from_class_runs(cls, window_length, class_runs=CLASS_RUNS, splits=SUB_CLASS_SPLITS):
+        """
+        Index of a dataset written before run indexes existed (the 100 / 100 / 100 / 5 layout).
+        """
+        return cls.build([(accident, [run_id(accident, x + 1) for x in range(end - first)])
+                          for accident, first, end in class_runs], window_length, splits)
+
+    @classmethod
+    def from_evidence(cls, files, splits=EVIDENCE_SUB_CLASS_SPLITS):
+        """
+        Index of the Bayes evidence runs, one row each; files as utils.evidence.evidence_files lists them.
+        """
+        runs = []
+        for path, name in files:
+            folder = os.path.basename(os.path.dirname(path))
+            if not runs or runs[-1][0] != folder:
+                runs.append((folder, []))
+            runs[-1][1].append(name)
+        return cls.build(runs, 1, splits)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            return cls(json.load(f)['runs'])
+
+    def save(self, path):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'runs': [list(x) for x in self.records]}, f, indent=1)
+        os.replace(tmp_path, path)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __getitem__(self, run_id):
+        return self.records[self._by_id[run_id]]
+
+    @property
+    def accident_types(self):
+        return list(dict.fromkeys(x.accident for x in self.records))
+
+    @property
+    def labels(self):
+        return np.array([x.label for x in self.records], dtype='int64')
+
+    @property
+    def sub_classes(self):
+        return [x.sub_class for x in self.records]
+
+    def positions(self, accident=None, sub_class=None):
+        """
+        range of the run positions of one accident type or one sub class.
+        """
+        key = ('accident', accident) if sub_class is None else ('sub_class', sub_class)
+        return range(*self._positions.get(key, (0, 0)))
+
+    def rows(self, accident=None, sub_class=None):
+        """
+        slice of the dataset rows of one accident type or one sub class.
+        """
+        positions = self.positions(accident, sub_class)
+        if not positions:
+            return slice(0, 0)
+        last = self.records[positions[-1]]
+        return slice(self.records[positions[0]].offset, last.offset + last.length)
+
+    def with_length(self, window_length):
+        """
+        The same runs laid out as consecutive blocks of window_length rows.
+        """
+        return RunIndex([x._replace(offset=i * window_length, length=window_length)
+                         for i, x in enumerate(self.records)])
+
+    def with_lengths(self, lengths):
+        """
+        The same runs with lengths[i] rows for run i, laid out back to back
+        (a dataset of whole runs of different durations).
+        """
+        offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype('int64')
+        if len(offsets) != len(self.records):
+            raise ValueError('{} lengths for {} runs'.format(len(offsets), len(self.records)))
+        return RunIndex([x._replace(offset=int(offset), length=int(length))
+                         for x, offset, length in zip(self.records, offsets, lengths)])
+
+    def with_splits(self, splits):
+        """
+        The same runs, rows and order with the sub classes of another split.
+        """
+        runs = [(x, [self.records[i].run_id for i in self.positions(x)]) for x in self.accident_types]
+        return RunIndex([x._replace(offset=y.offset, length=y.length)
+                         for x, y in zip(RunIndex.build(runs, 1, splits), self.records)])
+
+    def class_runs(self):
+        """
+        [(accident type, first run, end run), ...] as utils.interpolation.CLASS_RUNS.
+        """
+        return [(x, self.positions(x).start, self.positions(x).stop) for x in self.accident_types]
+
+
+def load_run_index(dataset_path, window_length):
+    """
+    The runs stored with a dataset as blocks of window_length rows (the
+    interpolation scripts' layout), or the fixed layout for datasets without
+    a run index (old csv files).
+    """
+    path = os.path.join(dataset_path, RUN_INDEX_FILE)
+    if os.path.exists(path):
+        return RunIndex.load(path).with_length(window_length)
+    return RunIndex.from_class_runs(window_length)
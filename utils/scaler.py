@@ -0,0 +1,162 @@
+"""
+Per-channel scaler fitted chunk by chunk and saved as json.
+
+StreamingScaler keeps running per-channel count, min, max, mean and sum of
+squared deviations (merged chunk by chunk, Chan et al.), so it can be
+fitted over the training windows of a dataset that is never in memory as a
+whole. 'minmax' matches sklearn's MinMaxScaler and 'standard' its
+StandardScaler (population std); either way transform is the single affine
+x * scale + offset, done in place on float32 batches (numpy or torch).
+"""
+import json
+import os
+
+import numpy as np
+
+KINDS = ('minmax', 'standard')
+
+
+class StreamingScaler:
+    def __init__(self, kind='minmax', feature_range=(0, 1)):
+        if kind not in KINDS:
+            raise ValueError('unknown scaler kind {!r}, expected one of {}'.format(kind, KINDS))
+        self.kind = kind
+        self.feature_range = tuple(feature_range)
+        self.count = 0
+        self.data_min = None
+        self.data_max = None
+        self.mean = None
+        self.m2 = None
+        self.meta = {}
+        self._affine = None
+
+    def partial_fit(self, chunk):
+        """
+        Add a (..., channels) chunk of rows or windows.
+        """
+        chunk = np.asarray(chunk, dtype='float64')
+        chunk = chunk.reshape(-1, chunk.shape[-1])
+        if chunk.shape[0] == 0:
+            return self
+        n = chunk.shape[0]
+        chunk_mean = chunk.mean(axis=0)
+        chunk_m2 = ((chunk - chunk_mean) ** 2).sum(axis=0)
+        if self.count == 0:
+            self.data_min, self.data_max = chunk.min(axis=0), chunk.max(axis=0)
+            self.mean, self.m2 = chunk_mean, chunk_m2
+        else:
+            total = self.count + n
+            delta = chunk_mean - self.mean
+            self.data_min = np.minimum(self.data_min, chunk.min(axis=0))
+            self.data_max = np.maximum(self.data_max, chunk.max(axis=0))
+            self.mean = self.mean + delta * n / total
+            self.m2 = self.m2 + chunk_m2 + delta ** 2 * self.count * n / total
+        self.count += n
+        self._affine = None
+        return self
+
+    def fit_chunks(self, chunks):
+        for chunk in chunks:
+            self.partial_fit(chunk)
+        return self
+
+    @property
+    def scale(self):
+        return self._affine_params()[0]
+
+    @property
+    def offset(self):
+        return self._affine_params()[1]
+
+    def _affine_params(self):
+        if self.count == 0:
+            raise ValueError('scaler has not been fitted')
+        if self._affine is None:
+            if self.kind == 'minmax':
+                data_range = self.data_max - self.data_min
+                data_range[data_range == 0.0] = 1.0
+                scale = (self.feature_range[1] - self.feature_range[0]) / data_range
+                offset = self.feature_range[0] - self.data_min * scale
+            else:
+                std = np.sqrt(self.m2 / self.count)
+                std[std == 0.0] = 1.0
+                scale = 1.0 / std
+                offset = -self.mean * scale
+            self._affine = (scale, offset)
+        return self._affine
+
+    def transform(self, x, out=None):
+        """
+        x * scale + offset over the last axis. numpy input comes back as float32
+        (written into out when given, e.g. out=x for a batch that was just gathered);
+        a torch tensor is scaled with one fused addcmul.
+        """
+        scale, offset = self._affine_params()
+        if hasattr(x, 'addcmul'):
+            import torch
+            scale = torch.as_tensor(scale, dtype=x.dtype, device=x.device)
+            offset = torch.as_tensor(offset, dtype=x.dtype, device=x.device)
+            return torch.addcmul(offset, x, scale, out=out)
+        x = np.asarray(x)
+        if out is None:
+            out = np.empty(x.shape, dtype='float32')
+        np.multiply(x, scale.astype(out.dtype), out=out)
+        out += offset.astype(out.dtype)
+        return out
+
+    def inverse_transform(self, x):
+        scale, offset = self._affine_params()
+        return (np.asarray(x, dtype='float64') - offset) / scale
+
+    def save(self, path, **meta):
+        """
+        Write the fitted state to path (json, replaced atomically); meta records
+        what it was fitted on, to be compared by the caller on load.
+        """
+        self.meta = dict(meta)
+        state = {'kind': self.kind, 'feature_range': list(self.feature_range), 'count': self.count,
+                 'data_min': self.data_min.tolist(), 'data_max': self.data_max.tolist(),
+                 'mean': self.mean.tolist(), 'm2': self.m2.tolist(), 'meta': self.meta}
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, indent=1)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            state = json.load(f)
+        scaler = cls(state['kind'], state['feature_range'])
+        scaler.count = state['count']
+        for name in ('data_min', 'data_max', 'mean', 'm2'):
+            setattr(scaler, name, np.asarray(state[name], dtype='float64'))
+        scaler.meta = state.get('meta', {})
+        return scaler
+
+
+def chunked(indices, chunk_size):
+    """
+    Consecutive pieces of at most chunk_size of an index array.
+    """
+    for start in range(0, len(indices), chunk_size):
+        yield indices[start:start + chunk_size]
+
+
+def load_or_fit(path, chunks, kind='minmax', **meta):
+    """
+    The scaler saved at path when it was fitted on the same data (same meta),
+    otherwise a new one fitted over chunks (an iterable, only consumed then)
+    and saved at path. Callers put utils.dataset_store.fingerprint of the
+    dataset in meta, so a regenerated dataset under the same path is refitted.
+    """
+    if os.path.exists(path):
+        scaler = StreamingScaler.load(path)
+        if scaler.kind == kind and scaler.meta == json.loads(json.dumps(meta)):
+            return scaler
+    scaler = StreamingScaler(kind).fit_chunks(chunks)
+    scaler.save(path, **meta)
+    return scaler
@@ -0,0 +1,152 @@
+"""
+Whole runs of different durations as padded, length-bucketed batches.
+
+The simulator runs last from 60 s to about 3 min; the window datasets cut
+every run to its first time_length seconds. RunSequences keeps the rows of
+the whole runs back to back (the layout of a store written with per-run
+lengths in its run index) and hands out every run as a view. The batches of
+SequenceBatcher are padded only to their own longest run: LengthBuckets
+sorts a shuffled pool of runs by length before cutting it into batches, so
+runs of similar length share a batch, and the batch order is shuffled again.
+The lengths come with every batch, for pack_padded_sequence.
+"""
+import os
+
+import numpy as np
+import torch
+from torch.nn.utils.rnn import pad_sequence
+
+from utils.dataset_store import DatasetStore
+from utils.run_index import RUN_INDEX_FILE, RunIndex
+
+
+class RunSequences:
+    """
+    data: (rows, channels) rows of all runs, run after run.
+    lengths: rows of every run, in data order.
+    labels: label of every run.
+    """
+    def __init__(self, data, lengths, labels):
+        self.lengths = np.asarray(lengths, dtype='int64')
+        self.labels = np.asarray(labels, dtype='int64')
+        if self.lengths.shape != self.labels.shape:
+            raise ValueError('{} lengths for {} labels'.format(self.lengths.shape[0], self.labels.shape[0]))
+        if self.lengths.sum() != data.shape[0]:
+            raise ValueError('runs of {} rows in all for {} rows'.format(self.lengths.sum(), data.shape[0]))
+        self.data = data
+        self.offsets = np.concatenate([[0], np.cumsum(self.lengths)]).astype('int64')
+
+    @classmethod
+    def from_store(cls, path, columns=None):
+        """
+        The runs of a store with a run index (runs.json); runs may differ in length.
+        NaN gaps are filled forward, as the window datasets are.
+        """
+        index = RunIndex.load(os.path.join(path, RUN_INDEX_FILE))
+        frame = DatasetStore(path).to_frame(columns).ffill()
+        return cls(frame.to_numpy(dtype='float32'), [x.length for x in index], index.labels)
+
+    def __len__(self):
+        return self.lengths.shape[0]
+
+    def run(self, i):
+        """
+        Rows of run i, a view of data.
+        """
+        return self.data[self.offsets[i]:self.offsets[i + 1]]
+
+    def rows(self, indices):
+        """
+        Rows of the given runs, run after run (e.g. a chunk of the training runs to fit a scaler on).
+        """
+        return np.concatenate([self.run(i) for i in indices])
+
+
+def pad_runs(runs):
+    """
+    (batch, longest run, channels) zero-padded tensor and the int64 lengths of a list of (rows, channels) tensors.
+    """
+    lengths = torch.tensor([x.shape[0] for x in runs], dtype=torch.int64)
+    return pad_sequence(runs, batch_first=True), lengths
+
+
+class LengthBuckets:
+    """
+    Batch sampler: lists of run indices, runs of similar length together.
+
+    lengths: rows of every run.
+    pool_batches: batches sorted together; every epoch the runs are shuffled
+                  (or drawn by sampler), cut into pools of pool_batches *
+                  batch_size runs, and every pool is sorted by length before it
+                  is cut into batches. Larger pools pad less, smaller ones mix
+                  the lengths of a batch more; None sorts the whole epoch.
+    sampler: optional iterable of indices drawn anew every epoch (e.g.
+             utils.balancing.balanced_sampler); replaces the shuffle.
+    """
+    def __init__(self, lengths, batch_size, pool_batches=50, shuffle=True, sampler=None, seed=0):
+        self.lengths = torch.as_tensor(np.asarray(lengths), dtype=torch.int64)
+        self.batch_size = batch_size
+        self.pool_batches = pool_batches
+        self.shuffle = shuffle
+        self.sampler = sampler
+        self.generator = torch.Generator().manual_seed(seed)
+
+    @property
+    def n_samples(self):
+        return len(self.sampler) if self.sampler is not None else self.lengths.shape[0]
+
+    def __len__(self):
+        return -(-self.n_samples // self.batch_size)
+
+    def __iter__(self):
+        if self.sampler is not None:
+            order = torch.as_tensor(list(self.sampler), dtype=torch.int64)
+        elif self.shuffle:
+            order = torch.randperm(self.n_samples, generator=self.generator)
+        else:
+            order = torch.arange(self.n_samples)
+        pool_size = self.pool_batches * self.batch_size if self.pool_batches else self.n_samples
+        batches = []
+        for pool in order.split(pool_size):
+            # stable sort keeps the shuffled order among runs of equal length
+            pool = pool[torch.sort(self.lengths[pool], stable=True)[1]]
+            batches += pool.split(self.batch_size)
+        if self.shuffle or self.sampler is not None:
+            batches = [batches[i] for i in torch.randperm(len(batches), generator=self.generator)]
+        return iter(batches)
+
+
+class SequenceBatcher:
+    """
+    runs: list of (rows, channels) tensors.
+    labels: tensor of the run labels.
+    Iterating yields (padded runs, lengths, labels) per step, the runs of a
+    step of similar length (LengthBuckets, which gets the other arguments).
+    padding counts the real and padded rows handed out so far.
+    """
+    def __init__(self, runs, labels, batch_size=None, **kwargs):
+        if len(runs) != labels.shape[0]:
+            raise ValueError('{} runs for {} labels'.format(len(runs), labels.shape[0]))
+        self.runs = runs
+        self.labels = labels
+        self.buckets = LengthBuckets([x.shape[0] for x in runs], batch_size or len(runs), **kwargs)
+        self.rows = 0
+        self.padded_rows = 0
+
+    def __len__(self):
+        return len(self.buckets)
+
+    @property
+    def generator(self):
+        return self.buckets.generator
+
+    @property
+    def padding(self):
+        return 1.0 - self.rows / self.padded_rows if self.padded_rows else 0.0
+
+    def __iter__(self):
+        for index in self.buckets:
+            x, lengths = pad_runs([self.runs[i] for i in index.tolist()])
+            self.rows += int(lengths.sum())
+            self.padded_rows += x.shape[0] * x.shape[1]
+            yield x, lengths, self.labels.index_select(0, index)
@@ -0,0 +1,77 @@
+"""
+Integer-millisecond time index for one run.
+
+The HH:MM:SS:mmm column is converted to sorted int64 milliseconds once by
+the tokenizer; rows_for_interval then finds the rows of any time window with
+two binary searches instead of scanning every row for a time-string prefix.
+"""
+import numpy as np
+import pandas as pd
+
+from utils.channels import resolve_channels
+from utils.raw_cache import COLUMN_NAMES, read_raw_run
+from utils.tokenizer import iter_blocks
+
+
+class IndexedRun:
+    """
+    Chronological channel values of one run with their time index.
+
+    time_ms: (rows,) int64, ascending.
+    values: (rows, channels).
+    """
+    def __init__(self, time_ms, values):
+        time_ms = np.asarray(time_ms, dtype='int64')
+        if time_ms.size > 1 and np.any(time_ms[1:] < time_ms[:-1]):
+            raise ValueError('time column is not sorted')
+        self.time_ms = time_ms
+        self.values = values
+
+    @classmethod
+    def from_file(cls, path, dtype='float64', channels=None):
+        """
+        Index a merged file (<n><TYPE>.txt) or a single raw half. channels
+        (a utils.channels selection, merged files only) limits the decoded columns.
+        """
+        usecols = None if channels is None else resolve_channels(channels)
+        blocks = list(iter_blocks(path, dtype=dtype, usecols=usecols))
+        if not blocks:
+            return cls(np.empty(0, dtype='int64'), np.empty((0, 0), dtype=dtype))
+        return cls(np.concatenate([x[0] for x in blocks]), np.concatenate([x[1] for x in blocks]))
+
+    @classmethod
+    def from_halves(cls, path_1, path_2, channels=None):
+        run = read_raw_run(path_1, path_2, channels)
+        return cls(run[:, 0], run[:, 1:])
+
+    @classmethod
+    def from_array(cls, run):
+        """
+        Index a (rows, 1 + channels) array in the utils.raw_cache layout (e.g. a cached run).
+        """
+        return cls(run[:, 0], run[:, 1:])
+
+    def __len__(self):
+        return self.time_ms.shape[0]
+
+    def rows_for_interval(self, start_s, end_s):
+        """
+        Slice of the rows with start_s <= time < end_s (seconds).
+        """
+        start = np.searchsorted(self.time_ms, int(round(start_s * 1000)), side='left')
+        end = np.searchsorted(self.time_ms, int(round(end_s * 1000)), side='left')
+        return slice(int(start), int(end))
+
+    def interval(self, start_s, end_s):
+        """
+        Channel values of the rows with start_s <= time < end_s.
+        """
+        return self.values[self.rows_for_interval(start_s, end_s)]
+
+    def frame(self, start_s, end_s, columns=None):
+        """
+        The rows of [start_s, end_s) as a DataFrame: time in ms first, then the channels.
+        """
+        rows = self.rows_for_interval(start_s, end_s)
+        data = np.column_stack((self.time_ms[rows], self.values[rows]))
+        return pd.DataFrame(data, columns=columns or COLUMN_NAMES[:data.shape[1]])
@@ -0,0 +1,160 @@
+"""
+Streaming tokenizer for the simulator text format.
+
+The raw files are newest-row-first, tab padded with empty columns and carry
+one time column per half (merged files carry two). The generators below read
+a file backwards in fixed-size byte chunks and yield chronological numpy
+blocks of at most block_rows rows, so memory stays constant whatever the
+length of the transient. Each block is tokenized by the pandas C parser.
+"""
+import io
+import os
+from itertools import zip_longest
+
+import numpy as np
+import pandas as pd
+
+from utils.channels import resolve_channels, split_by_half
+
+BLOCK_ROWS = 4096
+BUFFER_SIZE = 1 << 16
+
+
+def time_to_ms(time_str):
+    """
+    Convert a simulator time stamp 'HH:MM:SS:mmm' to integer milliseconds.
+    """
+    hours, minutes, seconds, millis = time_str.strip().split(':')
+    return ((int(hours) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + int(millis)
+
+
+def times_to_ms(time_strings):
+    """
+    Vectorized time_to_ms for a column of 'HH:MM:SS:mmm' strings.
+    """
+    text = np.char.strip(np.asarray(time_strings).astype('S'))
+    if text.dtype.itemsize == 12:
+        # fixed width: read the digits straight out of the bytes
+        digits = text.view('uint8').reshape(-1, 12).astype('int64') - ord('0')
+        hours = digits[:, 0] * 10 + digits[:, 1]
+        minutes = digits[:, 3] * 10 + digits[:, 4]
+        seconds = digits[:, 6] * 10 + digits[:, 7]
+        millis = digits[:, 9] * 100 + digits[:, 10] * 10 + digits[:, 11]
+    else:
+        fields = np.array(np.char.split(text.astype(str), ':').tolist(), dtype='int64').reshape(-1, 4)
+        hours, minutes, seconds, millis = fields.T
+    return ((hours * 60 + minutes) * 60 + seconds) * 1000 + millis
+
+
+def iter_lines_reversed(path, buffer_size=BUFFER_SIZE):
+    """
+    Yield the lines of a file last to first, reading buffer_size bytes at a time.
+    """
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        remainder = b''
+        while position > 0:
+            size = min(buffer_size, position)
+            position -= size
+            f.seek(position)
+            lines = (f.read(size) + remainder).split(b'\n')
+            remainder = lines[0]
+            for line in reversed(lines[1:]):
+                yield line
+        yield remainder
+
+
+def iter_data_lines(path, buffer_size=BUFFER_SIZE):
+    """
+    Data lines of a raw or merged file in chronological order (header and blank lines skipped).
+    """
+    for line in iter_lines_reversed(path, buffer_size):
+        if line[:1].isdigit():
+            yield line
+
+
+def channel_columns(line):
+    """
+    Token positions of the channel values in one data line (every token after
+    the first that is not a time stamp).
+    """
+    return [i for i, token in enumerate(line.split()) if i > 0 and b':' not in token]
+
+
+def parse_lines(lines, dtype='float32', usecols=None):
+    """
+    Tokenize a list of data lines. Returns (time_ms, values): the first time
+    column as int64 milliseconds and the channel columns after it, with the
+    empty padding columns and any repeated time column dropped.
+    usecols picks channel columns by their position among the channels of the
+    line (0..5 for a raw half, 0..11 for a merged file); the other columns are
+    not decoded at all.
+    """
+    columns = channel_columns(lines[0])
+    if usecols is not None:
+        columns = [columns[x] for x in usecols]
+    # the padding is irregular (runs of tabs and spaces), so split on any whitespace run
+    frame = pd.read_csv(io.BytesIO(b'\n'.join(lines)), sep=r'\s+', header=None, usecols=[0] + columns,
+                        dtype={0: str})
+    time_ms = times_to_ms(frame[0].values)
+    values = np.empty((frame.shape[0], len(columns)), dtype=dtype)
+    for k, i in enumerate(columns):
+        values[:, k] = frame[i].values
+    return time_ms, values
+
+
+def _chunks(lines, block_rows):
+    block = []
+    for line in lines:
+        block.append(line)
+        if len(block) == block_rows:
+            yield block
+            block = []
+    if block:
+        yield block
+
+
+def iter_blocks(path, block_rows=BLOCK_ROWS, dtype='float32', usecols=None):
+    """
+    Chronological (time_ms, values) blocks of one raw half or one merged file.
+    """
+    for block in _chunks(iter_data_lines(path), block_rows):
+        yield parse_lines(block, dtype, usecols)
+
+
+def iter_run_blocks(path_1, path_2, block_rows=BLOCK_ROWS, dtype='float32', channels=None):
+    """
+    Chronological (time_ms, values) blocks of a run, joining its -1 and -2
+    halves row by row; values has the 6 + 6 channels side by side, or only
+    the utils.channels positions in channels (in schema order).
+    """
+    usecols_1, usecols_2 = (None, None) if channels is None else split_by_half(resolve_channels(channels))
+    blocks_1 = _chunks(iter_data_lines(path_1), block_rows)
+    blocks_2 = _chunks(iter_data_lines(path_2), block_rows)
+    for block_1, block_2 in zip_longest(blocks_1, blocks_2):
+        if block_1 is None or block_2 is None or len(block_1) != len(block_2):
+            raise ValueError('{} and {} have a different number of rows'.format(path_1, path_2))
+        time_1, values_1 = parse_lines(block_1, dtype, usecols_1)
+        time_2, values_2 = parse_lines(block_2, dtype, usecols_2)
+        if not np.array_equal(time_1, time_2):
+            raise ValueError('time columns of {} and {} do not match'.format(path_1, path_2))
+        yield time_1, np.concatenate([values_1, values_2], axis=1)
+
+
+def count_rows(path, buffer_size=BUFFER_SIZE):
+    """
+    Number of data rows of a raw file without parsing it (lines minus the header).
+    """
+    lines = 0
+    last = b'\n'
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(buffer_size)
+            if not chunk:
+                break
+            lines += chunk.count(b'\n')
+            last = chunk[-1:]
+    if last != b'\n':
+        lines += 1
+    return lines - 1
@@ -0,0 +1,209 @@
+"""
+Interpolation augmentation as a torch Dataset.
+
+InterpolatedWindowDataset holds only the base windows (one per run) and
+builds the windows of interpolation level k, and their add_label labels, when
+they are asked for. Item i is the same window, bit for bit, as window i of
+the processed_data/total_dataset<T><k> store that sequence_data_interpolation.py
+writes, so a high level costs CPU time instead of disk and RAM.
+
+AdjacentRunMixup goes past the fixed midpoints: every batch mixes each
+sampled run with its next larger break size of the same accident type at a
+random coefficient, with vectorised tensor ops, so the augmentation is
+unlimited at the memory of the base windows.
+"""
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+
+from utils.interpolation import (CLASS_RUNS, SUB_CLASS_SPLITS, interpolated_blocks, interpolated_window,
+                                 sub_class_labels)
+
+
+class InterpolatedWindowDataset(Dataset):
+    """
+    classes: [(accident type, (runs * window_length, channels) base rows), ...]
+             in the order the windows are numbered (LOCA, MSLB, SGTR, NORM).
+    levels: interpolation_number.
+    transform: optional callable applied to every (window_length, channels)
+               float32 window (e.g. a fitted scaler).
+    samples: draw this many windows (with replacement) from all levels
+             instead of enumerating them; the draw is fixed by seed.
+    """
+    def __init__(self, classes, window_length, levels, transform=None, samples=None, seed=0):
+        self.window_length = window_length
+        self.levels = levels
+        self.transform = transform
+        self.seed = seed
+        self.names = []
+        self.blocks = []
+        counts = []
+        labels = []
+        for accident, rows in classes:
+            # same dtype as the rows, so the midpoints round exactly as in interpolate_blocks
+            rows = np.asarray(rows)
+            if rows.shape[0] % window_length:
+                raise ValueError('{}: {} rows are not whole {}-row windows'.format(accident, rows.shape[0],
+                                                                                 window_length))
+            self.names.append(accident)
+            self.blocks.append(rows.reshape(-1, window_length, rows.shape[1]))
+            counts.append(interpolated_blocks(self.blocks[-1].shape[0], levels))
+            labels.append(sub_class_labels(accident, counts[-1]))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]).astype('int64')
+        self.all_labels = np.concatenate(labels) if labels else np.empty(0, dtype='int64')
+        self.indices = None
+        if samples is not None:
+            self.indices = np.random.default_rng(seed).integers(0, self.offsets[-1], size=samples)
+
+    @classmethod
+    def from_rows(cls, data, window_length, levels, class_runs=CLASS_RUNS, **kwargs):
+        """
+        Split a (rows, channels) sequence dataset into the class slices the
+        Interpolation scripts use (run r is rows r * window_length onwards).
+        """
+        data = np.asarray(data)
+        classes = [(accident, data[first * window_length:end * window_length])
+                   for accident, first, end in class_runs]
+        return cls(classes, window_length, levels, **kwargs)
+
+    @property
+    def labels(self):
+        """
+        Label of every item, without building any window.
+        """
+        return self.all_labels if self.indices is None else self.all_labels[self.indices]
+
+    @property
+    def base_rows(self):
+        """
+        All base rows stacked; per channel they span the same min and max as
+        every interpolated window, so a MinMaxScaler can be fitted on them.
+        """
+        return np.concatenate([x.reshape(-1, x.shape[2]) for x in self.blocks])
+
+    def covered_pairs(self, index):
+        """
+        Base-run positions b, counted over all classes as AdjacentRunMixup
+        numbers them, whose pair (b, b + 1) has every window from run b to
+        run b + 1 among the items index. Mixing such a pair never rebuilds a
+        window outside index (e.g. a test window).
+        """
+        windows = np.asarray(index, dtype='int64')
+        if self.indices is not None:
+            windows = self.indices[windows]
+        chosen = np.zeros(int(self.offsets[-1]), dtype=bool)
+        chosen[windows] = True
+        spacing = 2 ** self.levels
+        pairs = []
+        first_run = 0
+        for k, blocks in enumerate(self.blocks):
+            for b in range(blocks.shape[0] - 1):
+                start = self.offsets[k] + b * spacing
+                if chosen[start:start + spacing + 1].all():
+                    pairs.append(first_run + b)
+            first_run += blocks.shape[0]
+        return pairs
+
+    def __len__(self):
+        return int(self.offsets[-1]) if self.indices is None else len(self.indices)
+
+    def window(self, i):
+        """
+        Window i as a float32 array, before transform.
+        """
+        if self.indices is not None:
+            i = self.indices[i]
+        if not 0 <= i < self.offsets[-1]:
+            raise IndexError('window {} out of range ({} windows)'.format(i, self.offsets[-1]))
+        k = int(np.searchsorted(self.offsets, i, side='right')) - 1
+        return interpolated_window(self.blocks[k], int(i - self.offsets[k]), self.levels).astype('float32')
+
+    def __getitem__(self, i):
+        x = self.window(i)
+        if self.transform is not None:
+            x = self.transform(x).astype('float32', copy=False)
+        return torch.from_numpy(x), int(self.labels[i])
+
+
+class AdjacentRunMixup:
+    """
+    Batches of windows mixed between adjacent break-size runs.
+
+    classes: [(accident type, (runs * window_length, channels) base rows), ...]
+             as for InterpolatedWindowDataset; the rows should already be
+             scaled (a MinMaxScaler is affine, so it commutes with mixing).
+    Every window picks a pair of adjacent runs (b, b + 1) of one type, all
+    pairs equally likely as with the interpolation, and a coefficient
+    lam ~ U[0, 1); the window is (1 - lam) * run b + lam * run b + 1. Its
+    label follows add_label at the continuous position (b + lam) / (runs - 1)
+    of the type, the limit of the interpolated labels as the level grows.
+    Iterating yields batches_per_epoch (x, y) batches, so the object can stand
+    in for a DataLoader in the training loop.
+    pairs: optional base-run positions b (counted over all classes) to draw
+           the pairs (b, b + 1) from, e.g. InterpolatedWindowDataset.covered_pairs
+           of the training items; by default every adjacent pair.
+    """
+    def __init__(self, classes, window_length, batch_size, batches_per_epoch=1, seed=0, pairs=None):
+        self.window_length = window_length
+        self.batch_size = batch_size
+        self.batches_per_epoch = batches_per_epoch
+        self.generator = torch.Generator().manual_seed(seed)
+        blocks = []
+        left, position, span, label, small, medium = [], [], [], [], [], []
+        offset = 0
+        for accident, rows in classes:
+            rows = np.asarray(rows, dtype='float32')
+            if rows.shape[0] % window_length:
+                raise ValueError('{}: {} rows are not whole {}-row windows'.format(accident, rows.shape[0],
+                                                                                 window_length))
+            blocks.append(rows.reshape(-1, window_length, rows.shape[1]))
+            n = blocks[-1].shape[0]
+            fractions, base_label = SUB_CLASS_SPLITS[accident]
+            fractions = fractions or (np.inf, np.inf)
+            # one entry per adjacent pair (b, b + 1)
+            left += range(offset, offset + n - 1)
+            position += range(n - 1)
+            span += [n - 1] * (n - 1)
+            label += [base_label] * (n - 1)
+            small += [fractions[0]] * (n - 1)
+            medium += [fractions[1]] * (n - 1)
+            offset += n
+        keep = np.ones(len(left), dtype=bool) if pairs is None else np.isin(left, pairs)
+        if not keep.any():
+            raise ValueError('no pair of adjacent runs to mix')
+        left, position, span, label, small, medium = (np.asarray(x)[keep] for x in
+                                                      (left, position, span, label, small, medium))
+        self.blocks = torch.from_numpy(np.concatenate(blocks))
+        self.left = torch.tensor(left, dtype=torch.int64)
+        self.position = torch.tensor(position, dtype=torch.float32)
+        self.span = torch.tensor(span, dtype=torch.float32)
+        self.label = torch.tensor(label, dtype=torch.int64)
+        self.small = torch.tensor(small, dtype=torch.float32)
+        self.medium = torch.tensor(medium, dtype=torch.float32)
+
+    @classmethod
+    def from_rows(cls, data, window_length, batch_size, class_runs=CLASS_RUNS, **kwargs):
+        data = np.asarray(data)
+        classes = [(accident, data[first * window_length:end * window_length])
+                   for accident, first, end in class_runs]
+        return cls(classes, window_length, batch_size, **kwargs)
+
+    def sample(self, batch_size=None):
+        """
+        One batch: x (batch_size, window_length, channels) float32, y (batch_size,) int64.
+        """
+        batch_size = batch_size or self.batch_size
+        pair = torch.randint(len(self.left), (batch_size,), generator=self.generator)
+        lam = torch.rand(batch_size, generator=self.generator)
+        left = self.left[pair]
+        x = torch.lerp(self.blocks[left], self.blocks[left + 1], lam[:, None, None])
+        u = (self.position[pair] + lam) / self.span[pair]
+        y = self.label[pair] + (u >= self.small[pair]).long() + (u >= self.medium[pair]).long()
+        return x, y
+
+    def __len__(self):
+        return self.batches_per_epoch
+
+    def __iter__(self):
+        for _ in range(self.batches_per_epoch):
+            yield self.sample()
@@ -0,0 +1,109 @@
+"""
+Sliding windows over run-ordered rows without copying them.
+
+The datasets are runs of run_length consecutive rows (one block per run, or
+per interpolated run). run_windows returns a read-only strided view of shape
+(runs, windows per run, window_length, channels): windows of any stride that
+never cross from one run into the next, all sharing the rows' memory.
+SlidingWindows numbers those windows 0..n-1 for indexing and splitting; only
+the windows actually gathered (a batch, a split) are copied.
+
+The sequence datasets store every run once at full resolution; a model with
+a shorter window takes the leading window_length rows of each run
+(leading_windows), so one ingestion serves every window length.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+
+def windows_per_run(run_length, window_length, stride):
+    return (run_length - window_length) // stride + 1 if run_length >= window_length else 0
+
+
+def run_windows(data, window_length, stride=None, run_length=None):
+    """
+    data: (runs * run_length, channels) C-contiguous rows.
+    stride: rows between window starts (default window_length, no overlap).
+    run_length: rows per run (default all rows are one run).
+    """
+    stride = stride or window_length
+    run_length = run_length or data.shape[0]
+    if window_length <= 0 or stride <= 0:
+        raise ValueError('window_length and stride must be positive, got {} and {}'.format(window_length, stride))
+    if data.ndim != 2 or not data.flags['C_CONTIGUOUS']:
+        raise ValueError('expected C-contiguous (rows, channels) data')
+    if data.shape[0] % run_length:
+        raise ValueError('{} rows are not a whole number of {}-row runs'.format(data.shape[0], run_length))
+    row_stride, column_stride = data.strides
+    shape = (data.shape[0] // run_length, windows_per_run(run_length, window_length, stride), window_length,
+             data.shape[1])
+    strides = (run_length * row_stride, stride * row_stride, row_stride, column_stride)
+    return as_strided(data, shape=shape, strides=strides, writeable=False)
+
+
+def leading_windows(data, run_length, window_length):
+    """
+    (runs, window_length, channels) view of the first window_length rows of every run.
+    """
+    if window_length > run_length:
+        raise ValueError('{}-row windows do not fit in {}-row runs'.format(window_length, run_length))
+    return run_windows(data, window_length, run_length, run_length)[:, 0]
+
+
+def leading_rows(data, run_length, window_length):
+    """
+    The rows of leading_windows, run after run: (runs * window_length, channels),
+    i.e. the dataset generated with window_length seconds per run.
+    """
+    data = np.ascontiguousarray(data)
+    return leading_windows(data, run_length, window_length).reshape(-1, data.shape[1])
+
+
+class SlidingWindows:
+    """
+    Windows of run_windows numbered run by run.
+
+    data is converted to dtype (float32 by default, what torch trains on) once;
+    rows already in that dtype are used as they are.
+    run_labels: optional label of every run; labels gives one per window.
+    """
+    def __init__(self, data, window_length, stride=None, run_length=None, run_labels=None, dtype='float32'):
+        self.data = np.ascontiguousarray(data, dtype=dtype)
+        self.window_length = window_length
+        self.stride = stride or window_length
+        self.view = run_windows(self.data, window_length, self.stride, run_length)
+        self.runs, self.per_run = self.view.shape[:2]
+        self.run_labels = None if run_labels is None else np.asarray(run_labels)
+        if self.run_labels is not None and self.run_labels.shape[0] != self.runs:
+            raise ValueError('{} labels for {} runs'.format(self.run_labels.shape[0], self.runs))
+
+    def __len__(self):
+        return self.runs * self.per_run
+
+    @property
+    def shape(self):
+        return (len(self), self.window_length, self.view.shape[3])
+
+    def run_of(self, i):
+        """
+        Run number of window(s) i.
+        """
+        return np.asarray(i) // self.per_run if self.per_run else np.asarray(i)
+
+    @property
+    def labels(self):
+        if self.run_labels is None:
+            return None
+        return np.repeat(self.run_labels, self.per_run)
+
+    def __getitem__(self, i):
+        """
+        Window i as a view, or the windows of an index array as one (k, window_length, channels) array.
+        """
+        if isinstance(i, (int, np.integer)):
+            if not -len(self) <= i < len(self):
+                raise IndexError('window {} out of range ({} windows)'.format(i, len(self)))
+            run, position = divmod(int(i) % len(self), self.per_run)
+            return self.view[run, position]
+        i = np.arange(len(self))[i]
+        return self.view[i // self.per_run, i % self.per_run]